@@ -1,69 +1,134 @@
 import streamlit as st
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import os
 import pandas as pd
-import re
 from fpdf import FPDF
-import base64
 import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
 # Importar nuestro sistema de nutrición
-from nutrition_estimator import get_real_nutrition, estimate_nutrition, show_ip_setup_instructions
+from nutrition_estimator import get_real_nutrition, get_recipe_nutrition, get_batch_recipe_nutrition, show_ip_setup_instructions
+from nutrition_result import NutritionResult, SOURCE_DEFAULT, SOURCE_FATSECRET, nutrition_matrix
+from recipe_history import get_history
+from single_flight import get_flight, normalize_ingredients_key
+from ingredient_normalizer import normalize_ingredients
+import nutrition_estimator
+from meal_planner import DEFAULT_TARGETS, MACRO_KEYS, nutrition_vector, plan_meals, summarize_plan
+import numpy as np
+from model_registry import ModelRegistry
+from fatsecret_scheduler import PRIORITY_BATCH, get_scheduler, request_priority
+from model_snapshot import GENERATOR_MODEL, MODEL_SPECS, build_loader, snapshot_sources, verify_snapshot
+from load_controller import GENERATION_PROFILES, PROFILE_ORDER, get_controller
+from speculative_decoding import DRAFT_MODEL, assisted_generate, speculative_stats
+from partial_regeneration import regenerate_section, regeneration_stats
+from substitutions import SubstitutionIndex
+from recipe_parser import parse_recipe
+from structured_logging import get_logger, new_request_id, request_context
+from shared_cache import get_cache
+from profiling import ADMIN_CONTROLS, list_captures, profile_capture
+from ingredient_autocomplete import STATUS_KNOWN, STATUS_MODEL, build_ingredient_index, split_items
+
+log = get_logger("app")
 
-# Cargar modelos (usar caché para mejor rendimiento)
+# Artefacto de modelos empaquetado (model_snapshot.py package); vacío = usar el hub
+MODEL_ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR", "")
+
+# Registro de modelos compartido: carga al primer uso y expulsión por inactividad o memoria
 @st.cache_resource
-def load_models():
-    # Modelo para clasificación de restricciones
-    classifier = pipeline(
-        "text-classification", 
-        model="bert-base-uncased",
-        top_k=None
-    )
-    
-    # Modelo para generación de recetas (T5 fine-tuned)
-    model_name = "flax-community/t5-recipe-generation"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    generator = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-    
-    return classifier, tokenizer, generator
+def load_registry():
+    if MODEL_ARTIFACT_DIR:
+        # Modo sin conexión: validar el artefacto una vez y cargar solo desde disco
+        manifest = verify_snapshot(MODEL_ARTIFACT_DIR)
+        log.info("Artefacto de modelos %s verificado", manifest["version"], extra={"path": MODEL_ARTIFACT_DIR})
+        registry = ModelRegistry(snapshot_dir=None)
+        for name, (source, loader) in snapshot_sources(MODEL_ARTIFACT_DIR).items():
+            registry.register(name, source, loader)
+    else:
+        registry = ModelRegistry()
+        # Clasificador de restricciones, tokenizador y generador T5
+        for name, (source, kind) in MODEL_SPECS.items():
+            registry.register(name, source, build_loader(kind))
+    if DRAFT_MODEL and MODEL_ARTIFACT_DIR and "draft" not in registry:
+        # Sin conexión solo se usa un borrador empaquetado en el artefacto
+        log.warning("El artefacto no incluye el modelo borrador: decodificación asistida desactivada")
+    elif DRAFT_MODEL and not MODEL_ARTIFACT_DIR:
+        # Modelo borrador para la decodificación asistida
+        registry.register("draft", DRAFT_MODEL, build_loader("seq2seq"))
+    return registry
+
+@contextmanager
+def acquire_draft(registry):
+    """Modelo borrador si la decodificación asistida está activada (si no, None)
+
+    Si el borrador no carga se genera sin él: la decodificación asistida es opcional.
+    """
+    with ExitStack() as stack:
+        draft = None
+        if DRAFT_MODEL and "draft" in registry:
+            try:
+                draft = stack.enter_context(registry.acquire("draft"))
+            except Exception as e:
+                log.warning("No se pudo cargar el modelo borrador, se genera sin él: %s", e, rate_limit=(1, 300))
+        yield draft
+
+def load_generation_flight():
+    # Compartido entre sesiones: peticiones idénticas simultáneas usan una sola generación.
+    # Singleton del módulo, igual que load_controller, para que la prueba de carga también agrupe
+    return get_flight("generation")
+
+def load_controller():
+    # Perfil de generación según la latencia y la concurrencia de todas las sesiones. Es un
+    # singleton del módulo y no un st.cache_resource: fuera de Streamlit (pruebas, prueba de
+    # carga) cache_resource no guarda nada y cada llamada crearía un controlador nuevo
+    return get_controller()
+
+@st.cache_resource
+def load_substitutions():
+    # Índice de sustituciones por dieta, construido una vez desde substitutions.json
+    return SubstitutionIndex.load()
+
+def load_history():
+    # Historial persistente compartido por todas las sesiones (singleton del módulo: fuera de
+    # Streamlit cada llamada abriría otro hilo escritor)
+    return get_history()
+
+@st.cache_resource
+def load_autocomplete():
+    # Vocabulario de ingredientes: léxico, datos nutricionales y lo que FatSecret ya resolvió
+    return build_ingredient_index(load_substitutions(), load_history().fatsecret_ingredients())
 
 def parse_generated_recipe(text):
-    """Organiza la receta generada en secciones estructuradas"""
-    sections = {
-        "title": "",
-        "ingredients": [],
-        "instructions": [],
-        "notes": ""
-    }
-    # El modelo genera secciones con encabezados: title:, ingredients:, directions:
-    title_match = re.search(r"title:(.+)", text, re.IGNORECASE)
-    if title_match:
-        sections["title"] = title_match.group(1).strip()
-    ingredients_match = re.search(r"ingredients:(.+?)(?:directions:|$)", text, re.IGNORECASE | re.DOTALL)
-    if ingredients_match:
-        # Los ingredientes suelen estar separados por "--"
-        ingredients = [i.strip("- ") for i in ingredients_match.group(1).split("--") if i.strip()]
-        sections["ingredients"] = ingredients
-    instructions_match = re.search(r"directions:(.+)", text, re.IGNORECASE | re.DOTALL)
-    if instructions_match:
-        steps = [s.strip("- ") for s in instructions_match.group(1).split("--") if s.strip()]
-        sections["instructions"] = [f"{i+1}. {step}" for i, step in enumerate(steps)]
-    return sections
+    """Organiza la receta generada en secciones estructuradas (ver recipe_parser.parse_recipe)"""
+    return parse_recipe(text).to_dict()
+
+# Ingredientes incompatibles con cada dieta y el aviso que muestran
+DIET_CONFLICTS = {
+    "Vegan": (["meat", "beef", "pork", "chicken", "fish", "egg", "milk", "buttermilk", "cheese", "butter",
+               "yogurt", "cream", "honey", "gelatin", "ghee", "whey"], "is not vegan"),
+    "Vegetarian": (["meat", "beef", "pork", "chicken", "turkey", "fish", "salmon", "tuna", "shrimp", "bacon",
+                    "ham", "sausage", "anchovy", "anchovies", "gelatin", "lard"], "is not vegetarian"),
+    "Gluten Free": (["wheat", "barley", "rye", "bread", "pasta", "flour", "couscous", "farro", "spelt",
+                     "breadcrumbs"], "contains gluten"),
+    "Dairy Free": (["milk", "buttermilk", "cheese", "butter", "yogurt", "cream", "ghee", "whey", "casein",
+                    "parmesan", "mozzarella"], "contains dairy"),
+    "Low Carb": (["sugar", "rice", "pasta", "bread", "flour", "potato", "noodle", "tortilla",
+                  "honey", "couscous", "oats"], "is high in carbs"),
+}
+
+# Palabras completas (con su plural): "eggplant" no es huevo ni "peanut" es "pea"
+_DIET_PATTERNS = {
+    diet: re.compile(rf"\b({'|'.join(sorted(items, key=len, reverse=True))})(e?s)?\b", re.IGNORECASE)
+    for diet, (items, _) in DIET_CONFLICTS.items()
+}
 
 def validate_ingredients(ingredients, diet):
     """Valida los ingredientes según las restricciones dietéticas"""
     conflicts = []
-    non_vegan = ["meat", "beef", "pork", "chicken", "fish", "egg", "milk", "cheese", "butter", "yogurt", "cream"]
-    gluten = ["wheat", "barley", "rye", "bread", "pasta", "flour", "couscous", "farro", "spelt", "breadcrumbs"]
-    
-    if "Vegan" in diet:
-        for item in non_vegan:
-            if item in ingredients.lower():
-                conflicts.append(f"⚠️ {item.capitalize()} is not vegan")
-    
-    if "Gluten Free" in diet:
-        for item in gluten:
-            if item in ingredients.lower():
-                conflicts.append(f"⚠️ {item.capitalize()} contains gluten")
-    
+    for name, (items, message) in DIET_CONFLICTS.items():
+        if name not in diet:
+            continue
+        found = {match.group(1).lower() for match in _DIET_PATTERNS[name].finditer(ingredients)}
+        conflicts.extend(f"⚠️ {item.capitalize()} {message}" for item in items if item in found)
     return conflicts
 
 def get_random_chef_tip():
@@ -82,7 +147,7 @@ def get_random_chef_tip():
     ]
     return random.choice(tips)
 
-def create_pdf(recipe):
+def create_pdf(recipe, chef_tip=None):
     """Creates a PDF with modern and clean design"""
     pdf = FPDF()
     pdf.add_page()
@@ -244,10 +309,8 @@ def create_pdf(recipe):
             pdf.set_text_color(*dark_gray)
             pdf.set_font("Arial", size=10)
             
-            clean_step = re.sub(r'^\d+\.\s*', '', step)
-            
             # Text wrapping with width constraint
-            words = clean_step.split()
+            words = step.split()
             lines = []
             current_line = ""
             max_width = 55  # Characters that fit in the container width
@@ -309,7 +372,7 @@ def create_pdf(recipe):
         
         pdf.set_font("Arial", 'I', 9)
         pdf.set_text_color(*medium_gray)
-        chef_tip = get_random_chef_tip()
+        chef_tip = chef_tip or get_random_chef_tip()
         
         # Wrap tip text
         words = chef_tip.split()
@@ -345,22 +408,114 @@ def create_pdf(recipe):
     
     return pdf.output(dest='S').encode('latin1')
 
-def generate_recipe(ingredients, diet, tokenizer, generator):
+def create_pdf_cached(recipe, chef_tip):
+    """PDF de la receta desde la caché compartida (se genera una vez por contenido)"""
+    key = {"title": recipe["title"], "ingredients": recipe["ingredients"],
+           "instructions": recipe["instructions"], "chef_tip": chef_tip}
+    def render():
+        with profile_capture.capture("pdf"):
+            return create_pdf(recipe, chef_tip)
+    return get_cache().get_or_set("pdf", key, render)
+
+def generate_recipe(ingredients, diet, tokenizer, generator, profile="full", draft=None):
     """Genera una receta usando el modelo T5 fine-tuned para recetas"""
     prompt = f"{ingredients}"
     input_text = f"items: {prompt}"
+    with profile_capture.capture("generation", torch_trace=True):
+        inputs = tokenizer(input_text, return_tensors="pt", truncation=True, max_length=256)
+        if draft is not None:
+            # El borrador propone tokens y el modelo principal los verifica en bloque
+            output = assisted_generate(generator, draft, inputs, GENERATION_PROFILES[profile])
+        else:
+            output = generator.generate(**inputs, **GENERATION_PROFILES[profile])
+        generated_text = tokenizer.decode(output[0], skip_special_tokens=True)
+        recipe = parse_generated_recipe(generated_text)
+    recipe["profile"] = profile
+    return recipe, generated_text
+
+def generate_recipes_batch(ingredients, tokenizer, generator, num_recipes, profile="full"):
+    """Genera varias recetas candidatas en una sola llamada al modelo"""
+    # Varias secuencias distintas requieren muestreo
+    params = GENERATION_PROFILES[profile] or {}
+    if not params.get("do_sample"):
+        profile, params = "reduced", GENERATION_PROFILES["reduced"]
+    input_text = f"items: {ingredients}"
     inputs = tokenizer(input_text, return_tensors="pt", truncation=True, max_length=256)
-    output = generator.generate(
-        **inputs,
-        max_length=512,
-        min_length=64,
-        no_repeat_ngram_size=3,
-        do_sample=True,
-        top_k=60,
-        top_p=0.95
-    )
-    generated_text = tokenizer.decode(output[0], skip_special_tokens=True)
-    return parse_generated_recipe(generated_text), generated_text
+    output = generator.generate(**inputs, **params, num_return_sequences=num_recipes)
+    texts = tokenizer.batch_decode(output, skip_special_tokens=True)
+    recipes = []
+    for text in texts:
+        recipe = parse_generated_recipe(text)
+        recipe["profile"] = profile
+        recipes.append((recipe, text))
+    return recipes
+
+def retrieve_recipe(ingredients):
+    """Receta del historial con los mismos ingredientes (perfil "cache"), o None"""
+    results = load_history().search(" ".join(normalize_ingredients_key(ingredients)), page_size=1)
+    if not results["results"]:
+        return None
+    entry = results["results"][0]
+    recipe = {
+        "title": entry["title"],
+        "ingredients": entry["ingredients"],
+        "instructions": entry["instructions"],
+        "notes": "",
+        "profile": "cache",
+    }
+    return recipe, entry["raw_text"]
+
+def _recipe_cache_key(ingredients, profile):
+    # El modelo forma parte de la clave: otro generador no reutiliza recetas ajenas
+    return [GENERATOR_MODEL, normalize_ingredients_key(ingredients), profile]
+
+def cached_recipe(ingredients, profiles):
+    """Receta generada por cualquier réplica con estos ingredientes y uno de los perfiles, o None"""
+    cache = get_cache()
+    for profile in profiles:
+        entry = cache.get("recipe", _recipe_cache_key(ingredients, profile))
+        if entry:
+            return entry["recipe"], entry["text"]
+    return None
+
+def generate_recipe_profiled(ingredients, diet, tokenizer, generator, profile, draft=None):
+    """Genera con el perfil indicado; "cache" recurre a la caché compartida, al historial y, si no hay nada, a greedy
+
+    Las recetas generadas se guardan en la caché compartida. Solo se leen de ella
+    con perfiles deterministas (greedy) o bajo carga: con muestreo cada petición
+    debe dar una receta nueva.
+    """
+    if profile == "cache":
+        cached = cached_recipe(ingredients, [name for name in PROFILE_ORDER if name != "cache"])
+        if cached:
+            recipe, text = cached
+            return dict(recipe, profile="cache"), text
+        cached = retrieve_recipe(ingredients)
+        if cached:
+            return cached
+        profile = "greedy"
+    if not GENERATION_PROFILES[profile].get("do_sample"):
+        cached = cached_recipe(ingredients, [profile])
+        if cached:
+            return cached
+    recipe, text = generate_recipe(ingredients, diet, tokenizer, generator, profile, draft)
+    get_cache().set("recipe", _recipe_cache_key(ingredients, profile), {"recipe": recipe, "text": text})
+    return recipe, text
+
+def generate_recipe_shared(ingredients, diet, tokenizer, generator, draft=None):
+    """Genera una receta agrupando las peticiones concurrentes con los mismos ingredientes"""
+    controller = load_controller()
+    profile = controller.choose_profile()
+    # La generación solo depende de los ingredientes, así que la clave no incluye la dieta
+    key = normalize_ingredients_key(ingredients)
+    start = time.perf_counter()
+    with controller.track(profile) as served:
+        recipe, text = load_generation_flight().do(key, generate_recipe_profiled, ingredients, diet,
+                                                    tokenizer, generator, profile, draft)
+        served["profile"] = recipe.get("profile", profile)
+    log.info("Receta generada: %s", recipe.get("title") or "(sin título)",
+             extra={"profile": served["profile"], "ms": round((time.perf_counter() - start) * 1000)})
+    return recipe, text
 
 def to_latin1(text):
     """Convierte texto a latin1 manejando caracteres especiales"""
@@ -397,6 +552,393 @@ def to_latin1(text):
         # Si aún hay problemas, usar solo caracteres ASCII básicos
         return ''.join(char if ord(char) < 128 else '?' for char in text)
 
+def show_history_sidebar(history):
+    """Muestra el buscador paginado del historial de recetas"""
+    st.markdown("### 📚 Historial")
+    query = st.text_input("Buscar recetas", placeholder="e.g. chicken rice", key="history_query")
+    page = st.number_input("Página", min_value=1, value=1, step=1, key="history_page")
+    results = history.search(query, page=page, page_size=5)
+    st.caption(f"{results['total']} recetas · página {results['page']} de {results['pages']}")
+    for entry in results["results"]:
+        with st.expander(entry["title"] or "Generated Recipe"):
+            st.caption(f"{entry['diet']} · {entry['ingredients_input']}")
+            for item in entry["ingredients"]:
+                st.markdown(f"• {item}")
+            for i, step in enumerate(entry["instructions"], 1):
+                st.markdown(f"{i}. {step}")
+
+def build_recipe_pool(ingredients, diet, servings, history, tokenizer, generator, num_generated, max_history=300):
+    """Reúne recetas candidatas (generadas en lote + historial) y su matriz de macros (recetas x 4)"""
+    controller = load_controller()
+    profile = controller.choose_profile()
+    # El lote también cuenta como generación en curso para el controlador de carga
+    with controller.track(profile) as served:
+        batch_recipes = generate_recipes_batch(ingredients, tokenizer, generator, num_generated, profile)
+        if batch_recipes:
+            served["profile"] = batch_recipes[0][0]["profile"]
+    generated = [(recipe, raw_text) for recipe, raw_text in batch_recipes if recipe["ingredients"]]
+    # Consultas de lote: ceden el paso a las de la interfaz en el planificador de FatSecret
+    with request_priority(PRIORITY_BATCH):
+        batch = get_batch_recipe_nutrition([recipe["ingredients"] for recipe, _ in generated], servings)
+    for i, (recipe, raw_text) in enumerate(generated):
+        conflicts = validate_ingredients(" ".join(recipe["ingredients"]), diet)
+        history.record(ingredients, diet, recipe, raw_text, conflicts, batch.result(i))
+    recipes = [recipe for recipe, _ in generated]
+
+    # Recetas anteriores con nutrición ya calculada (sin nuevas consultas). El
+    # historial se escribe en segundo plano, así que puede contener ya (o todavía
+    # no) las recetas recién generadas: se descartan las repetidas
+    seen = {_recipe_key(recipe) for recipe in recipes}
+    stored, page = [], 1
+    while len(recipes) + len(stored) < num_generated + max_history:
+        results = history.search("", page=page, page_size=100)
+        for entry in results["results"]:
+            key = _recipe_key(entry)
+            if entry["ingredients"] and key not in seen:
+                seen.add(key)
+                stored.append(entry)
+        if page >= results["pages"]:
+            break
+        page += 1
+    stored_macros = nutrition_matrix([entry["nutrition"] for entry in stored])
+    keep = stored_macros[:, 0] > 0 if len(stored) else np.zeros(0, dtype=bool)
+    recipes += [entry for entry, kept in zip(stored, keep) if kept]
+    return recipes, np.vstack([batch.macros, stored_macros[keep]])
+
+def _recipe_key(recipe):
+    """Identidad de una receta para no repetirla en el plan: título e ingredientes"""
+    return (recipe["title"] or "").strip().lower(), tuple(item.strip().lower() for item in recipe["ingredients"])
+
+def show_meal_plan(ingredients, diet, servings, targets, num_generated, history, tokenizer, generator):
+    """Genera y muestra un plan semanal que se ajusta a los objetivos nutricionales"""
+    with st.spinner("Building your weekly meal plan..."):
+        pool, macros = build_recipe_pool(ingredients, diet, servings, history, tokenizer, generator, num_generated)
+        if not pool:
+            st.error("Could not build a pool of candidate recipes")
+            return
+        allowed = np.array([
+            not validate_ingredients(" ".join(recipe["ingredients"]), diet) for recipe in pool
+        ])
+        target_vector = nutrition_vector(targets)
+        try:
+            plan, _ = plan_meals(macros, target_vector, days=7, meals_per_day=3, allowed=allowed)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+    day_sums, deviation = summarize_plan(plan, macros, target_vector)
+    st.markdown('<div class="recipe-card recipe-content">', unsafe_allow_html=True)
+    st.markdown('<h1 class="gradient-header">🗓️ Weekly Meal Plan</h1>', unsafe_allow_html=True)
+    st.caption(f"{len(pool)} candidate recipes · {int(allowed.sum())} match '{diet}'")
+    for day in range(plan.shape[0]):
+        st.markdown(f'<h3 class="section-header">Day {day + 1}</h3>', unsafe_allow_html=True)
+        rows = []
+        for meal, index in zip(["Breakfast", "Lunch", "Dinner"], plan[day]):
+            recipe = pool[index]
+            rows.append([meal, recipe["title"] or "Generated Recipe"] + [round(v, 1) for v in macros[index]])
+        rows.append(["Total", ""] + [round(v, 1) for v in day_sums[day]])
+        st.table(pd.DataFrame(rows, columns=["Meal", "Recipe"] + MACRO_KEYS))
+    summary = pd.DataFrame({
+        "Objetivo diario": target_vector,
+        "Media del plan": day_sums.mean(axis=0).round(1),
+        "Desviación media": [f"{d:+.0%}" for d in deviation.mean(axis=0)],
+    }, index=MACRO_KEYS)
+    st.table(summary)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def show_metrics_sidebar():
+    """Muestra las métricas de agrupación de peticiones"""
+    with st.expander("📈 Métricas"):
+        for flight in (load_generation_flight(), nutrition_estimator.nutrition_flight):
+            stats = flight.stats()
+            st.markdown(f"**{flight.name}**")
+            st.caption(
+                f"{stats['requests']} peticiones · {stats['executions']} ejecuciones · "
+                f"{stats['shared']} compartidas ({stats['coalesce_rate']:.0%}) · "
+                f"{stats['saved_seconds']:.1f}s ahorrados · {stats['in_flight']} en curso"
+            )
+        models = load_registry().metrics()
+        rss = f"RSS {models['rss_mb']:.0f} MB · " if models["rss_mb"] is not None else ""
+        st.markdown(f"**Modelos** ({rss}{models['resident_mb']:.0f} MB en modelos)")
+        for name, info in models["models"].items():
+            load = f"{info['last_load_s']:.1f}s desde {info['last_load_from']}" if info["last_load_s"] is not None else "sin cargar"
+            st.caption(
+                f"{name}: {'residente' if info['resident'] else 'descargado'} · {info['refs']} en uso · "
+                f"{info['loads']} cargas · {info['evictions']} expulsiones · última carga {load}"
+            )
+        lookups = nutrition_estimator.get_lookup_stats()
+        st.markdown("**FatSecret**")
+        st.caption(
+            f"{lookups['ingredients']} ingredientes · {lookups['calls_per_ingredient']:.2f} llamadas/ingrediente · "
+            f"{lookups['avg_latency_ms']:.0f} ms/ingrediente · {lookups['from_description']} desde la búsqueda · "
+            f"{lookups['detail_fallbacks']} con food.get · {lookups['cache_hits']} desde la caché"
+        )
+        suggestions = load_autocomplete().stats()
+        st.caption(
+            f"Autocompletado: {suggestions['names']} ingredientes · {suggestions['learned']} aprendidos de FatSecret · "
+            f"{suggestions['model_words']} palabras del modelo · {suggestions['avg_us']:.0f} µs/consulta"
+        )
+        load = load_controller().stats()
+        st.markdown(f"**Generación** (perfil {load['profile']})")
+        served = " · ".join(f"{name} {count}" for name, count in load["served"].items())
+        st.caption(
+            f"p95 {load['p95_ms']:.0f} ms / SLO {load['slo_ms']:.0f} ms · {load['in_flight']} en curso · "
+            f"{load['transitions']} cambios de perfil · servidas: {served}"
+        )
+        if DRAFT_MODEL:
+            spec = speculative_stats.stats()
+            st.caption(
+                f"Decodificación asistida ({DRAFT_MODEL}): aceptación {spec['acceptance_rate']:.0%} · "
+                f"{spec['tokens_per_main_step']:.2f} tokens/paso · {spec['tokens_per_s']:.1f} tokens/s"
+            )
+        regen = regeneration_stats.stats()
+        if regen["regenerations"]:
+            st.caption(
+                f"Regeneraciones parciales: {regen['regenerations']} · {regen['tokens_saved']} tokens ahorrados "
+                f"({regen['token_savings']:.0%}) · {regen['saved_seconds']:.1f}s ahorrados · "
+                f"codificador reutilizado {regen['encoder_hits']} veces"
+            )
+        cache = get_cache().stats()
+        st.markdown(f"**Caché compartida** ({cache['backend']} · réplica {cache['replica']})")
+        for namespace, values in cache["namespaces"].items():
+            st.caption(
+                f"{namespace}: aciertos {values['hit_rate']:.0%} · de otras réplicas {values['cross_replica_rate']:.0%} · "
+                f"{values['sets']} escrituras · {values['errors']} errores"
+            )
+        scheduler = get_scheduler().stats()
+        st.caption(
+            f"Cola: {scheduler['queue_depth_interactive']} interactivas · {scheduler['queue_depth_batch']} de lote · "
+            f"{scheduler['retry_pending']} reintentos pendientes · {scheduler['throttle_events']} saturaciones · "
+            f"{scheduler['expired']} caducadas"
+        )
+        history = load_history().stats()
+        st.markdown("**Historial**")
+        st.caption(
+            f"{history['written']} recetas guardadas · {history['pending']} pendientes · "
+            f"{history['write_errors']} lotes fallidos ({history['lost']} recetas perdidas) · "
+            f"{history['compact_errors']} compactaciones fallidas"
+        )
+
+def show_profiling_sidebar():
+    """Panel de administración: perfilar las próximas generaciones, nutriciones y PDFs"""
+    with st.expander("🩺 Profiling"):
+        count = st.number_input("Capturas por ruta", min_value=1, max_value=20, value=3, key="profile_count")
+        if st.button("Perfilar las próximas ejecuciones"):
+            profile_capture.arm(int(count))
+        stats = profile_capture.stats()
+        pending = " · ".join(f"{label} {n}" for label, n in stats["pending"].items() if n) or "ninguna"
+        st.caption(
+            f"Pendientes: {pending} · {stats['captures']} capturas en disco "
+            f"({stats['mb']:.1f} / {stats['max_mb']:.0f} MB)"
+        )
+        for item in reversed(list_captures()[-5:]):
+            st.caption(f"{item['name']} · {item['bytes'] / 1024:.0f} KB")
+
+def regenerate_recipe_section(current, section):
+    """Regenera una sección de la receta actual conservando el texto anterior como prefijo"""
+    registry = load_registry()
+    controller = load_controller()
+    # Regenerar siempre decodifica: con "cache" se usa greedy (y así se registra)
+    profile = controller.choose_profile()
+    if profile == "cache":
+        profile = "greedy"
+    try:
+        with request_context(current.get("request_id")), controller.track(profile), \
+                registry.acquire("tokenizer") as tokenizer, registry.acquire("generator") as generator:
+            text = regenerate_section(tokenizer, generator, current["prompt"], current["raw_text"], section,
+                                      GENERATION_PROFILES[profile])
+            if text is None:
+                # El texto original no tiene la sección: regeneración completa
+                _, text = generate_recipe(current["prompt"], current["diet"], tokenizer, generator, profile)
+            log.info("Sección regenerada: %s", section, extra={"profile": profile})
+    except Exception as e:
+        st.session_state["regenerate_error"] = str(e)
+        return
+    recipe = parse_generated_recipe(text)
+    recipe["profile"] = profile
+    current.update(recipe=recipe, raw_text=text, recorded=False, substitutions=None)
+    if section == "ingredients":
+        # Ingredientes nuevos: recalcular la nutrición
+        current["nutrition"] = None
+
+def apply_substitutions(current, diet):
+    """Adapta la receta actual a una dieta cambiando los ingredientes prohibidos, sin regenerar"""
+    index = load_substitutions()
+    recipe, applied = index.rewrite(current["recipe"], diet)
+    current.update(
+        recipe=recipe,
+        raw_text=index.rewrite_text(current["raw_text"], diet),
+        diet=diet,
+        substitutions=(current.get("substitutions") or []) + applied,
+        nutrition=None,
+        recorded=False,
+    )
+
+def format_substitution(substitution):
+    """Texto de una sustitución con su diferencia de calorías"""
+    text = f"{substitution.original} → {substitution.substitute}"
+    if substitution.delta:
+        text += f" ({substitution.delta['cal']:+.0f} kcal/100 g)"
+    return text
+
+def replace_ingredient(item, replacement):
+    """Sustituye un elemento del cuadro de ingredientes por la sugerencia elegida"""
+    items = split_items(st.session_state.get("ingredients_text", ""))
+    st.session_state["ingredients_text"] = ", ".join(replacement if entry == item else entry for entry in items)
+
+def show_ingredient_checks(checks):
+    """Sugerencias para los ingredientes escritos, antes de generar (autocompletado y erratas)"""
+    for i, check in enumerate(checks):
+        if check.status == STATUS_KNOWN or (check.partial and not check.suggestions):
+            continue
+        if check.partial:
+            label = f"💡 {check.item}…"
+        elif check.status == STATUS_MODEL:
+            label = f"ℹ️ '{check.item}': no nutrition data"
+        else:
+            label = f"❓ '{check.item}' is not a known ingredient" + (", did you mean:" if check.suggestions else "")
+        cols = st.columns([3] + [2] * len(check.suggestions[:3]))
+        cols[0].caption(label)
+        for col, suggestion in zip(cols[1:], check.suggestions):
+            name = suggestion.name if suggestion.name == suggestion.canonical else f"{suggestion.name} ({suggestion.canonical})"
+            col.button(name, key=f"suggestion-{i}-{suggestion.name}", on_click=replace_ingredient,
+                       args=(check.item, suggestion.name))
+
+def show_recipe(current, history):
+    """Muestra la receta actual con su nutrición, instrucciones, PDF y botones de regeneración"""
+    recipe, servings = current["recipe"], current["servings"]
+    nutrition_info = current["nutrition"]
+    index = load_substitutions()
+    # Validación de ingredientes (si la receta ya se adaptó, se comprueba su contenido)
+    if current.get("substitutions") is not None:
+        lines = recipe["ingredients"] + recipe["instructions"]
+        conflicts = [f"⚠️ {item.capitalize()} is not {current['diet'].lower()}"
+                     for item in index.conflicts(lines, current["diet"])] if current["diet"] in index.rules else []
+    else:
+        conflicts = validate_ingredients(current["prompt"], current["diet"])
+    if conflicts:
+        st.markdown('<div class="conflict-warning">', unsafe_allow_html=True)
+        st.markdown("<h3>⚠️ Ingredient Conflicts Detected</h3>", unsafe_allow_html=True)
+        for conflict in conflicts:
+            st.markdown(f"<p>{conflict}</p>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # Tip del chef elegido al generar la receta
+    chef_tip = current["chef_tip"]
+
+    st.markdown('<div class="recipe-card recipe-content">', unsafe_allow_html=True)
+    st.markdown(f'<h1 class="gradient-header">{recipe["title"] if recipe["title"] else "Generated Recipe"}</h1>', unsafe_allow_html=True)
+    if recipe.get("profile") == "cache":
+        st.caption("⚡ High demand: showing a similar recipe from history")
+    elif recipe.get("profile", "full") != "full":
+        st.caption(f"⚡ High demand: generated in '{recipe['profile']}' mode")
+    if recipe.get("errors"):
+        st.caption(f"⚠️ Incomplete model output: {', '.join(recipe['errors'])}")
+    
+    col1, col2 = st.columns([1,1])
+    
+    with col1:
+        st.markdown('<h3 class="section-header">🥕 Ingredients</h3>', unsafe_allow_html=True)
+        for item in recipe["ingredients"]:
+            st.markdown(f'<span class="ingredient-dot">•</span> {item}', unsafe_allow_html=True)
+        
+        st.markdown('<h3 class="section-header">📊 Nutrition Information</h3>', unsafe_allow_html=True)
+        st.caption(f"Per serving ({servings} servings)")
+        
+        # Obtener datos nutricionales reales usando FatSecret API
+        try:
+            with st.spinner("🔍 Calculando información nutricional..."):
+                # Se calcula una vez por versión de la receta, no en cada recarga
+                if nutrition_info is None:
+                    with request_context(current.get("request_id")), profile_capture.capture("nutrition"):
+                        if recipe["ingredients"]:
+                            # Usar las cantidades de la receta generada, por porción
+                            nutrition_info = get_recipe_nutrition(recipe["ingredients"], servings)
+                        else:
+                            # Obtener datos nutricionales reales
+                            nutrition_info = get_real_nutrition(current["canonical"])
+                    current["nutrition"] = nutrition_info
+                    load_autocomplete().learn_from_nutrition(nutrition_info)
+                
+                # Crear DataFrame para mostrar (el formateo se hace solo aquí)
+                formatted = nutrition_info.formatted()
+                nutrition_data = {
+                    "Nutriente": list(formatted),
+                    "Cantidad": list(formatted.values())
+                }
+                
+                # Mostrar tabla con diseño mejorado
+                df_nutrition = pd.DataFrame(nutrition_data)
+                st.table(df_nutrition)
+                
+                # Mostrar información sobre la fuente de datos
+                if nutrition_info.source == SOURCE_FATSECRET:
+                    st.success("✅ Datos nutricionales de FatSecret API")
+                elif nutrition_info.from_fatsecret:
+                    st.info(f"ℹ️ Datos de FatSecret con estimaciones (confianza {nutrition_info.confidence:.0%})")
+                else:
+                    st.info("ℹ️ Estimación nutricional (FatSecret no disponible)")
+                if nutrition_info.breakdown:
+                    with st.expander("Desglose por ingrediente"):
+                        st.table(pd.DataFrame(
+                            [[item.name, item.source] + [round(v, 1) for v in item.macros] for item in nutrition_info.breakdown],
+                            columns=["Ingrediente", "Origen"] + list(formatted)
+                        ))
+                    
+        except Exception as e:
+            log.warning("Error calculando la nutrición: %s", e)
+            st.warning("⚠️ No se pudo calcular la información nutricional")
+            # Fallback a datos por defecto
+            nutrition_info = NutritionResult([350, 25, 45, 12], SOURCE_DEFAULT)
+            formatted = nutrition_info.formatted(decimals=0, prefix="~")
+            nutrition_data = {
+                "Nutriente": list(formatted),
+                "Cantidad": list(formatted.values())
+            }
+            st.table(pd.DataFrame(nutrition_data))
+            st.caption("*Valores aproximados")
+            current["nutrition"] = nutrition_info
+    with col2:
+        st.markdown('<h3 class="section-header">📝 Instructions</h3>', unsafe_allow_html=True)
+        for i, step in enumerate(recipe["instructions"], 1):
+            st.markdown(f'<div class="step-item"><span class="step-number">{i}</span> {step}</div>', unsafe_allow_html=True)
+        
+        st.markdown(f'<div class="chef-tip"><strong>Chef Tip:</strong> {chef_tip}</div>', unsafe_allow_html=True)
+    
+    # Botón para guardar como PDF
+    pdf_bytes = create_pdf_cached(recipe, chef_tip)
+    if pdf_bytes:  # Solo mostrar si el PDF tiene contenido
+        st.download_button(
+            label="📥 Save as PDF",
+            data=pdf_bytes,
+            file_name=f"{recipe['title'].replace(' ', '_')}.pdf" if recipe['title'] else "recipe.pdf",
+            mime="application/pdf"
+        )
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # Adaptar la receta a una dieta con el índice de sustituciones
+    if current.get("substitutions"):
+        st.caption("🔁 Substitutions: " + " · ".join(format_substitution(sub) for sub in current["substitutions"]))
+    lines = recipe["ingredients"] + recipe["instructions"]
+    fixable = [diet for diet in index.diets if index.conflicts(lines, diet)]
+    if fixable:
+        cols = st.columns(len(fixable))
+        for col, diet in zip(cols, fixable):
+            col.button(f"✨ Make it {diet.lower()}", key=f"make_{diet}", on_click=apply_substitutions, args=(current, diet))
+
+    # Regenerar solo una parte de la receta
+    if st.session_state.pop("regenerate_error", None):
+        st.error("Error regenerating the recipe section")
+    col1, col2 = st.columns(2)
+    col1.button("🔄 New ingredients & instructions", on_click=regenerate_recipe_section, args=(current, "ingredients"))
+    col2.button("🔄 New instructions", on_click=regenerate_recipe_section, args=(current, "directions"))
+
+    # Guardar en el historial (escritura asíncrona, no bloquea), una vez por versión
+    if not current["recorded"]:
+        history.record(current["ingredients"], current["diet"], recipe, current["raw_text"], conflicts, nutrition_info)
+        current["recorded"] = True
+
 # Interfaz principal
 def main():
     # Custom CSS for new color palette and modern look
@@ -603,6 +1145,10 @@ def main():
         </style>
     ''', unsafe_allow_html=True)
 
+    # Los modelos se cargan bajo demanda desde el registro compartido
+    registry = load_registry()
+    history = load_history()
+
     st.markdown('<div class="gradient-header"><h1>🍳 Recipe Generator</h1><p>Create delicious recipes based on your ingredients and dietary preferences</p></div>', unsafe_allow_html=True)
 
     # Barra lateral con información de FatSecret
@@ -624,123 +1170,102 @@ def main():
         configura tu IP en FatSecret Platform.
         """)
 
+        st.markdown("---")
+        show_history_sidebar(history)
+
+        st.markdown("---")
+        show_metrics_sidebar()
+        if ADMIN_CONTROLS:
+            show_profiling_sidebar()
+
     st.markdown('<div class="recipe-card">', unsafe_allow_html=True)
     st.markdown('<h2 class="section-header">What would you like to cook today?</h2>', unsafe_allow_html=True)
 
     ingredients = st.text_area(
         "🥕 Ingredients (separated by commas):",
         placeholder="e.g. chicken, rice, tomatoes, onion",
-        height=100
+        height=100,
+        key="ingredients_text"
     )
+    ingredient_checks = load_autocomplete().validate(ingredients)
+    show_ingredient_checks(ingredient_checks)
 
     diet_options = [
         "Normal", "Vegan", "Gluten Free", "Low Carb", "Vegetarian", "Dairy Free"
     ]
     diet = st.selectbox("❤️ Dietary preference:", diet_options)
+    servings = st.number_input("🍽️ Servings:", min_value=1, max_value=12, value=4, step=1)
 
-    generate = st.button("✨ Generate Recipe", type="primary")
+    mode = st.radio("📋 Mode:", ["Single recipe", "Weekly meal plan"], horizontal=True)
+    generate, generate_plan = False, False
+    if mode == "Weekly meal plan":
+        cols = st.columns(4)
+        targets = {
+            key: col.number_input(f"{key}/día", min_value=1, value=value, step=10)
+            for col, (key, value) in zip(cols, DEFAULT_TARGETS.items())
+        }
+        num_generated = st.slider("New candidate recipes", min_value=3, max_value=30, value=12)
+        generate_plan = st.button("🗓️ Generate Meal Plan", type="primary")
+    else:
+        generate = st.button("✨ Generate Recipe", type="primary")
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Forma canónica de los ingredientes, calculada una vez por petición y usada en
+    # el prompt, la validación, la nutrición y las claves de caché
+    canonical_ingredients = normalize_ingredients(ingredients)
+    canonical_text = ", ".join(canonical_ingredients)
+
+    if generate_plan:
+        if not ingredients:
+            st.warning("Please enter at least one ingredient")
+        else:
+            with registry.acquire("tokenizer") as tokenizer, registry.acquire("generator") as generator:
+                with request_context():
+                    show_meal_plan(canonical_text, diet, servings, targets, num_generated, history, tokenizer, generator)
+
     if generate:
         if not ingredients:
             st.warning("Please enter at least one ingredient")
         else:
             with st.spinner("Creating your personalized recipe..."):
-                diet_check = classifier(diet)[0][0]
+                with registry.acquire("classifier") as classifier:
+                    diet_check = classifier(diet)[0][0]
                 if diet_check['score'] < 0.7:
                     st.warning(f"The restriction '{diet}' may not be well defined")
                 recipe, recipe_raw_text = None, None
+                # El mismo identificador acompaña a la generación y al cálculo de nutrición
+                request_id = new_request_id()
                 try:
-                    recipe, recipe_raw_text = generate_recipe(ingredients, diet, tokenizer, generator)
+                    with registry.acquire("tokenizer") as tokenizer, registry.acquire("generator") as generator, \
+                            acquire_draft(registry) as draft:
+                        # Palabras que conoce el modelo: validan ingredientes sin datos nutricionales
+                        load_autocomplete().add_model_vocabulary(tokenizer)
+                        with request_context(request_id):
+                            unknown = [check.item for check in ingredient_checks if check.status != STATUS_KNOWN]
+                            if unknown:
+                                log.info("Ingredientes sin datos nutricionales", extra={"items": unknown})
+                            recipe, recipe_raw_text = generate_recipe_shared(canonical_text, diet, tokenizer, generator, draft)
                 except Exception as e:
                     st.error(f"Error generating recipe: {e}")
                 if recipe:
-                    # Validación de ingredientes
-                    conflicts = validate_ingredients(ingredients, diet)
-                    if conflicts:
-                        st.markdown('<div class="conflict-warning">', unsafe_allow_html=True)
-                        st.markdown("<h3>⚠️ Ingredient Conflicts Detected</h3>", unsafe_allow_html=True)
-                        for conflict in conflicts:
-                            st.markdown(f"<p>{conflict}</p>", unsafe_allow_html=True)
-                        st.markdown("</div>", unsafe_allow_html=True)
-                    
-                    # Obtener tip aleatorio del chef
-                    chef_tip = get_random_chef_tip()
-                    
-                    st.markdown('<div class="recipe-card recipe-content">', unsafe_allow_html=True)
-                    st.markdown(f'<h1 class="gradient-header">{recipe["title"] if recipe["title"] else "Generated Recipe"}</h1>', unsafe_allow_html=True)
-                    
-                    col1, col2 = st.columns([1,1])
-                    
-                    with col1:
-                        st.markdown('<h3 class="section-header">🥕 Ingredients</h3>', unsafe_allow_html=True)
-                        for item in recipe["ingredients"]:
-                            st.markdown(f'<span class="ingredient-dot">•</span> {item}', unsafe_allow_html=True)
-                        
-                        st.markdown('<h3 class="section-header">📊 Nutrition Information</h3>', unsafe_allow_html=True)
-                        
-                        # Obtener datos nutricionales reales usando FatSecret API
-                        try:
-                            with st.spinner("🔍 Calculando información nutricional..."):
-                                # Convertir ingredientes de texto a lista
-                                ingredients_list = [ing.strip() for ing in ingredients.split(',') if ing.strip()]
-                                
-                                # Obtener datos nutricionales reales
-                                nutrition_info = get_real_nutrition(ingredients_list)
-                                
-                                # Crear DataFrame para mostrar
-                                nutrition_data = {
-                                    "Nutriente": ["Calorías", "Proteínas", "Carbohidratos", "Grasas"],
-                                    "Cantidad": [
-                                        nutrition_info.get("Calorías", "N/A"),
-                                        nutrition_info.get("Proteínas", "N/A"),
-                                        nutrition_info.get("Carbohidratos", "N/A"),
-                                        nutrition_info.get("Grasas", "N/A")
-                                    ]
-                                }
-                                
-                                # Mostrar tabla con diseño mejorado
-                                df_nutrition = pd.DataFrame(nutrition_data)
-                                st.table(df_nutrition)
-                                
-                                # Mostrar información sobre la fuente de datos
-                                if "FatSecret" in str(nutrition_info):
-                                    st.success("✅ Datos nutricionales de FatSecret API")
-                                else:
-                                    st.info("ℹ️ Estimación nutricional (FatSecret no disponible)")
-                                    
-                        except Exception as e:
-                            st.warning("⚠️ No se pudo calcular la información nutricional")
-                            # Fallback a datos por defecto
-                            nutrition_data = {
-                                "Nutriente": ["Calorías", "Proteínas", "Carbohidratos", "Grasas"],
-                                "Cantidad": ["~350 kcal", "~25g", "~45g", "~12g"]
-                            }
-                            st.table(pd.DataFrame(nutrition_data))
-                            st.caption("*Valores aproximados")
-                    
-                    with col2:
-                        st.markdown('<h3 class="section-header">📝 Instructions</h3>', unsafe_allow_html=True)
-                        for i, step in enumerate(recipe["instructions"], 1):
-                            clean_step = re.sub(r'^\d+\.\s*', '', step)
-                            st.markdown(f'<div class="step-item"><span class="step-number">{i}</span> {clean_step}</div>', unsafe_allow_html=True)
-                        
-                        st.markdown(f'<div class="chef-tip"><strong>Chef Tip:</strong> {chef_tip}</div>', unsafe_allow_html=True)
-                    
-                    # Botón para guardar como PDF
-                    pdf_bytes = create_pdf(recipe)
-                    if pdf_bytes:  # Solo mostrar si el PDF tiene contenido
-                        st.download_button(
-                            label="📥 Save as PDF",
-                            data=pdf_bytes,
-                            file_name=f"{recipe['title'].replace(' ', '_')}.pdf" if recipe['title'] else "recipe.pdf",
-                            mime="application/pdf"
-                        )
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
+                    # La receta se conserva entre recargas para poder regenerar secciones
+                    st.session_state["current_recipe"] = {
+                        "recipe": recipe,
+                        "raw_text": recipe_raw_text,
+                        "prompt": canonical_text,
+                        "ingredients": ingredients,
+                        "canonical": canonical_ingredients,
+                        "diet": diet,
+                        "servings": servings,
+                        "nutrition": None,
+                        "chef_tip": get_random_chef_tip(),
+                        "recorded": False,
+                        "request_id": request_id,
+                    }
 
-# Cargar modelos al iniciar
-classifier, tokenizer, generator = load_models()
+    current = st.session_state.get("current_recipe")
+    if current and mode == "Single recipe":
+        show_recipe(current, history)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
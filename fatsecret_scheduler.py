@@ -0,0 +1,289 @@
+import os
+import time
+import heapq
+import random
+import threading
+import itertools
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+# Prioridades: menor número = se atiende antes
+PRIORITY_INTERACTIVE = 0   # consultas de la interfaz (el usuario está esperando)
+PRIORITY_BATCH = 10        # planes de comidas, precarga y trabajos en lote
+
+# Plazo por defecto (segundos) que una petición puede esperar en cola
+DEFAULT_DEADLINES = {PRIORITY_INTERACTIVE: 10.0, PRIORITY_BATCH: 120.0}
+
+# Límite de la plataforma (configurable según el plan contratado)
+DEFAULT_RATE = float(os.environ.get("FATSECRET_RATE_PER_S", "5"))
+DEFAULT_BURST = float(os.environ.get("FATSECRET_BURST", "10"))
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("FATSECRET_MAX_CONCURRENCY", "4"))
+DEFAULT_MAX_RETRIES = int(os.environ.get("FATSECRET_MAX_RETRIES", "3"))
+# Tiempo máximo de una petición HTTP (nunca más de lo que le queda hasta su plazo)
+DEFAULT_REQUEST_TIMEOUT = float(os.environ.get("FATSECRET_REQUEST_TIMEOUT_S", "10"))
+
+# Respuestas HTTP que indican saturación y merecen reintento
+THROTTLE_STATUS = {429, 503}
+
+# Prioridad de las peticiones hechas desde el contexto actual
+_current_priority = contextvars.ContextVar("fatsecret_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def request_priority(priority):
+    """Asigna una prioridad a las peticiones a FatSecret hechas dentro del bloque"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+class DeadlineExceeded(Exception):
+    """La petición no pudo enviarse antes de su plazo"""
+
+class TokenBucket:
+    """Cubo de fichas: `rate` peticiones por segundo con ráfagas de hasta `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """Segundos hasta que haya una ficha disponible"""
+        now = time.monotonic() if now is None else now
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        """Detiene el envío para todos tras una señal de saturación del servidor"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+class _Job:
+    """Petición en cola"""
+    __slots__ = ("fn", "priority", "deadline", "seq", "attempts", "not_before",
+                 "event", "result", "error", "cancelled", "sent")
+
+    def __init__(self, fn, priority, deadline, seq):
+        self.fn = fn
+        self.priority = priority
+        self.deadline = deadline
+        self.seq = seq
+        self.attempts = 0
+        self.not_before = 0.0
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.sent = False
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.event.set()
+
+def _retry_after(response):
+    """Segundos indicados por la cabecera Retry-After (numérica o fecha HTTP)"""
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+class RequestScheduler:
+    """Planificador compartido de peticiones a FatSecret
+
+    Todas las peticiones del proceso pasan por un cubo de fichas común. Las de la
+    interfaz se atienden antes que las de lote; las que superan su plazo en cola
+    se descartan, y las respuestas de saturación (429/503) se reintentan con
+    espera exponencial con jitter, respetando Retry-After y pausando el envío
+    para todos los llamantes.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, base_backoff=0.5, max_backoff=30.0,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.bucket = TokenBucket(rate, burst)
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._ready = []
+        self._delayed = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fatsecret")
+        # Hilos libres: una petición solo sale de la cola (por prioridad) cuando hay uno
+        self._slots = threading.Semaphore(max_concurrency)
+        self._stats = {"submitted": 0, "sent": 0, "completed": 0, "retries": 0,
+                       "throttle_events": 0, "expired": 0, "errors": 0}
+        threading.Thread(target=self._dispatch_loop, name="fatsecret-scheduler", daemon=True).start()
+
+    def call(self, fn, priority=None, timeout=None):
+        """Ejecuta fn(timeout) (una petición HTTP) respetando la cuota; bloquea hasta obtener la respuesta
+
+        fn recibe los segundos que puede durar la petición: request_timeout como
+        máximo y nunca más de lo que queda hasta el plazo, para que una conexión
+        colgada no ocupe un hilo del planificador indefinidamente.
+        """
+        priority = _current_priority.get() if priority is None else priority
+        timeout = DEFAULT_DEADLINES.get(priority, DEFAULT_DEADLINES[PRIORITY_BATCH]) if timeout is None else timeout
+        job = _Job(fn, priority, time.monotonic() + timeout, next(self._seq))
+        with self._cond:
+            self._stats["submitted"] += 1
+            heapq.heappush(self._ready, (job.priority, job.seq, job))
+            self._cond.notify()
+
+        if not job.event.wait(timeout):
+            with self._cond:
+                # Si sigue en cola, se cancela; si ya se envió, esperar su respuesta
+                if job.attempts == 0 and not job.sent:
+                    job.cancelled = True
+                    self._stats["expired"] += 1
+                    raise DeadlineExceeded("Plazo superado en la cola de FatSecret")
+            # La petición en curso termina, como mucho, al agotar su propio timeout
+            if not job.event.wait(self.request_timeout + 1.0):
+                raise DeadlineExceeded("La petición a FatSecret no se completó a tiempo")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    # ==================== DESPACHO ====================
+
+    def _dispatch_loop(self):
+        """Hilo despachador: entrega las peticiones por prioridad cuando hay fichas"""
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                job = self._next_job()
+            try:
+                self._executor.submit(self._run_in_slot, job)
+            except RuntimeError:
+                # El intérprete se está cerrando
+                job.finish(error=DeadlineExceeded("El planificador de FatSecret se ha detenido"))
+                return
+
+    def _next_job(self):
+        """Espera (con el lock tomado) a la siguiente petición lista y con ficha disponible"""
+        while True:
+            now = time.monotonic()
+            # Los reintentos vuelven a la cola cuando vence su espera
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, job = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (job.priority, job.seq, job))
+            # Descartar las peticiones que ya superaron su plazo
+            while self._ready and (self._ready[0][2].deadline < now or self._ready[0][2].cancelled):
+                _, _, job = heapq.heappop(self._ready)
+                if not job.cancelled:
+                    self._stats["expired"] += 1
+                    job.finish(error=DeadlineExceeded("Plazo superado en la cola de FatSecret"))
+            if self._ready:
+                wait = self.bucket.wait_time(now)
+                if wait <= 0:
+                    _, _, job = heapq.heappop(self._ready)
+                    self.bucket.consume()
+                    job.sent = True
+                    self._stats["sent"] += 1
+                    return job
+            else:
+                wait = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(wait)
+
+    def _backoff(self, job, response):
+        """Espera antes del siguiente intento: Retry-After o exponencial con jitter"""
+        hint = _retry_after(response)
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** (job.attempts - 1)))
+        backoff *= random.uniform(0.5, 1.5)
+        return max(hint or 0.0, backoff)
+
+    def _run_in_slot(self, job):
+        try:
+            self._run(job)
+        finally:
+            self._slots.release()
+
+    def _run(self, job):
+        """Ejecuta una petición y decide si reintentarla"""
+        remaining = job.deadline - time.monotonic()
+        if remaining <= 0:
+            with self._cond:
+                self._stats["expired"] += 1
+            job.finish(error=DeadlineExceeded("Plazo superado antes de enviar la petición a FatSecret"))
+            return
+        job.attempts += 1
+        response, error = None, None
+        try:
+            response = job.fn(min(self.request_timeout, remaining))
+        except (OSError, ConnectionError, TimeoutError) as e:
+            error = e
+        except Exception as e:
+            # Errores que no se arreglan reintentando
+            with self._cond:
+                self._stats["errors"] += 1
+            job.finish(error=e)
+            return
+
+        throttled = response is not None and getattr(response, "status_code", None) in THROTTLE_STATUS
+        if (throttled or error is not None) and job.attempts <= self.max_retries:
+            delay = self._backoff(job, response)
+            with self._cond:
+                self._stats["retries"] += 1
+                if throttled:
+                    self._stats["throttle_events"] += 1
+                    self.bucket.pause(delay)
+                job.not_before = time.monotonic() + delay
+                heapq.heappush(self._delayed, (job.not_before, job.seq, job))
+                self._cond.notify()
+            return
+
+        with self._cond:
+            if error is not None:
+                self._stats["errors"] += 1
+            else:
+                self._stats["completed"] += 1
+        job.finish(result=response, error=error)
+
+    # ==================== MÉTRICAS ====================
+
+    def stats(self):
+        """Profundidad de cola por prioridad, eventos de saturación, reintentos y caducadas"""
+        with self._cond:
+            stats = dict(self._stats)
+            depth = {}
+            for priority, _, _ in self._ready:
+                depth[priority] = depth.get(priority, 0) + 1
+            stats["queue_depth"] = len(self._ready)
+            stats["queue_depth_interactive"] = depth.get(PRIORITY_INTERACTIVE, 0)
+            stats["queue_depth_batch"] = sum(v for k, v in depth.items() if k != PRIORITY_INTERACTIVE)
+            stats["retry_pending"] = len(self._delayed)
+            stats["paused_s"] = max(0.0, self.bucket.paused_until - time.monotonic())
+        return stats
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Planificador compartido por todo el proceso"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Autocompletado y validación de los ingredientes escritos por el usuario.
+
+Los nombres conocidos se guardan en arrays ordenados: la búsqueda por prefijo es
+un bisect (también desde cualquier palabra: "breast" -> "chicken breast"). Las
+búsquedas aproximadas corrigen cada palabra con un índice de borrados
+("chiken" -> "chicken", "cebola" -> "cebolla"). El vocabulario sale de:
+
+    léxico       ingredient_normalizer.LEXICON (sinónimos español/inglés)
+    nutrición    NUTRITION_MAP y los alimentos de substitutions.json
+    fatsecret    ingredientes que FatSecret ya resolvió (historial y sesión actual)
+    modelo       palabras completas del tokenizador (solo para validar, no se sugieren)
+
+    python ingredient_autocomplete.py chik "chiken brest" cebola
+    python ingredient_autocomplete.py --benchmark
+"""
+
+import os
+import re
+import time
+import bisect
+import random
+import argparse
+import itertools
+import threading
+from collections import namedtuple
+from ingredient_normalizer import LEXICON, SPANISH_ADJECTIVES, STOPWORDS, normalize_ingredient, _strip_accents
+from nutrition_estimator import NUTRITION_MAP
+from nutrition_result import SOURCE_FATSECRET
+from substitutions import SubstitutionIndex
+
+# Ediciones como máximo en una palabra larga (las de 3-5 letras admiten una, las más cortas ninguna)
+MAX_EDITS = int(os.environ.get("RECIPE_AUTOCOMPLETE_MAX_EDITS", "2"))
+# Sugerencias por elemento
+SUGGESTION_LIMIT = int(os.environ.get("RECIPE_AUTOCOMPLETE_LIMIT", "5"))
+
+SOURCE_NUTRITION = "nutrition"
+SOURCE_LEXICON = "lexicon"
+# Orden de preferencia: primero los nombres con datos nutricionales
+SOURCE_RANK = {SOURCE_NUTRITION: 0, SOURCE_FATSECRET: 0, SOURCE_LEXICON: 1}
+
+STATUS_KNOWN = "known"        # nombre (o parte) con datos nutricionales o en el léxico
+STATUS_MODEL = "model"        # desconocido, pero el modelo conoce todas sus palabras
+STATUS_UNKNOWN = "unknown"
+
+# Modificadores habituales: válidos dentro de un nombre ("smoked paprika"), no como sugerencia
+MODIFIERS = sorted(set(SPANISH_ADJECTIVES) | set(SPANISH_ADJECTIVES.values()) | STOPWORDS | {
+    "large", "small", "medium", "whole", "sliced", "diced", "minced", "grated", "shredded", "smoked",
+    "roasted", "toasted", "frozen", "canned", "raw", "cooked", "boneless", "skinless", "baby", "light",
+})
+
+# Entradas recorridas como máximo en un rango de prefijo (prefijos de 1-2 letras)
+MAX_SCAN = 64
+_SEPARATORS = re.compile(r"[,;\n]+")
+_NON_WORD = re.compile(r"[^a-z0-9ñ ]+")
+
+Suggestion = namedtuple("Suggestion", ["name", "canonical", "source", "edits"])
+ItemCheck = namedtuple("ItemCheck", ["item", "canonical", "status", "suggestions", "partial"])
+
+def _key(text):
+    """Clave de búsqueda: minúsculas, sin tildes, sin signos y con un solo espacio"""
+    return " ".join(_NON_WORD.sub(" ", _strip_accents(text.lower())).split())
+
+def _allowed_edits(length):
+    return 0 if length < 3 else 1 if length <= 5 else MAX_EDITS
+
+def _deletes(word, edits):
+    """La palabra y todas las variantes con hasta `edits` letras borradas"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+def _last_row(a, b, limit):
+    """Última fila de la matriz de distancias entre `a` y los prefijos de `b` (None si supera el límite)"""
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] * (len(b) + 1)
+        best = i
+        for j, char_b in enumerate(b, 1):
+            value = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before[j - 2] + 1 < value:
+                value = before[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return None
+        before, previous = previous, current
+    return previous
+
+def edit_distance(a, b, limit):
+    """Distancia de edición con transposiciones; limit + 1 en cuanto se supera el límite"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    row = _last_row(a, b, limit)
+    return limit + 1 if row is None or row[-1] > limit else row[-1]
+
+def prefix_distance(a, b, limit):
+    """Distancia de `a` al prefijo de `b` más parecido ("chikc" -> "chicken": 1)"""
+    row = _last_row(a, b[:len(a) + limit], limit)
+    return limit + 1 if row is None else min(min(row[max(0, len(a) - limit):]), limit + 1)
+
+def split_items(text):
+    """Elementos del cuadro de ingredientes, sin vacíos"""
+    return [item.strip() for item in _SEPARATORS.split(text or "") if item.strip()]
+
+class IngredientIndex:
+    """Índice de nombres de ingredientes para sugerencias por prefijo y aproximadas
+
+    Las escrituras (learn) van con un cerrojo; las consultas no lo necesitan
+    porque insort y las copias de conjuntos son atómicas con el GIL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}        # clave -> (nombre, forma canónica, origen)
+        self._keys = []           # claves ordenadas
+        self._word_starts = []    # (clave desde una palabra interior, clave) ordenadas
+        self._word_counts = {}    # palabra -> nombres que la contienen
+        self._words = []          # palabras ordenadas (prefijos aproximados)
+        self._deletes = {}        # variante con letras borradas -> palabras
+        self._model_words = frozenset()
+        self.learned = 0
+        self.queries = 0
+        self.query_s = 0.0
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    def _insert(self, name, canonical, source, ordered):
+        key = _key(name)
+        if not key:
+            return False
+        current = self._entries.get(key)
+        if current is not None:
+            if SOURCE_RANK[source] < SOURCE_RANK[current[2]]:
+                self._entries[key] = (current[0], current[1], source)
+            return False
+        self._entries[key] = (name, canonical or normalize_ingredient(name) or key, source)
+        add = bisect.insort if ordered else list.append
+        add(self._keys, key)
+        words = key.split(" ")
+        for i in range(1, len(words)):
+            add(self._word_starts, (" ".join(words[i:]), key))
+        for word in words:
+            self._index_word(word, add)
+            self._word_counts[word] += 1
+        return True
+
+    def _index_word(self, word, add):
+        if word not in self._word_counts:
+            self._word_counts[word] = 0
+            add(self._words, word)
+            for variant in _deletes(word, MAX_EDITS):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    def add_many(self, names, source=SOURCE_LEXICON):
+        """Añade nombres (o pares nombre, forma canónica) y reordena una sola vez"""
+        with self._lock:
+            added = 0
+            for name in names:
+                name, canonical = name if isinstance(name, tuple) else (name, None)
+                added += self._insert(name, canonical, source, ordered=False)
+            self._keys.sort()
+            self._word_starts.sort()
+            self._words.sort()
+            return added
+
+    def add_words(self, words):
+        """Palabras válidas dentro de un nombre ("red", "smoked") que no se sugieren solas"""
+        with self._lock:
+            for word in {w for phrase in words for w in _key(phrase).split(" ") if w}:
+                self._index_word(word, list.append)
+            self._words.sort()
+
+    def learn(self, name, source=SOURCE_FATSECRET):
+        """Añade un ingrediente resuelto durante la ejecución; True si es nuevo"""
+        with self._lock:
+            added = self._insert(name, None, source, ordered=True)
+            self.learned += added
+            return added
+
+    def learn_from_nutrition(self, nutrition):
+        """Aprende los ingredientes que FatSecret resolvió en un NutritionResult"""
+        return sum(self.learn(item.name) for item in getattr(nutrition, "breakdown", ())
+                   if item.source == SOURCE_FATSECRET and item.name)
+
+    def add_model_vocabulary(self, tokenizer):
+        """Palabras completas del tokenizador (SentencePiece "▁palabra"); se cargan una vez"""
+        if self._model_words:
+            return len(self._model_words)
+        words = {token[1:].lower() for token in tokenizer.get_vocab()
+                 if token.startswith("▁") and len(token) > 3 and token[1:].isalpha()}
+        self._model_words = frozenset(_strip_accents(word) for word in words)
+        return len(self._model_words)
+
+    # ==================== CONSULTAS ====================
+
+    def _suggestion(self, key, edits=0, name=None):
+        entry = self._entries[key]
+        return Suggestion(name or entry[0], entry[1], entry[2], edits)
+
+    def _prefix(self, key, limit):
+        """Nombres que empiezan por `key` o tienen una palabra que empieza por `key`"""
+        found = set()
+        start = bisect.bisect_left(self._keys, key)
+        for candidate in self._keys[start:start + MAX_SCAN]:
+            if not candidate.startswith(key):
+                break
+            found.add(candidate)
+        start = bisect.bisect_left(self._word_starts, (key,))
+        for rest, candidate in self._word_starts[start:start + MAX_SCAN]:
+            if not rest.startswith(key):
+                break
+            found.add(candidate)
+        ranked = sorted(found, key=lambda k: (SOURCE_RANK[self._entries[k][2]], len(k), k))
+        return ranked[:limit]
+
+    def _fuzzy_prefix(self, word):
+        """Palabras del vocabulario cuyo comienzo está a pocas ediciones de `word` (incompleta)
+
+        Se acorta `word` por la derecha hasta encontrar palabras con ese comienzo
+        y se comparan sus prefijos; no corrige errores en las dos primeras letras.
+        """
+        limit = _allowed_edits(len(word))
+        if not limit:
+            return []
+        candidates = {}
+        for length in range(len(word) - 1, max(2, len(word) - limit - 1) - 1, -1):
+            stem = word[:length]
+            start = bisect.bisect_left(self._words, stem)
+            for candidate in self._words[start:start + MAX_SCAN]:
+                if not candidate.startswith(stem):
+                    break
+                edits = prefix_distance(word, candidate, limit)
+                if edits <= limit:
+                    candidates[candidate] = min(edits, candidates.get(candidate, edits))
+            if candidates:
+                break
+        return sorted(candidates.items(), key=lambda item: (item[1], -self._word_counts[item[0]]))[:3]
+
+    def correct_word(self, word, limit=3):
+        """Palabras del vocabulario a pocas ediciones de `word`, de la más a la menos cercana"""
+        if word in self._word_counts:
+            return [(word, 0)]
+        max_edits = _allowed_edits(len(word))
+        if not max_edits:
+            return []
+        candidates = {}
+        for variant in _deletes(word, max_edits):
+            for candidate in tuple(self._deletes.get(variant, ())):
+                if candidate not in candidates:
+                    candidates[candidate] = edit_distance(word, candidate, max_edits)
+        ranked = sorted((item for item in candidates.items() if item[1] <= max_edits),
+                        key=lambda item: (item[1], -self._word_counts[item[0]], item[0]))
+        return ranked[:limit]
+
+    def complete(self, text, limit=SUGGESTION_LIMIT):
+        """Sugerencias para un texto incompleto: por prefijo y, si faltan, con la última palabra corregida"""
+        key = _key(text)
+        if not key:
+            return []
+        suggestions = [self._suggestion(k) for k in self._prefix(key, limit)]
+        words = key.split(" ")
+        if len(suggestions) < limit and len(words[-1]) >= 3:
+            head = " ".join(words[:-1])
+            seen = {s.name for s in suggestions}
+            for word, edits in self._fuzzy_prefix(words[-1]):
+                for k in self._prefix(f"{head} {word}".strip(), limit):
+                    suggestion = self._suggestion(k, edits)
+                    if suggestion.name not in seen:
+                        seen.add(suggestion.name)
+                        suggestions.append(suggestion)
+        return suggestions[:limit]
+
+    def _known(self, key):
+        """Clave del nombre conocido más largo contenido en `key` ("smoked paprika" -> "paprika")
+
+        Una parte solo cuenta si todas las palabras están en el vocabulario
+        ("aceite de olivo" no es "oil").
+        """
+        if key in self._entries:
+            return key
+        words = key.split(" ")
+        if not all(word in self._word_counts for word in words):
+            return None
+        candidates = [" ".join(words[i:]) for i in range(len(words))]
+        candidates += [" ".join(words[:i]) for i in range(len(words) - 1, 0, -1)]
+        for candidate in candidates:
+            if candidate in self._entries:
+                return candidate
+        return None
+
+    def fuzzy(self, text, limit=SUGGESTION_LIMIT):
+        """Nombres conocidos a pocas ediciones por palabra ("chiken brest" -> "chicken breast")"""
+        key = _key(text)
+        if not key:
+            return []
+        options = []
+        for word in key.split(" "):
+            corrections = self.correct_word(word, 2)
+            options.append(corrections or [(word, 0)])
+        found = {}
+        for combination in itertools.islice(itertools.product(*options), 32):
+            phrase = " ".join(word for word, _ in combination)
+            if phrase == key:
+                continue
+            known = self._known(phrase)
+            if known is None:
+                continue
+            edits = sum(edits for _, edits in combination)
+            # Si solo se conoce una parte, se sugiere la frase corregida completa
+            suggestion = (self._suggestion(known, edits) if known == phrase else
+                          Suggestion(phrase, normalize_ingredient(phrase), self._entries[known][2], edits))
+            if suggestion.name not in found or edits < found[suggestion.name].edits:
+                found[suggestion.name] = suggestion
+        # Las frases compuestas solo se sugieren si ningún nombre conocido se parece
+        exact = [s for s in found.values() if _key(s.name) in self._entries]
+        ranked = sorted(exact or found.values(), key=lambda s: (s.edits, SOURCE_RANK[s.source], len(s.name)))
+        return ranked[:limit]
+
+    def check(self, item, partial=False, limit=SUGGESTION_LIMIT):
+        """Valida un elemento escrito; `partial` si el usuario aún lo está escribiendo"""
+        start = time.perf_counter()
+        key = _key(item)
+        canonical = normalize_ingredient(item)
+        if self._known(key) or (canonical and self._known(_key(canonical))):
+            status, suggestions = STATUS_KNOWN, []
+        else:
+            suggestions = self.complete(key, limit) if partial else []
+            names = {s.name for s in suggestions}
+            suggestions += [s for s in self.fuzzy(key, limit) if s.name not in names]
+            model_words = _key(canonical or key).split(" ")
+            status = STATUS_MODEL if self._model_words and all(
+                word in self._model_words for word in model_words) else STATUS_UNKNOWN
+        self.queries += 1
+        self.query_s += time.perf_counter() - start
+        return ItemCheck(item.strip(), canonical, status, tuple(suggestions[:limit]), partial)
+
+    def validate(self, text):
+        """Valida cada elemento del cuadro de ingredientes (el último es incompleto si no acaba en coma)"""
+        items = split_items(text)
+        open_ended = bool(items) and not _SEPARATORS.match(text.rstrip(" ")[-1:])
+        return [self.check(item, partial=open_ended and i == len(items) - 1) for i, item in enumerate(items)]
+
+    def stats(self):
+        return {
+            "names": len(self._entries),
+            "words": len(self._word_counts),
+            "model_words": len(self._model_words),
+            "learned": self.learned,
+            "queries": self.queries,
+            "avg_us": self.query_s * 1e6 / self.queries if self.queries else 0.0,
+        }
+
+def build_ingredient_index(substitutions=None, learned=()):
+    """Índice con el léxico, los datos nutricionales locales y los ingredientes ya resueltos por FatSecret"""
+    index = IngredientIndex()
+    index.add_many(NUTRITION_MAP, SOURCE_NUTRITION)
+    if substitutions is not None:
+        index.add_many(substitutions.food_names(), SOURCE_NUTRITION)
+    index.add_many(learned, SOURCE_FATSECRET)
+    index.add_many(((name, canonical) for name, canonical in LEXICON.items()), SOURCE_LEXICON)
+    index.add_many(LEXICON.values(), SOURCE_LEXICON)
+    index.add_words(MODIFIERS)
+    return index
+
+# ==================== BENCHMARK ====================
+
+def _typo(word, rng):
+    """Una errata: letra borrada, repetida, cambiada o dos letras intercambiadas"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice("aeiourstnl") + word[i + 1:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+def benchmark_autocomplete(n_queries=20000, vocabulary=20000):
+    """Latencia por consulta (prefijo y validación con erratas) sobre un vocabulario ampliado"""
+    rng = random.Random(42)
+    index = build_ingredient_index(SubstitutionIndex.load())
+    base = sorted(index._entries)
+    # Vocabulario ampliado tipo FatSecret: "red bell pepper", "dried beef", ...
+    modifiers = sorted(set(SPANISH_ADJECTIVES.values()) | {"smoked", "roasted", "frozen", "canned", "organic",
+                                                              "baby", "low fat", "wild", "raw", "sliced"})
+    combinations = len(modifiers) ** 2 * len(base)
+    synthetic = []
+    for n in rng.sample(range(combinations), min(vocabulary, combinations)):
+        n, name = divmod(n, len(base))
+        first, second = divmod(n, len(modifiers))
+        synthetic.append(f"{modifiers[first]} {modifiers[second]} {base[name]}" if first != second
+                         else f"{modifiers[first]} {base[name]}")
+    start = time.perf_counter()
+    index.add_many(synthetic, SOURCE_FATSECRET)
+    build_s = time.perf_counter() - start
+    names = sorted(index._entries)
+
+    prefixes = [name[:rng.randint(1, max(1, len(name) - 1))] for name in rng.choices(names, k=n_queries)]
+    targets = rng.choices(names, k=n_queries)
+    typos = [" ".join(_typo(word, rng) for word in name.split(" ")) for name in targets]
+    results = {"names": len(names), "build_s": build_s}
+    for label, fn, queries in (("prefix", index.complete, prefixes),
+                               ("fuzzy", index.fuzzy, typos),
+                               ("check", index.check, typos)):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            fn(query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results[label] = {"p50_us": timings[len(timings) // 2] * 1e6,
+                          "p99_us": timings[int(len(timings) * 0.99)] * 1e6}
+    # Erratas cuya primera sugerencia (o el propio texto, si sigue siendo un nombre) es el nombre original
+    recovered = sum(1 for typo, name in zip(typos, targets)
+                    if typo == name or any(s.name == name for s in index.fuzzy(typo, 1)))
+    results["recovered"] = recovered / n_queries
+    print(f"🔎 {len(names)} nombres ({index.stats()['words']} palabras) indexados en {build_s:.2f}s")
+    for label in ("prefix", "fuzzy", "check"):
+        print(f"   {label:<7} p50 {results[label]['p50_us']:7.1f} µs · p99 {results[label]['p99_us']:7.1f} µs")
+    print(f"   primera sugerencia correcta en el {results['recovered']:.0%} de las erratas")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugerencias de ingredientes")
+    parser.add_argument("items", nargs="*", help="textos a completar o validar")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_autocomplete(args.queries)
+        return
+    index = build_ingredient_index(SubstitutionIndex.load())
+    for item in args.items:
+        check = index.check(item, partial=True)
+        suggestions = ", ".join(f"{s.name} ({s.canonical}, {s.source}, {s.edits})" for s in check.suggestions)
+        print(f"🥕 {item!r}: {check.status} -> {check.canonical!r} · {suggestions or 'sin sugerencias'}")
+
+if __name__ == "__main__":
+    main()
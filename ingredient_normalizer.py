@@ -0,0 +1,221 @@
+import re
+import time
+import random
+import unicodedata
+from functools import lru_cache
+
+# Léxico español/inglés -> forma canónica (inglés, singular). Las claves se
+# escriben sin tildes; la entrada se normaliza igual antes de buscar.
+LEXICON = {
+    # Carnes y pescados
+    "pollo": "chicken", "pechuga de pollo": "chicken breast", "muslo de pollo": "chicken thigh",
+    "carne de res": "beef", "res": "beef", "ternera": "beef", "carne molida": "ground beef",
+    "carne picada": "ground beef", "cerdo": "pork", "puerco": "pork", "cordero": "lamb",
+    "pavo": "turkey", "tocino": "bacon", "beicon": "bacon", "jamon": "ham", "chorizo": "chorizo",
+    "pescado": "fish", "salmon": "salmon", "atun": "tuna", "bacalao": "cod",
+    "camaron": "shrimp", "gamba": "shrimp", "langostino": "shrimp", "prawn": "shrimp",
+    # Cereales y legumbres
+    "arroz": "rice", "arroz integral": "brown rice", "pasta": "pasta", "fideo": "noodle", "espagueti": "spaghetti",
+    "harina": "flour", "pan": "bread", "avena": "oats", "oat": "oats", "quinua": "quinoa",
+    "tortilla de maiz": "corn tortilla", "maiz": "corn", "frijol": "bean", "judia": "bean",
+    "alubia": "bean", "frijol negro": "black bean", "lenteja": "lentil", "garbanzo": "chickpea",
+    "garbanzo bean": "chickpea", "cuscus": "couscous",
+    # Verduras
+    "tomate": "tomato", "jitomate": "tomato", "cebolla": "onion", "cebolleta": "green onion",
+    "scallion": "green onion", "spring onion": "green onion", "ajo": "garlic",
+    "papa": "potato", "diente de ajo": "garlic", "patata": "potato", "zanahoria": "carrot", "pimiento": "bell pepper",
+    "capsicum": "bell pepper", "chile": "chili pepper", "espinaca": "spinach",
+    "brocoli": "broccoli", "coliflor": "cauliflower", "calabacin": "zucchini",
+    "courgette": "zucchini", "berenjena": "eggplant", "aubergine": "eggplant",
+    "pepino": "cucumber", "lechuga": "lettuce", "champiñon": "mushroom", "seta": "mushroom",
+    "hongo": "mushroom", "apio": "celery", "repollo": "cabbage", "col": "cabbage",
+    "calabaza": "pumpkin", "guisante": "pea", "chicharo": "pea", "aguacate": "avocado",
+    "palta": "avocado", "elote": "corn",
+    # Frutas
+    "manzana": "apple", "platano": "banana", "limon": "lemon", "lima": "lime",
+    "naranja": "orange", "fresa": "strawberry", "arandano": "blueberry", "piña": "pineapple",
+    "mango": "mango", "uva": "grape",
+    # Lácteos y huevos
+    "huevo": "egg", "leche": "milk", "queso": "cheese", "queso parmesano": "parmesan",
+    "parmesano": "parmesan", "mantequilla": "butter", "yogur": "yogurt", "yogurt": "yogurt",
+    "nata": "cream", "crema": "cream", "crema agria": "sour cream",
+    # Aceites, condimentos y otros
+    "aceite": "oil", "aceite de oliva": "olive oil", "sal": "salt", "pimienta": "black pepper",
+    "azucar": "sugar", "azucar moreno": "brown sugar", "miel": "honey", "vinagre": "vinegar",
+    "oliva": "olive", "olivo": "olive", "aceituna": "olive",
+    "salsa de tomate": "tomato sauce", "salsa de soja": "soy sauce", "salsa de soya": "soy sauce", "soja": "soy", "tofu": "tofu",
+    "comino": "cumin", "jengibre": "ginger", "cilantro": "cilantro", "coriander": "cilantro",
+    "perejil": "parsley", "albahaca": "basil", "oregano": "oregano", "canela": "cinnamon",
+    "pimenton": "paprika", "nuez": "walnut", "almendra": "almond", "cacahuete": "peanut",
+    "mani": "peanut", "caldo": "broth", "stock": "broth", "agua": "water", "vino": "wine",
+}
+
+# Adjetivos españoles: van detrás del nombre ("pimiento rojo" -> "red bell pepper")
+SPANISH_ADJECTIVES = {
+    "rojo": "red", "roja": "red", "verde": "green", "amarillo": "yellow", "amarilla": "yellow",
+    "negro": "black", "negra": "black", "blanco": "white", "blanca": "white",
+    "molido": "ground", "molida": "ground", "picado": "chopped", "picada": "chopped",
+    "seco": "dried", "seca": "dried", "integral": "whole grain", "dulce": "sweet",
+}
+
+# Palabras vacías que no cambian el ingrediente
+STOPWORDS = {"de", "del", "la", "el", "los", "las", "fresh", "fresco", "fresca", "frescos", "frescas"}
+
+# Claves del léxico que también son palabras inglesas ("pan", "lima beans"): solo se traducen
+# cuando el resto del ingrediente está en español ("pan integral", "pan de maiz")
+ENGLISH_HOMOGRAPHS = {"pan", "lima"}
+
+# Plurales ingleses irregulares o que no siguen las reglas
+IRREGULAR = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife",
+             "oats": "oats", "molasses": "molasses", "hummus": "hummus", "asparagus": "asparagus",
+             "couscous": "couscous", "swiss": "swiss", "glass": "glass", "grass": "grass"}
+
+# Reglas de lematización español/inglés (cada una propone un candidato que se valida con el léxico)
+_LEMMA_RULES = [
+    (re.compile(r"ies$"), "y"),      # berries -> berry
+    (re.compile(r"oes$"), "o"),      # tomatoes -> tomato, potatoes -> potato
+    (re.compile(r"ces$"), "z"),      # nueces -> nuez
+    (re.compile(r"(ch|sh|x|ss)es$"), r"\1"),  # peaches -> peach
+    (re.compile(r"([^aeiou])es$"), r"\1"),    # limones -> limon
+    (re.compile(r"([^su])s$"), r"\1"),        # tomates -> tomate, eggs -> egg
+]
+
+# Singularización inglesa para palabras que no están en el léxico
+_ENGLISH_RULES = [
+    (re.compile(r"([^aeiou])ies$"), r"\1y"),
+    (re.compile(r"(ch|sh|x|ss|z)es$"), r"\1"),
+    (re.compile(r"([^aeiou])oes$"), r"\1o"),
+    (re.compile(r"([^su])s$"), r"\1"),
+]
+
+_SEPARATORS = re.compile(r"[,;\n]+")
+_NON_WORD = re.compile(r"[^a-z0-9ñ\s-]")
+_SPACES = re.compile(r"\s+")
+
+def _strip_accents(text):
+    """Quita tildes y diéresis conservando la ñ"""
+    text = text.replace("ñ", "\0")
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+    return text.replace("\0", "ñ")
+
+def _lemma_candidates(word):
+    """Formas singulares posibles de una palabra, de la más a la menos probable"""
+    candidates = [word]
+    for pattern, replacement in _LEMMA_RULES:
+        if pattern.search(word):
+            candidates.append(pattern.sub(replacement, word))
+    return candidates
+
+def _lemmatize(word):
+    """Singulariza una palabra, prefiriendo la forma que exista en el léxico"""
+    # Irregulares e invariables: su forma es definitiva aunque no esté en el léxico
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    candidates = _lemma_candidates(word)
+    for candidate in candidates:
+        if candidate in _LEXICON_INDEX or candidate in _CANONICAL or candidate in SPANISH_ADJECTIVES:
+            return candidate
+    # Sin coincidencia en el léxico: singular inglés ("olives" -> "olive")
+    if len(word) > 3:
+        for pattern, replacement in _ENGLISH_RULES:
+            if pattern.search(word):
+                return pattern.sub(replacement, word)
+    return word
+
+def _is_spanish(words):
+    """Si alguna palabra solo tiene sentido en español (léxico, adjetivo o palabra vacía española)"""
+    return any(w in _SPANISH_WORDS for w in words)
+
+def _translate_word(word, spanish):
+    if not spanish and word in ENGLISH_HOMOGRAPHS:
+        return word
+    return _LEXICON_INDEX.get(word, word)
+
+def _translate_phrase(words, spanish=True):
+    """Traduce una secuencia de palabras ya lematizadas
+
+    Con spanish=False las palabras de ENGLISH_HOMOGRAPHS se dejan en inglés.
+    """
+    phrase = " ".join(words)
+    if phrase in _LEXICON_INDEX and (spanish or phrase not in ENGLISH_HOMOGRAPHS):
+        return _LEXICON_INDEX[phrase]
+    # "salsa de tomate" -> "tomato sauce": en español el núcleo va primero
+    if "de" in words:
+        split = words.index("de")
+        head, modifier = words[:split], words[split + 1:]
+        if head and modifier:
+            return f"{_translate_phrase(modifier, spanish)} {_translate_phrase(head, spanish)}"
+    if len(words) > 1 and words[-1] in SPANISH_ADJECTIVES:
+        head = _translate_phrase(words[:-1], spanish)
+        adjective = SPANISH_ADJECTIVES[words[-1]]
+        # "pimienta negra": "black pepper" ya lleva el adjetivo
+        if set(adjective.split()) <= set(head.split()):
+            return head
+        return f"{adjective} {head}"
+    return " ".join(_translate_word(w, spanish) for w in words if w not in STOPWORDS)
+
+@lru_cache(maxsize=65536)
+def normalize_ingredient(text):
+    """Forma canónica de un ingrediente: inglés, minúsculas, singular ("Tomates" -> "tomato")"""
+    text = _strip_accents(text.lower().strip())
+    text = _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+    if not text:
+        return ""
+    if text in _LEXICON_INDEX and text not in ENGLISH_HOMOGRAPHS:
+        return _LEXICON_INDEX[text]
+    words = [_lemmatize(w) for w in text.split(" ")]
+    return _SPACES.sub(" ", _translate_phrase(words, _is_spanish(words))).strip()
+
+def normalize_ingredients(ingredients):
+    """Normaliza una lista (o texto separado por comas) de ingredientes, sin duplicados"""
+    if isinstance(ingredients, str):
+        ingredients = _SEPARATORS.split(ingredients)
+    seen = {}
+    for item in ingredients:
+        canonical = normalize_ingredient(item)
+        if canonical:
+            seen.setdefault(canonical, None)
+    return list(seen)
+
+# Índice precompilado: claves sin tildes y con cada palabra lematizada
+_LEXICON_INDEX = {}
+_CANONICAL = set(LEXICON.values())
+for _key, _value in LEXICON.items():
+    _LEXICON_INDEX[_strip_accents(_key)] = _value
+    _LEXICON_INDEX.setdefault(_value, _value)
+
+# Palabras que marcan un ingrediente escrito en español
+_SPANISH_WORDS = {"de", "del", "la", "el", "los", "las", "fresco", "fresca", "frescos", "frescas"}
+_SPANISH_WORDS.update(SPANISH_ADJECTIVES)
+_SPANISH_WORDS.update(key for key in _LEXICON_INDEX
+                      if " " not in key and key not in _CANONICAL and key not in ENGLISH_HOMOGRAPHS)
+
+def benchmark_normalizer(n_items=500000, vocabulary=2000):
+    """Mide el rendimiento de la normalización sobre listas de ingredientes grandes"""
+    base = list(LEXICON) + list(_CANONICAL)
+    rng = random.Random(42)
+    variants = []
+    for i in range(vocabulary):
+        word = rng.choice(base)
+        variants.append(rng.choice([word, word.upper(), word + "s", word + "es", f"  {word.title()} "]))
+    corpus = [rng.choice(variants) for _ in range(n_items)]
+
+    normalize_ingredient.cache_clear()
+    start = time.perf_counter()
+    for item in corpus:
+        normalize_ingredient.__wrapped__(item)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item in corpus:
+        normalize_ingredient(item)
+    warm = time.perf_counter() - start
+
+    distinct = len(set(normalize_ingredient(item) for item in variants))
+    print(f"🔤 {n_items} ingredientes ({len(set(corpus))} variantes -> {distinct} formas canónicas)")
+    print(f"   Sin caché: {n_items / cold:,.0f} ingredientes/s")
+    print(f"   Memoizado: {n_items / warm:,.0f} ingredientes/s")
+    return {"items": n_items, "cold_items_per_s": n_items / cold, "warm_items_per_s": n_items / warm}
+
+if __name__ == "__main__":
+    benchmark_normalizer()
@@ -0,0 +1,193 @@
+import re
+import time
+import random
+from collections import namedtuple
+from functools import lru_cache
+
+# Resultado del análisis de una línea de ingrediente
+ParsedIngredient = namedtuple("ParsedIngredient", ["quantity", "unit", "name", "raw"])
+
+# Alias de unidades -> unidad canónica
+UNIT_ALIASES = {
+    "g": "g", "gr": "g", "gram": "g", "grams": "g", "gramo": "g", "gramos": "g",
+    "kg": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg",
+    "oz": "oz", "ounce": "oz", "ounces": "oz", "onza": "oz", "onzas": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb", "libra": "lb", "libras": "lb",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "mililitro": "ml", "mililitros": "ml",
+    "l": "l", "liter": "l", "liters": "l", "litre": "l", "litres": "l", "litro": "l", "litros": "l",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp", "cucharadita": "tsp", "cucharaditas": "tsp",
+    "tbsp": "tbsp", "tbs": "tbsp", "tbl": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "cucharada": "tbsp", "cucharadas": "tbsp",
+    "c": "cup", "cup": "cup", "cups": "cup", "taza": "cup", "tazas": "cup",
+    "pt": "pt", "pint": "pt", "pints": "pt",
+    "qt": "qt", "quart": "qt", "quarts": "qt",
+    "fl oz": "fl oz",
+    "can": "can", "cans": "can", "lata": "can", "latas": "can",
+    "pkg": "package", "package": "package", "packages": "package", "paquete": "package", "paquetes": "package",
+    "stick": "stick", "sticks": "stick",
+    "clove": "clove", "cloves": "clove", "diente": "clove", "dientes": "clove",
+    "slice": "slice", "slices": "slice", "rebanada": "slice", "rebanadas": "slice",
+    "pinch": "pinch", "dash": "dash", "pizca": "pinch",
+    "head": "head", "heads": "head", "bunch": "bunch", "bunches": "bunch",
+}
+
+# Abreviaturas de una letra que dependen de la mayúscula: T = tablespoon, t = teaspoon
+CASE_SENSITIVE_UNITS = {"T": "tbsp", "t": "tsp"}
+
+# Factores de conversión a gramos (masa) y a mililitros (volumen)
+UNIT_TO_GRAMS = {"g": 1.0, "kg": 1000.0, "oz": 28.3495, "lb": 453.592, "stick": 113.0,
+                 "pinch": 0.36, "dash": 0.6}
+UNIT_TO_ML = {"ml": 1.0, "l": 1000.0, "tsp": 4.929, "tbsp": 14.787, "cup": 236.588,
+              "pt": 473.176, "qt": 946.353, "fl oz": 29.574}
+
+# Densidades aproximadas (g/ml) para convertir volumen a peso; por defecto agua
+DENSITY_G_PER_ML = {
+    "flour": 0.53, "sugar": 0.85, "brown sugar": 0.93, "rice": 0.79, "oats": 0.41,
+    "oil": 0.92, "butter": 0.96, "milk": 1.03, "cream": 1.01, "honey": 1.42,
+    "salt": 1.2, "cheese": 0.45, "broth": 1.0, "water": 1.0,
+}
+
+# Peso típico de una unidad (o de un envase) en gramos
+UNIT_WEIGHT_G = {
+    "egg": 50, "onion": 110, "tomato": 120, "garlic": 3, "potato": 170, "carrot": 60,
+    "chicken breast": 170, "lemon": 60, "lime": 45, "banana": 118, "apple": 180,
+    "pepper": 120, "avocado": 200, "zucchini": 200, "tortilla": 45, "bread": 30,
+}
+CONTAINER_WEIGHT_G = {"can": 400, "package": 250, "clove": 3, "slice": 30, "head": 500, "bunch": 100}
+DEFAULT_UNIT_WEIGHT_G = 100.0
+
+# Condimentos que sin cantidad se usan al gusto: "salt and pepper" no son 120 g de pimiento
+SEASONINGS = {"salt", "pepper", "black pepper", "white pepper", "kosher salt", "sea salt",
+              "sal", "pimienta", "pimienta negra"}
+
+_UNICODE_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+
+_QUANTITY = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d*[½¼¾⅓⅔⅛]|\d+(?:[.,]\d+)?)"
+_UNITS = "|".join(sorted((re.escape(u) for u in UNIT_ALIASES), key=len, reverse=True))
+_LINE_RE = re.compile(
+    rf"^\s*(?:(?P<qty>{_QUANTITY}(?:\s*(?:-|to|a)\s*{_QUANTITY})?)|(?P<article>an?|una?)(?=\s+(?:{_UNITS})\b))?\s*"
+    rf"(?:\((?P<inner>[^)]*)\)\s*)?"
+    rf"(?:(?:(?P<unit>{_UNITS})|(?P<letter>(?-i:[Tt])))\.?(?=\s|$|,)\s*)?"
+    rf"(?:of\s+|de\s+)?(?P<name>.*?)\s*$",
+    re.IGNORECASE,
+)
+_INNER_RE = re.compile(rf"^\s*(?P<qty>{_QUANTITY})\s*(?P<unit>{_UNITS})\.?\s*$", re.IGNORECASE)
+_RANGE_SPLIT = re.compile(r"\s*(?:-|to|a)\s*")
+# "1-1/2" es uno y medio, no el rango de 1 a 1/2
+_MIXED_NUMBER = re.compile(r"(?<![\d/])(\d+)-(\d+/\d+)")
+_SEASONING_SPLIT = re.compile(r"\s*(?:,|&|\band\b|\by\b)\s*")
+_TO_TASTE = re.compile(r"\b(?:to taste|al gusto|as needed)\b", re.IGNORECASE)
+_NAME_NOISE = re.compile(r"\s*(?:,.*|\(.*?\)|\bto taste\b|\bal gusto\b|\bas needed\b)", re.IGNORECASE)
+
+def _parse_quantity(text):
+    """Convierte '1 1/2', '1-1/2', '3/4', '½' o '2,5' en número; los rangos '3-4' dan la media"""
+    if not text:
+        return None
+    parts = [p for p in _RANGE_SPLIT.split(_MIXED_NUMBER.sub(r"\1 \2", text.strip())) if p]
+    values = []
+    for part in parts:
+        total = 0.0
+        for token in part.split():
+            if "/" in token:
+                num, den = token.split("/", 1)
+                total += float(num) / float(den) if float(den) else 0.0
+            elif token[-1] in _UNICODE_FRACTIONS:
+                total += (float(token[:-1]) if token[:-1] else 0.0) + _UNICODE_FRACTIONS[token[-1]]
+            else:
+                total += float(token.replace(",", "."))
+        values.append(total)
+    return sum(values) / len(values) if values else None
+
+def _is_seasoning(name):
+    """Si el nombre solo lista condimentos ("salt", "salt and pepper", "sal y pimienta")"""
+    parts = [part for part in _SEASONING_SPLIT.split(name) if part]
+    return bool(parts) and all(part in SEASONINGS for part in parts)
+
+@lru_cache(maxsize=16384)
+def parse_ingredient_line(line):
+    """Extrae cantidad, unidad y nombre de una línea como '2 c. cooked rice'"""
+    # Las líneas con saltos internos se analizan como una sola línea
+    match = _LINE_RE.match(" ".join(line.split()))
+    # "a pinch of salt", "una taza de arroz": el artículo cuenta como una unidad
+    quantity = 1.0 if match.group("article") else _parse_quantity(match.group("qty"))
+    unit = match.group("unit")
+    unit = UNIT_ALIASES[unit.lower()] if unit else CASE_SENSITIVE_UNITS.get(match.group("letter"))
+    inner = match.group("inner")
+    # "2 (15 oz.) cans beans" -> 30 oz
+    if inner:
+        inner_match = _INNER_RE.match(inner)
+        if inner_match:
+            inner_qty = _parse_quantity(inner_match.group("qty"))
+            quantity = (quantity or 1.0) * inner_qty
+            unit = UNIT_ALIASES[inner_match.group("unit").lower()]
+    # "1 cup, chopped onion": la coma tras la unidad no empieza una aclaración
+    name = _NAME_NOISE.sub("", match.group("name").lstrip(" ,;:")).strip(" .-").lower()
+    # "salt to taste" o "salt and pepper" no aportan una cantidad medible
+    if quantity is None and (_TO_TASTE.search(line) or unit is None and _is_seasoning(name)):
+        quantity = 0.0
+    return ParsedIngredient(quantity, unit, name, line)
+
+def _lookup_by_name(table, name):
+    """Busca el valor cuya clave aparece en el nombre (la clave más larga gana)"""
+    best = None
+    for key, value in table.items():
+        if key in name and (best is None or len(key) > len(best[0])):
+            best = (key, value)
+    return best[1] if best else None
+
+@lru_cache(maxsize=16384)
+def _grams_for(quantity, unit, name):
+    """Versión memoizada de to_grams"""
+    if quantity is None:
+        quantity = 1.0
+    if unit in UNIT_TO_GRAMS:
+        return quantity * UNIT_TO_GRAMS[unit]
+    if unit in UNIT_TO_ML:
+        density = _lookup_by_name(DENSITY_G_PER_ML, name) or 1.0
+        return quantity * UNIT_TO_ML[unit] * density
+    if unit in CONTAINER_WEIGHT_G:
+        return quantity * CONTAINER_WEIGHT_G[unit]
+    return quantity * (_lookup_by_name(UNIT_WEIGHT_G, name) or DEFAULT_UNIT_WEIGHT_G)
+
+def to_grams(parsed):
+    """Estima el peso en gramos de un ingrediente analizado"""
+    return _grams_for(parsed.quantity, parsed.unit, parsed.name)
+
+def parse_ingredient_lines(lines):
+    """Analiza una lista de líneas de ingredientes"""
+    return [parse_ingredient_line(line) for line in lines if line and line.strip()]
+
+def benchmark_parser(n_lines=200000, vocabulary=5000):
+    """Mide el rendimiento del analizador sobre un corpus sintético grande"""
+    quantities = ["1", "2", "1/2", "1 1/2", "3-4", "½", "2.5", "", "2 (15 oz.)"]
+    units = ["c.", "cups", "tbsp", "tsp", "lb", "oz", "g", "cans", "cloves", "", "pinch"]
+    foods = ["cooked rice", "chicken breast", "flour", "olive oil", "tomatoes, diced",
+             "onion", "garlic", "salt to taste", "black beans", "brown sugar"]
+    rng = random.Random(42)
+    # Un vocabulario de líneas distintas muestreado con repetición, como en un corpus real
+    distinct = [
+        f"{rng.choice(quantities)} {rng.choice(units)} {rng.choice(foods)} {i}".strip()
+        for i in range(vocabulary)
+    ]
+    corpus = [rng.choice(distinct) for _ in range(n_lines)]
+
+    parse_ingredient_line.cache_clear()
+    _grams_for.cache_clear()
+    # Sin memoización: coste real del análisis de cada línea
+    start = time.perf_counter()
+    for line in corpus:
+        to_grams(parse_ingredient_line.__wrapped__(line))
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for line in corpus:
+        to_grams(parse_ingredient_line(line))
+    warm = time.perf_counter() - start
+
+    print(f"📏 {n_lines} líneas ({len(set(corpus))} únicas)")
+    print(f"   Sin caché: {n_lines / cold:,.0f} líneas/s")
+    print(f"   Memoizado: {n_lines / warm:,.0f} líneas/s")
+    return {"lines": n_lines, "cold_lines_per_s": n_lines / cold, "warm_lines_per_s": n_lines / warm}
+
+if __name__ == "__main__":
+    benchmark_parser()
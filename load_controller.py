@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+# Perfiles de generación, del más caro al más barato. "cache" no llama al
+# modelo: sirve una receta parecida del historial.
+GENERATION_PROFILES = {
+    "full": {
+        "max_length": 512, "min_length": 64, "no_repeat_ngram_size": 3,
+        "do_sample": True, "top_k": 60, "top_p": 0.95,
+    },
+    "reduced": {
+        "max_length": 256, "min_length": 48, "no_repeat_ngram_size": 3,
+        "do_sample": True, "top_k": 30, "top_p": 0.9,
+    },
+    "greedy": {
+        "max_length": 256, "min_length": 32, "no_repeat_ngram_size": 3,
+        "do_sample": False,
+    },
+    "cache": None,
+}
+PROFILE_ORDER = list(GENERATION_PROFILES)
+
+# Objetivo de latencia (p95 de extremo a extremo) y límites de carga
+DEFAULT_SLO_MS = float(os.environ.get("GENERATION_SLO_MS", "8000"))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("GENERATION_MAX_IN_FLIGHT", "4"))
+
+log = get_logger("load")
+
+class LoadController:
+    """Elige el perfil de generación según la carga reciente
+
+    Observa la latencia de las últimas generaciones (como mucho `window`, de los
+    últimos `horizon` segundos) y cuántas hay en curso. Si el p95 se acerca al
+    SLO o hay demasiadas generaciones simultáneas, baja un perfil (full -> reduced -> greedy -> cache); cuando la presión cede, sube un
+    perfil tras al menos `min_samples` generaciones con el perfil actual. Cada
+    cambio espera `cooldown` segundos para no oscilar.
+    """
+
+    def __init__(self, slo_ms=DEFAULT_SLO_MS, max_in_flight=DEFAULT_MAX_IN_FLIGHT, window=50,
+                 horizon=60.0, degrade_at=0.8, recover_at=0.5, cooldown=10.0, min_samples=5):
+        self.slo_ms = slo_ms
+        self.max_in_flight = max_in_flight
+        self.degrade_at = degrade_at
+        self.recover_at = recover_at
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.horizon = horizon
+        self._latencies = deque(maxlen=window)
+        self._level = 0
+        self._changed_at = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._served = {name: 0 for name in PROFILE_ORDER}
+        self._transitions = 0
+
+    def _expire(self, now):
+        """Olvida las latencias de hace más de `horizon` segundos"""
+        while self._latencies and now - self._latencies[0][0] > self.horizon:
+            self._latencies.popleft()
+
+    def _p95_ms(self):
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(latency for _, latency in self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000
+
+    def _pressure(self):
+        """Mayor de latencia/SLO y concurrencia/límite (1.0 = en el límite)"""
+        latency = self._p95_ms() / self.slo_ms if self.slo_ms else 0.0
+        load = self._in_flight / self.max_in_flight if self.max_in_flight else 0.0
+        return max(latency, load)
+
+    def choose_profile(self):
+        """Perfil para la próxima generación"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if now - self._changed_at >= self.cooldown:
+                pressure = self._pressure()
+                if pressure > self.degrade_at and self._level < len(PROFILE_ORDER) - 1:
+                    self._set_level(self._level + 1, now, pressure)
+                elif (pressure < self.recover_at and self._level > 0
+                      and len(self._latencies) >= self.min_samples):
+                    self._set_level(self._level - 1, now, pressure)
+            return PROFILE_ORDER[self._level]
+
+    def _set_level(self, level, now, pressure):
+        log.info("Perfil de generación: %s -> %s", PROFILE_ORDER[self._level], PROFILE_ORDER[level],
+                 extra={"pressure": round(pressure, 2)})
+        self._level = level
+        self._changed_at = now
+        self._transitions += 1
+        # Las latencias del perfil anterior ya no representan al nuevo
+        self._latencies.clear()
+
+    @contextmanager
+    def track(self, profile):
+        """Mide una generación y la cuenta como en curso
+
+        Devuelve un diccionario cuyo "profile" puede actualizarse con el perfil
+        que finalmente sirvió la receta (p. ej. "cache" sin resultados -> "greedy").
+        """
+        served = {"profile": profile}
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield served
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._latencies.append((time.monotonic(), elapsed))
+                self._served[served["profile"]] = self._served.get(served["profile"], 0) + 1
+
+    def stats(self):
+        """Perfil activo, p95 reciente, generaciones en curso y recetas servidas por perfil"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "profile": PROFILE_ORDER[self._level],
+                "p95_ms": self._p95_ms(),
+                "slo_ms": self.slo_ms,
+                "in_flight": self._in_flight,
+                "served": dict(self._served),
+                "transitions": self._transitions,
+            }
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_controller():
+    """Controlador compartido por todo el proceso (todas las sesiones y la prueba de carga)"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = LoadController()
+        return _controller
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: simula N sesiones concurrentes recorriendo el flujo
+generar receta -> calcular nutrición -> crear PDF.
+
+Streamlit atiende cada sesión en un hilo del mismo proceso, así que cada sesión
+simulada es un hilo que llama a las mismas funciones que main(). FatSecret se
+sustituye por un servidor HTTP local y, opcionalmente, el modelo por un
+generador simulado con coste de CPU configurable.
+
+Uso:
+    python load_test.py --concurrency 1,4,16 --iterations 5
+    python load_test.py --real-models --concurrency 1,2 --iterations 2
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from model_registry import current_rss_mb
+from structured_logging import ROOT_LOGGER
+
+# ==================== SERVIDOR FATSECRET SIMULADO ====================
+
+class StubFatSecretHandler(BaseHTTPRequestHandler):
+    """Responde como FatSecret (token OAuth, foods.search y food.get) con datos fijos"""
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        if self.latency:
+            time.sleep(self.latency)
+        self.server.calls += 1
+
+        if self.path.endswith("/connect/token"):
+            self._send_json({"access_token": "stub-token", "expires_in": 86400, "token_type": "Bearer"})
+        elif params.get("method") == "foods.search":
+            term = params.get("search_expression", "food")
+            self._send_json({"foods": {"food": [{
+                "food_id": str(abs(hash(term)) % 100000),
+                "food_name": term,
+                "food_description": "Per 100g - Calories: 150kcal | Fat: 5.00g | Carbs: 15.00g | Protein: 10.00g",
+            }]}})
+        elif params.get("method") == "food.get":
+            self._send_json({"food": {"food_id": params.get("food_id"), "servings": {"serving": [{
+                "metric_serving_amount": "100.000", "metric_serving_unit": "g",
+                "calories": "150", "protein": "10", "carbohydrate": "15", "fat": "5",
+            }]}}})
+        else:
+            self._send_json({"error": {"code": 2, "message": "Unknown method"}})
+
+def start_stub_fatsecret(latency_ms=20):
+    """Arranca el servidor simulado en un puerto libre y redirige FatSecretAPI hacia él"""
+    handler = type("Handler", (StubFatSecretHandler,), {"latency": latency_ms / 1000.0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.calls = 0
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["FATSECRET_TOKEN_URL"] = f"{base}/connect/token"
+    os.environ["FATSECRET_API_URL"] = f"{base}/rest/server.api"
+    return server
+
+# ==================== GENERADOR SIMULADO ====================
+
+STUB_RECIPE = (
+    "title: {title}\n"
+    "ingredients: 1 lb chicken breast -- 2 c. cooked rice -- 1 can diced tomatoes -- "
+    "1 onion, chopped -- 2 tbsp olive oil -- salt to taste\n"
+    "directions: Heat the oil in a large skillet. -- Add the chicken and cook until browned. -- "
+    "Stir in the onion and tomatoes and simmer for 10 minutes. -- Serve over the rice."
+)
+
+class StubTokenizer:
+    """Tokenizador mínimo compatible con generate_recipe"""
+
+    def __call__(self, text, **kwargs):
+        return {"input_ids": [[len(text)]]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return STUB_RECIPE.format(title=f"Stub Recipe {ids[0]}")
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return [self.decode(ids) for ids in outputs]
+
+class StubGenerator:
+    """Generador simulado: consume `cost_ms` de CPU por receta como lo haría la decodificación"""
+
+    def __init__(self, cost_ms=200, busy=True):
+        self.cost = cost_ms / 1000.0
+        self.busy = busy
+
+    def generate(self, input_ids=None, num_return_sequences=1, **kwargs):
+        deadline = time.perf_counter() + self.cost * num_return_sequences
+        if self.busy:
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(self.cost * num_return_sequences)
+        return [[random.randint(0, 9999)] for _ in range(num_return_sequences)]
+
+# ==================== MUESTREO DE RECURSOS ====================
+
+class ResourceSampler(threading.Thread):
+    """Registra el uso de CPU (%) y la memoria residente a intervalos regulares"""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while not self._stop_event.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            rss = current_rss_mb()
+            self.samples.append({
+                "t": round(wall - start, 2),
+                "cpu_percent": round(100 * (cpu - last_cpu) / (wall - last_wall), 1),
+                "rss_mb": round(rss, 1) if rss is not None else 0.0,
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# ==================== SESIONES SIMULADAS ====================
+
+INGREDIENT_LISTS = [
+    "chicken, rice, tomatoes, onion",
+    "pasta, garlic, olive oil, parmesan",
+    "beef, potatoes, carrots",
+    "tofu, broccoli, soy sauce, ginger",
+    "eggs, spinach, cheese",
+    "salmon, lemon, asparagus",
+    "black beans, corn, tortillas, avocado",
+    "lentils, onion, cumin, tomatoes",
+]
+
+def percentile(values, pct):
+    """Percentil por el método del rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def run_session(app, tokenizer, generator, iterations, distinct, servings, results, errors, rng):
+    """Una sesión: repite el flujo generar -> nutrición -> PDF"""
+    for _ in range(iterations):
+        ingredients = rng.choice(INGREDIENT_LISTS[:distinct])
+        try:
+            t0 = time.perf_counter()
+            recipe, _ = app.generate_recipe_shared(ingredients, "Normal", tokenizer, generator)
+            t1 = time.perf_counter()
+            app.get_recipe_nutrition(recipe["ingredients"], servings)
+            t2 = time.perf_counter()
+            app.create_pdf_cached(recipe, app.get_random_chef_tip())
+            t3 = time.perf_counter()
+            results.append({"generate": t1 - t0, "nutrition": t2 - t1, "pdf": t3 - t2, "total": t3 - t0})
+        except Exception as e:
+            errors.append(repr(e))
+
+def run_load(app, tokenizer, generator, concurrency, iterations, distinct, servings=4, sample_interval=0.5):
+    """Ejecuta `concurrency` sesiones simultáneas y resume rendimiento y recursos
+
+    Las sesiones comparten el agrupador de generaciones, el controlador de carga y el
+    historial del proceso, como en Streamlit; el resumen incluye lo que cambió en este nivel.
+    """
+    results, errors = [], []
+    flight, controller = app.load_generation_flight(), app.load_controller()
+    flight_before = flight.stats()
+    served_before = controller.stats()["served"]
+    sampler = ResourceSampler(sample_interval)
+    sampler.start()
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(app, tokenizer, generator, iterations, distinct, servings, results, errors, random.Random(i)),
+        )
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    summary = {
+        "concurrency": concurrency,
+        "completed": len(results),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {},
+        "resources": sampler.samples,
+    }
+    flight_after = flight.stats()
+    summary["generation"] = {
+        field: flight_after[field] - flight_before[field] for field in ("requests", "executions", "shared")
+    }
+    served = controller.stats()["served"]
+    summary["profiles"] = {
+        profile: count - served_before.get(profile, 0)
+        for profile, count in served.items() if count > served_before.get(profile, 0)
+    }
+    for stage in ("generate", "nutrition", "pdf", "total"):
+        values = [r[stage] * 1000 for r in results]
+        summary["latency_ms"][stage] = {
+            "p50": round(percentile(values, 50), 1),
+            "p95": round(percentile(values, 95), 1),
+            "p99": round(percentile(values, 99), 1),
+        }
+    if errors:
+        summary["sample_errors"] = errors[:5]
+    return summary
+
+def print_summary(summary):
+    """Imprime el resumen de un nivel de concurrencia"""
+    cpu = [s["cpu_percent"] for s in summary["resources"]] or [0.0]
+    rss = [s["rss_mb"] for s in summary["resources"]] or [0.0]
+    total = summary["latency_ms"]["total"]
+    print(f"👥 {summary['concurrency']:>3} sesiones | {summary['throughput_rps']:>7.2f} req/s | "
+          f"p50 {total['p50']:>8.1f} ms | p95 {total['p95']:>8.1f} ms | p99 {total['p99']:>8.1f} ms | "
+          f"CPU máx {max(cpu):>5.0f}% | RSS máx {max(rss):>7.1f} MB | errores {summary['errors']}")
+    generation = summary["generation"]
+    profiles = ", ".join(f"{name} {count}" for name, count in summary["profiles"].items()) or "-"
+    print(f"      generaciones {generation['executions']} de {generation['requests']} peticiones "
+          f"({generation['shared']} agrupadas) | perfiles: {profiles}")
+    for stage in ("generate", "nutrition", "pdf"):
+        lat = summary["latency_ms"][stage]
+        print(f"      {stage:<9} p50 {lat['p50']:>8.1f} ms | p95 {lat['p95']:>8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del generador de recetas")
+    parser.add_argument("--concurrency", default="1,4,16", help="niveles de sesiones simultáneas, separados por comas")
+    parser.add_argument("--iterations", type=int, default=5, help="flujos completos por sesión")
+    parser.add_argument("--distinct", type=int, default=len(INGREDIENT_LISTS), help="listas de ingredientes distintas en circulación")
+    parser.add_argument("--real-models", action="store_true", help="usar los modelos reales en lugar del generador simulado")
+    parser.add_argument("--stub-cost-ms", type=float, default=200, help="coste de CPU por receta del generador simulado")
+    parser.add_argument("--stub-sleep", action="store_true", help="el generador simulado duerme en lugar de consumir CPU")
+    parser.add_argument("--fatsecret-latency-ms", type=float, default=20, help="latencia del servidor FatSecret simulado")
+    parser.add_argument("--log-level", default="WARNING", help="nivel de log de la aplicación durante la prueba")
+    parser.add_argument("--output", help="guardar el informe completo en JSON")
+    args = parser.parse_args()
+
+    server = start_stub_fatsecret(args.fatsecret_latency_ms)
+    import app
+    # Una línea INFO por receta taparía el informe
+    logging.getLogger(ROOT_LOGGER).setLevel(args.log_level.upper())
+
+    print("🏋️ PRUEBA DE CARGA")
+    print("=" * 60)
+    report = []
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    distinct = max(1, min(args.distinct, len(INGREDIENT_LISTS)))
+    if args.real_models:
+        registry = app.load_registry()
+        with registry.acquire("tokenizer") as tokenizer, registry.acquire("generator") as generator:
+            for level in levels:
+                summary = run_load(app, tokenizer, generator, level, args.iterations, distinct)
+                print_summary(summary)
+                report.append(summary)
+    else:
+        tokenizer, generator = StubTokenizer(), StubGenerator(args.stub_cost_ms, busy=not args.stub_sleep)
+        for level in levels:
+            summary = run_load(app, tokenizer, generator, level, args.iterations, distinct)
+            print_summary(summary)
+            report.append(summary)
+    print(f"\n🌐 Llamadas al servidor FatSecret simulado: {server.calls}")
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Informe guardado en {args.output}")
+
+if __name__ == "__main__":
+    main()
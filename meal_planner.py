@@ -0,0 +1,121 @@
+import time
+import numpy as np
+from nutrition_result import NutritionResult, MACRO_KEYS as _MACRO_KEYS
+
+# Orden de los macros en los vectores: calorías, proteínas, carbohidratos, grasas
+MACRO_KEYS = list(_MACRO_KEYS)
+
+# Objetivos diarios por defecto
+DEFAULT_TARGETS = {"Calorías": 2000, "Proteínas": 100, "Carbohidratos": 250, "Grasas": 70}
+
+# Peso relativo de cada macro en el error (las calorías importan más)
+DEFAULT_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0])
+
+def nutrition_vector(nutrition):
+    """Vector numérico de macros de un NutritionResult o de un diccionario guardado (números o "165.0 kcal")"""
+    if isinstance(nutrition, NutritionResult):
+        return nutrition.macros.copy()
+    return NutritionResult.from_dict(nutrition).macros
+
+def _day_error(day_sums, targets, weights):
+    """Error cuadrático relativo ponderado de los totales diarios (último eje = macros)"""
+    relative = (day_sums - targets) / targets
+    return (relative * relative) @ weights
+
+def plan_meals(macros, targets, days=7, meals_per_day=3, allowed=None, weights=DEFAULT_WEIGHTS,
+               max_rounds=20, seed=0):
+    """Selecciona un plan de comidas cuyos totales diarios se acerquen a los objetivos
+
+    `macros` es una matriz (recetas x 4) con los macros por porción y `allowed` una
+    máscara booleana con las recetas compatibles con la dieta. Primero se construye
+    el plan de forma voraz y después se mejora con búsqueda local; en ambos pasos se
+    evalúan todas las recetas candidatas a la vez con operaciones vectorizadas.
+    Devuelve (plan, error) donde plan es una matriz (días x comidas) de índices.
+    """
+    macros = np.asarray(macros, dtype=np.float64)
+    targets = np.maximum(np.asarray(targets, dtype=np.float64), 1e-9)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_recipes = macros.shape[0]
+    allowed = np.ones(n_recipes, dtype=bool) if allowed is None else np.asarray(allowed, dtype=bool)
+    candidates = np.flatnonzero(allowed)
+    if candidates.size == 0:
+        raise ValueError("No hay recetas compatibles con la dieta para planificar")
+
+    pool = macros[candidates]
+    slots = days * meals_per_day
+    # Solo evitar repeticiones si hay suficientes recetas distintas
+    unique = candidates.size >= slots
+    used = np.zeros(candidates.size, dtype=bool)
+    rng = np.random.default_rng(seed)
+
+    # ==================== CONSTRUCCIÓN VORAZ ====================
+    plan = np.empty((days, meals_per_day), dtype=np.int64)
+    day_sums = np.zeros((days, macros.shape[1]))
+    for day in range(days):
+        for meal in range(meals_per_day):
+            # Objetivo parcial proporcional a las comidas ya asignadas
+            partial_target = targets * (meal + 1) / meals_per_day
+            errors = _day_error(day_sums[day] + pool, partial_target, weights)
+            if unique:
+                errors[used] = np.inf
+            # Desempatar al azar entre recetas equivalentes para variar el plan
+            errors += rng.random(errors.size) * 1e-9
+            choice = int(np.argmin(errors))
+            plan[day, meal] = choice
+            used[choice] = True
+            day_sums[day] += pool[choice]
+
+    # ==================== BÚSQUEDA LOCAL ====================
+    for _ in range(max_rounds):
+        improved = False
+        for day in range(days):
+            for meal in range(meals_per_day):
+                current = plan[day, meal]
+                without = day_sums[day] - pool[current]
+                errors = _day_error(without + pool, targets, weights)
+                if unique:
+                    errors[used] = np.inf
+                    errors[current] = _day_error(day_sums[day], targets, weights)
+                choice = int(np.argmin(errors))
+                if choice != current and errors[choice] < _day_error(day_sums[day], targets, weights) - 1e-12:
+                    used[current] = False
+                    used[choice] = True
+                    plan[day, meal] = choice
+                    day_sums[day] = without + pool[choice]
+                    improved = True
+        if not improved:
+            break
+
+    error = float(_day_error(day_sums, targets, weights).sum())
+    return candidates[plan], error
+
+def summarize_plan(plan, macros, targets):
+    """Totales diarios y desviación relativa respecto al objetivo"""
+    macros = np.asarray(macros, dtype=np.float64)
+    day_sums = macros[plan].sum(axis=1)
+    deviation = (day_sums - targets) / np.maximum(targets, 1e-9)
+    return day_sums, deviation
+
+def benchmark_planner(pool_sizes=(100, 1000, 5000, 20000), days=7, meals_per_day=3):
+    """Mide el tiempo de resolución para distintos tamaños de conjunto de recetas"""
+    rng = np.random.default_rng(42)
+    targets = nutrition_vector(DEFAULT_TARGETS)
+    results = {}
+    for size in pool_sizes:
+        # Macros sintéticos plausibles por porción
+        macros = np.column_stack([
+            rng.uniform(200, 1000, size),
+            rng.uniform(5, 60, size),
+            rng.uniform(10, 120, size),
+            rng.uniform(2, 50, size),
+        ])
+        allowed = rng.random(size) > 0.2
+        start = time.perf_counter()
+        plan, error = plan_meals(macros, targets, days, meals_per_day, allowed)
+        elapsed = time.perf_counter() - start
+        results[size] = elapsed
+        print(f"🗓️ {size:>6} recetas: {elapsed * 1000:8.1f} ms (error {error:.4f})")
+    return results
+
+if __name__ == "__main__":
+    benchmark_planner()
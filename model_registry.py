@@ -0,0 +1,247 @@
+import os
+import gc
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+# Configuración del gobernador de memoria
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get("MODEL_IDLE_TIMEOUT", "1800"))   # segundos, 0 = nunca
+DEFAULT_RSS_BUDGET_MB = float(os.environ.get("MODEL_RSS_BUDGET_MB", "0"))    # 0 = sin límite
+DEFAULT_SNAPSHOT_DIR = os.environ.get("MODEL_SNAPSHOT_DIR", "model_snapshots")
+
+# Fichero que marca una copia local completa (se escribe justo antes del renombrado)
+SNAPSHOT_MARKER = ".complete"
+
+log = get_logger("models")
+
+def current_rss_mb():
+    """Memoria residente actual del proceso en MB, o None si no se puede medir"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        # ru_maxrss es un máximo histórico: no sirve para decidir expulsiones
+        return None
+
+def model_size_mb(model):
+    """Tamaño de los pesos de un modelo (parámetros y buffers) en MB, o None si no es de torch"""
+    model = getattr(model, "model", model)   # los pipelines envuelven el modelo
+    if not hasattr(model, "parameters"):
+        return None
+    tensors = list(model.parameters()) + list(getattr(model, "buffers", lambda: [])())
+    return sum(t.numel() * t.element_size() for t in tensors) / 1e6
+
+class _Entry:
+    """Estado de un modelo registrado"""
+
+    def __init__(self, name, source, loader):
+        self.name = name
+        self.source = source
+        self.loader = loader
+        self.model = None
+        self.refs = 0
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_s = None
+        self.last_load_from = None
+        self.rss_delta_mb = None
+        self.size_mb = None
+        self.snapshot_thread = None
+
+class ModelRegistry:
+    """Registro de modelos con carga perezosa, conteo de referencias y expulsión
+
+    Los modelos se cargan al primer uso y se expulsan cuando llevan `idle_timeout`
+    segundos sin usarse o cuando la suma de sus tamaños supera `rss_budget_mb`
+    (primero los usados hace más tiempo). El tamaño de cada modelo es el de sus
+    pesos o, si no es de torch, lo que creció la memoria residente al cargarlo; sin
+    /proc no hay medida fiable y el presupuesto se desactiva. Un modelo en uso
+    nunca se expulsa. La primera carga guarda una copia local en `snapshot_dir`
+    (en segundo plano) para que las recargas no dependan del hub.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, rss_budget_mb=DEFAULT_RSS_BUDGET_MB,
+                 snapshot_dir=DEFAULT_SNAPSHOT_DIR, check_interval=30):
+        self.idle_timeout = idle_timeout
+        if rss_budget_mb and current_rss_mb() is None:
+            log.warning("Sin /proc no se puede medir la memoria: presupuesto de %s MB desactivado", rss_budget_mb)
+            rss_budget_mb = 0
+        self.rss_budget_mb = rss_budget_mb
+        self.snapshot_dir = snapshot_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        if check_interval:
+            threading.Thread(target=self._governor_loop, args=(check_interval,),
+                             name="model-governor", daemon=True).start()
+
+    def register(self, name, source, loader):
+        """Registra un modelo: loader(ruta_o_id) debe devolver el objeto cargado"""
+        with self._lock:
+            self._entries[name] = _Entry(name, source, loader)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def _snapshot_path(self, name):
+        return os.path.join(self.snapshot_dir, name) if self.snapshot_dir else None
+
+    def _save_snapshot(self, name, model, snapshot):
+        """Guarda la copia local en un directorio temporal y la publica con un renombrado
+
+        Una copia a medias (proceso interrumpido, disco lleno) nunca queda en
+        `snapshot` con la marca de completa, así que no se carga.
+        """
+        tmp = f"{snapshot}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            model.save_pretrained(tmp)
+            open(os.path.join(tmp, SNAPSHOT_MARKER), "w").close()
+            # Sustituir una copia anterior incompleta
+            shutil.rmtree(snapshot, ignore_errors=True)
+            os.replace(tmp, snapshot)
+        except Exception as e:
+            log.warning("No se pudo guardar la copia local de '%s': %s", name, e)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _load(self, entry):
+        """Carga un modelo desde la copia local si está completa, o desde su origen"""
+        snapshot = self._snapshot_path(entry.name)
+        from_snapshot = bool(snapshot and os.path.isfile(os.path.join(snapshot, SNAPSHOT_MARKER)))
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        model = entry.loader(snapshot if from_snapshot else entry.source)
+        entry.last_load_s = time.perf_counter() - start
+        entry.last_load_from = "snapshot" if from_snapshot else "source"
+        rss_after = current_rss_mb()
+        entry.rss_delta_mb = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        # Preferir el tamaño de los pesos: el crecimiento de RSS incluye ruido de otros hilos
+        entry.size_mb = model_size_mb(model)
+        if entry.size_mb is None and entry.rss_delta_mb is not None:
+            entry.size_mb = max(entry.rss_delta_mb, 0.0)
+        entry.loads += 1
+        log.info("Modelo '%s' cargado desde %s en %.1fs", entry.name, entry.last_load_from, entry.last_load_s,
+                 extra={"model": entry.name, "size_mb": entry.size_mb})
+        return model
+
+    def _start_snapshot(self, entry):
+        """Guarda la copia local en un hilo aparte, sin retener a las peticiones que esperan el modelo"""
+        snapshot = self._snapshot_path(entry.name)
+        if not snapshot or entry.last_load_from != "source" or not hasattr(entry.model, "save_pretrained"):
+            return
+        if entry.snapshot_thread and entry.snapshot_thread.is_alive():
+            return
+        entry.snapshot_thread = threading.Thread(target=self._save_snapshot, args=(entry.name, entry.model, snapshot),
+                                                 name=f"model-snapshot-{entry.name}", daemon=True)
+        entry.snapshot_thread.start()
+
+    def wait_snapshots(self, timeout=None):
+        """Espera a que terminen las copias locales en curso"""
+        for entry in list(self._entries.values()):
+            if entry.snapshot_thread:
+                entry.snapshot_thread.join(timeout)
+
+    @contextmanager
+    def acquire(self, name):
+        """Usa un modelo (cargándolo si hace falta) sin que pueda expulsarse mientras tanto"""
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None:
+                entry.model = self._load(entry)
+                self._start_snapshot(entry)
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+        try:
+            yield entry.model
+        finally:
+            with entry.lock:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+        # Al liberar, comprobar el presupuesto de memoria
+        if self.rss_budget_mb:
+            self.enforce_budget()
+
+    def evict(self, name):
+        """Descarga un modelo si no está en uso; devuelve True si se descargó"""
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None or entry.refs > 0:
+                return False
+            entry.model = None
+            entry.evictions += 1
+        gc.collect()
+        log.info("Modelo '%s' descargado", name, extra={"model": name})
+        return True
+
+    def evict_idle(self):
+        """Descarga los modelos que llevan más de idle_timeout segundos sin usarse"""
+        if not self.idle_timeout:
+            return []
+        now = time.monotonic()
+        idle = [e.name for e in self._entries.values()
+                if e.model is not None and e.refs == 0 and now - e.last_used > self.idle_timeout]
+        return [name for name in idle if self.evict(name)]
+
+    def resident_mb(self):
+        """Suma de los tamaños de los modelos cargados"""
+        return sum(e.size_mb or 0.0 for e in self._entries.values() if e.model is not None)
+
+    def enforce_budget(self):
+        """Descarga los modelos usados hace más tiempo hasta que sus tamaños quepan en el presupuesto"""
+        if not self.rss_budget_mb:
+            return []
+        evicted = []
+        candidates = sorted(
+            (e for e in self._entries.values() if e.model is not None and e.refs == 0),
+            key=lambda e: e.last_used
+        )
+        # Se descuenta el tamaño conocido de cada modelo: el RSS del proceso apenas
+        # baja tras gc.collect() y provocaría cargas y expulsiones en bucle
+        excess = self.resident_mb() - self.rss_budget_mb
+        for entry in candidates:
+            if excess <= 0:
+                break
+            size = entry.size_mb or 0.0
+            if self.evict(entry.name):
+                evicted.append(entry.name)
+                excess -= size
+        return evicted
+
+    def _governor_loop(self, interval):
+        """Hilo de fondo: expulsión por inactividad y por presupuesto de memoria"""
+        while not self._stop_event.wait(interval):
+            try:
+                self.evict_idle()
+                self.enforce_budget()
+            except Exception as e:
+                log.error("Error en el gobernador de modelos: %s", e, rate_limit=(1, 300))
+
+    def stop(self):
+        """Detiene el hilo gobernador"""
+        self._stop_event.set()
+
+    def metrics(self):
+        """Residencia, referencias y latencia de carga de cada modelo"""
+        now = time.monotonic()
+        rss = current_rss_mb()
+        result = {"rss_mb": round(rss, 1) if rss is not None else None, "resident_mb": round(self.resident_mb(), 1),
+                  "rss_budget_mb": self.rss_budget_mb, "models": {}}
+        for entry in self._entries.values():
+            result["models"][entry.name] = {
+                "resident": entry.model is not None,
+                "refs": entry.refs,
+                "loads": entry.loads,
+                "evictions": entry.evictions,
+                "last_load_s": entry.last_load_s,
+                "last_load_from": entry.last_load_from,
+                "rss_delta_mb": entry.rss_delta_mb,
+                "size_mb": entry.size_mb,
+                "idle_s": round(now - entry.last_used, 1) if entry.last_used else None,
+            }
+        return result
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Empaquetado de modelos para arranques sin conexión.
+
+    python model_snapshot.py package --output artifacts/models-v1 --version v1
+    python model_snapshot.py verify artifacts/models-v1
+    python model_snapshot.py benchmark artifacts/models-v1
+
+`package` descarga los modelos una vez, los convierte a safetensors y escribe un
+manifest.json con la suma SHA-256 de cada fichero. Con RECIPE_DRAFT_MODEL
+definido también empaqueta el modelo borrador de la decodificación asistida. En producción, con
+MODEL_ARTIFACT_DIR apuntando al artefacto, la app valida el manifiesto y carga
+los modelos solo desde disco (safetensors se mapea en memoria).
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from speculative_decoding import DRAFT_MODEL
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+# Modelo para generación de recetas (T5 fine-tuned)
+GENERATOR_MODEL = "flax-community/t5-recipe-generation"
+
+# Modelos de la aplicación: nombre -> (origen en el hub, tipo)
+MODEL_SPECS = {
+    "classifier": ("bert-base-uncased", "text-classification"),
+    "tokenizer": (GENERATOR_MODEL, "tokenizer"),
+    "generator": (GENERATOR_MODEL, "seq2seq"),
+}
+
+# Modelos opcionales: se empaquetan si están configurados, pero el artefacto es válido sin ellos
+OPTIONAL_MODEL_SPECS = {"draft": (DRAFT_MODEL, "seq2seq")} if DRAFT_MODEL else {}
+
+# Verificación al arrancar: "full" (SHA-256 de todo), "size" (solo tamaños) u "off"
+DEFAULT_VERIFY = os.environ.get("MODEL_SNAPSHOT_VERIFY", "full")
+
+class SnapshotError(Exception):
+    """El artefacto de modelos falta, está incompleto o no coincide con su manifiesto"""
+
+def build_loader(kind, offline=False):
+    """Devuelve loader(ruta_o_id) para un tipo de modelo"""
+    def load(source):
+        from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+        options = {"local_files_only": True} if offline else {}
+        if kind == "text-classification":
+            return pipeline("text-classification", model=source, top_k=None, model_kwargs=options)
+        if kind == "tokenizer":
+            return AutoTokenizer.from_pretrained(source, **options)
+        if kind == "seq2seq":
+            return AutoModelForSeq2SeqLM.from_pretrained(source, **options)
+        raise ValueError(f"Tipo de modelo desconocido: {kind}")
+    return load
+
+def _sha256(path, chunk_size=1 << 20):
+    """Suma SHA-256 de un fichero"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _list_files(directory):
+    """Ficheros de un directorio, con rutas relativas y ordenadas"""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(files)
+
+# ==================== EMPAQUETADO ====================
+
+def package_models(output_dir, version=None):
+    """Descarga los modelos, los guarda en safetensors y escribe el manifiesto"""
+    import transformers
+
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "transformers_version": transformers.__version__,
+        "python_version": platform.python_version(),
+        "models": {},
+    }
+    for name, (source, kind) in {**MODEL_SPECS, **OPTIONAL_MODEL_SPECS}.items():
+        print(f"📦 Empaquetando {name} ({source})...")
+        target = os.path.join(output_dir, name)
+        model = build_loader(kind)(source)
+        if kind == "tokenizer":
+            model.save_pretrained(target)
+        else:
+            # Convertir los pesos a safetensors una sola vez
+            model.save_pretrained(target, safe_serialization=True)
+        files = {}
+        for relative in _list_files(target):
+            path = os.path.join(target, relative)
+            files[relative] = {"sha256": _sha256(path), "size": os.path.getsize(path)}
+        manifest["models"][name] = {"source": source, "kind": kind, "files": files}
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Artefacto {version} guardado en {output_dir}")
+    return manifest
+
+# ==================== VERIFICACIÓN Y CARGA ====================
+
+def read_manifest(artifact_dir):
+    """Lee el manifiesto de un artefacto"""
+    path = os.path.join(artifact_dir, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        raise SnapshotError(f"No se encontró {MANIFEST_NAME} en {artifact_dir}")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise SnapshotError(f"Formato de artefacto no soportado: {manifest.get('format_version')}")
+    return manifest
+
+def verify_snapshot(artifact_dir, mode=DEFAULT_VERIFY):
+    """Comprueba que todos los ficheros del manifiesto existen y coinciden"""
+    manifest = read_manifest(artifact_dir)
+    if mode == "off":
+        return manifest
+    for name in MODEL_SPECS:
+        if name not in manifest["models"]:
+            raise SnapshotError(f"El artefacto no contiene el modelo '{name}'")
+    for name, model in manifest["models"].items():
+        for relative, expected in model["files"].items():
+            path = os.path.join(artifact_dir, name, relative)
+            if not os.path.isfile(path):
+                raise SnapshotError(f"Falta {name}/{relative}")
+            if os.path.getsize(path) != expected["size"]:
+                raise SnapshotError(f"Tamaño incorrecto en {name}/{relative}")
+            if mode == "full" and _sha256(path) != expected["sha256"]:
+                raise SnapshotError(f"Suma de comprobación incorrecta en {name}/{relative}")
+    return manifest
+
+def snapshot_sources(artifact_dir):
+    """Rutas locales y loaders sin conexión de cada modelo del artefacto (opcionales incluidos)"""
+    manifest = read_manifest(artifact_dir)
+    # Impedir cualquier acceso al hub durante la carga
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    return {
+        name: (os.path.join(artifact_dir, name), build_loader(model["kind"], offline=True))
+        for name, model in manifest["models"].items()
+    }
+
+# ==================== ARRANQUE EN FRÍO ====================
+
+def _time_cold_load(artifact_dir=None):
+    """Carga los modelos en un proceso nuevo y devuelve los segundos empleados"""
+    code = (
+        "import time, model_snapshot as m\n"
+        "start = time.perf_counter()\n"
+        f"artifact = {artifact_dir!r}\n"
+        "if artifact:\n"
+        "    m.verify_snapshot(artifact)\n"
+        "    for source, loader in m.snapshot_sources(artifact).values(): loader(source)\n"
+        "else:\n"
+        "    for source, kind in m.MODEL_SPECS.values(): m.build_loader(kind)(source)\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "error")
+    return float(result.stdout.strip().splitlines()[-1])
+
+def benchmark_cold_start(artifact_dir, repeats=3):
+    """Compara el arranque en frío desde el hub (con caché local) y desde el artefacto"""
+    results = {}
+    for label, source in (("hub", None), ("artifact", artifact_dir)):
+        times = []
+        for _ in range(repeats):
+            try:
+                times.append(_time_cold_load(source))
+            except RuntimeError as e:
+                print(f"❌ Error cargando desde {label}: {e}")
+                break
+        if times:
+            results[label] = min(times)
+            print(f"⏱️ {label:<8}: {min(times):.2f}s (mejor de {len(times)})")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Artefactos de modelos para arranques sin conexión")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    package = subparsers.add_parser("package", help="descargar y empaquetar los modelos")
+    package.add_argument("--output", required=True)
+    package.add_argument("--version")
+    verify = subparsers.add_parser("verify", help="comprobar un artefacto")
+    verify.add_argument("artifact")
+    verify.add_argument("--mode", default="full", choices=["full", "size"])
+    benchmark = subparsers.add_parser("benchmark", help="medir el arranque en frío")
+    benchmark.add_argument("artifact")
+    benchmark.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "package":
+        package_models(args.output, args.version)
+    elif args.command == "verify":
+        try:
+            manifest = verify_snapshot(args.artifact, args.mode)
+        except SnapshotError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Artefacto {manifest['version']} válido ({len(manifest['models'])} modelos)")
+    else:
+        benchmark_cold_start(args.artifact, args.repeats)
+
+if __name__ == "__main__":
+    main()
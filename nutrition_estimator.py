@@ -1,56 +1,77 @@
 import re
-import pandas as pd
 import requests
 import json
 import base64
+import os
 from datetime import datetime, timedelta
+import time
+import threading
+from ingredient_parser import parse_ingredient_line, to_grams, UNIT_TO_GRAMS, UNIT_TO_ML
+from single_flight import SingleFlight
+from ingredient_normalizer import normalize_ingredient
+from fatsecret_scheduler import get_scheduler
+from structured_logging import get_logger
+from shared_cache import get_cache
+import numpy as np
+from nutrition_result import (
+    NutritionResult, NutritionBatch, IngredientNutrition, SOURCES, SOURCE_CONFIDENCE,
+    SOURCE_FATSECRET, SOURCE_MIXED, SOURCE_ESTIMATE, SOURCE_DEFAULT, combine_sources
+)
+
+# Modo de resolución: "search" extrae los macros de foods.search y solo usa food.get
+# si la descripción falta o es ambigua; "details" consulta siempre food.get
+NUTRITION_RESOLUTION = os.environ.get("NUTRITION_RESOLUTION", "search")
+SEARCH_MAX_RESULTS = int(os.environ.get("FATSECRET_MAX_RESULTS", "10"))
+
+log = get_logger("nutrition")
+
+# Búsquedas concurrentes del mismo ingrediente comparten una sola consulta a FatSecret
+nutrition_flight = SingleFlight("nutrition")
+
+# Mapeo simplificado de ingredientes (en forma canónica) a valores nutricionales por porción
+# ("grams" es el peso de esa porción, usado para escalar según la cantidad)
+NUTRITION_MAP = {
+    "chicken": {"cal": 165, "prot": 31, "carb": 0, "fat": 3.6, "grams": 100},
+    "rice": {"cal": 130, "prot": 2.7, "carb": 28, "fat": 0.3, "grams": 100},
+    "tomato": {"cal": 18, "prot": 0.9, "carb": 3.9, "fat": 0.2, "grams": 100},
+    "onion": {"cal": 40, "prot": 1.1, "carb": 9.3, "fat": 0.1, "grams": 100},
+    "oil": {"cal": 120, "prot": 0, "carb": 0, "fat": 14, "grams": 14},
+}
 
 def estimate_nutrition(ingredients):
     """Estima valores nutricionales básicos (versión simplificada)"""
     # Este es un placeholder - en una implementación real usarías una API como Edamam
-    nutrition = {
-        "Calorías": 0,
-        "Proteínas": 0,
-        "Carbohidratos": 0,
-        "Grasas": 0
-    }
-    
-    # Mapeo simplificado de ingredientes a valores nutricionales
-    nutrition_map = {
-        "pollo": {"cal": 165, "prot": 31, "carb": 0, "fat": 3.6},
-        "arroz": {"cal": 130, "prot": 2.7, "carb": 28, "fat": 0.3},
-        "tomate": {"cal": 18, "prot": 0.9, "carb": 3.9, "fat": 0.2},
-        "cebolla": {"cal": 40, "prot": 1.1, "carb": 9.3, "fat": 0.1},
-        "aceite": {"cal": 120, "prot": 0, "carb": 0, "fat": 14}
-    }
+    totals = np.zeros(4)
+    breakdown = []
+    matched = 0
     
     for ingredient in ingredients:
-        ingredient = ingredient.lower().strip()
-        for key, values in nutrition_map.items():
+        ingredient = normalize_ingredient(ingredient)
+        found = False
+        for key, values in NUTRITION_MAP.items():
             if key in ingredient:
-                nutrition["Calorías"] += values["cal"]
-                nutrition["Proteínas"] += values["prot"]
-                nutrition["Carbohidratos"] += values["carb"]
-                nutrition["Grasas"] += values["fat"]
+                macros = [values["cal"], values["prot"], values["carb"], values["fat"]]
+                totals += macros
+                breakdown.append(IngredientNutrition(key, values["grams"], SOURCE_ESTIMATE, macros))
+                found = True
+        matched += found
     
-    # Formatear resultados
-    return {
-        "Calorías": f"{nutrition['Calorías']} kcal",
-        "Proteínas": f"{nutrition['Proteínas']}g",
-        "Carbohidratos": f"{nutrition['Carbohidratos']}g",
-        "Grasas": f"{nutrition['Grasas']}g"
-    }
+    confidence = SOURCE_CONFIDENCE[SOURCE_ESTIMATE] * matched / len(ingredients) if ingredients else 0.0
+    return NutritionResult(totals, SOURCE_ESTIMATE if matched else combine_sources(0, 0), confidence, breakdown)
 
 class FatSecretAPI:
     """Cliente para la API de FatSecret usando OAuth 2.0"""
     
     def __init__(self):
-        self.client_id = "231f56f270844a0d96dec5af8923c662"
-        self.client_secret = "147a661e168d47bbb0dc157d52408d98"
-        self.token_url = "https://oauth.fatsecret.com/connect/token"
-        self.api_url = "https://platform.fatsecret.com/rest/server.api"
+        self.client_id = os.environ.get("FATSECRET_CLIENT_ID", "231f56f270844a0d96dec5af8923c662")
+        self.client_secret = os.environ.get("FATSECRET_CLIENT_SECRET", "147a661e168d47bbb0dc157d52408d98")
+        # Las URLs se pueden redirigir (p. ej. a un servidor simulado en pruebas de carga)
+        self.token_url = os.environ.get("FATSECRET_TOKEN_URL", "https://oauth.fatsecret.com/connect/token")
+        self.api_url = os.environ.get("FATSECRET_API_URL", "https://platform.fatsecret.com/rest/server.api")
         self.access_token = None
         self.token_expires_at = None
+        # Varias sesiones comparten el cliente: solo una renueva el token a la vez
+        self._token_lock = threading.Lock()
     
     def get_access_token(self):
         """Obtiene un token de acceso OAuth 2.0"""
@@ -69,7 +90,8 @@ class FatSecretAPI:
                 'scope': 'basic'
             }
             
-            response = requests.post(self.token_url, headers=headers, data=data)
+            response = get_scheduler().call(
+                lambda timeout: requests.post(self.token_url, headers=headers, data=data, timeout=timeout))
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -78,11 +100,11 @@ class FatSecretAPI:
                 self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
                 return True
             else:
-                print(f"Error obteniendo token: {response.status_code} - {response.text}")
+                log.error("Error obteniendo token: HTTP %s", response.status_code, extra={"body": response.text[:200]})
                 return False
                 
         except Exception as e:
-            print(f"Error en autenticación: {str(e)}")
+            log.error("Error en autenticación: %s", e)
             return False
     
     def is_token_valid(self):
@@ -95,11 +117,12 @@ class FatSecretAPI:
     
     def ensure_valid_token(self):
         """Asegura que tenemos un token válido"""
-        if not self.is_token_valid():
-            return self.get_access_token()
-        return True
+        if self.is_token_valid():
+            return True
+        with self._token_lock:
+            return self.is_token_valid() or self.get_access_token()
     
-    def search_food(self, search_term):
+    def search_food(self, search_term, max_results=SEARCH_MAX_RESULTS):
         """Busca alimentos en la base de datos de FatSecret"""
         if not self.ensure_valid_token():
             return None
@@ -113,10 +136,12 @@ class FatSecretAPI:
             params = {
                 'method': 'foods.search',
                 'search_expression': search_term,
+                'max_results': max_results,
                 'format': 'json'
             }
             
-            response = requests.post(self.api_url, headers=headers, data=params)
+            response = get_scheduler().call(
+                lambda timeout: requests.post(self.api_url, headers=headers, data=params, timeout=timeout))
             
             if response.status_code == 200:
                 try:
@@ -128,29 +153,25 @@ class FatSecretAPI:
                         error_message = json_response['error'].get('message')
                         
                         if error_code == 21:  # Error de IP no autorizada
-                            print(f"🚫 IP NO AUTORIZADA: {error_message}")
-                            print("📋 SOLUCIÓN:")
-                            print("   1. Ve a https://platform.fatsecret.com")
-                            print("   2. Accede a tu aplicación registrada")
-                            print("   3. Encuentra la sección 'IP Management' o 'Allowed IPs'")
-                            print(f"   4. Añade tu IP actual a la lista de permitidas")
-                            print("   5. Guarda los cambios y vuelve a intentar")
+                            # Las instrucciones completas están en show_ip_setup_instructions()
+                            log.error("IP no autorizada en FatSecret: %s (añádela en IP Management de "
+                                      "https://platform.fatsecret.com)", error_message, rate_limit=(1, 600))
                             return None
                         else:
-                            print(f"❌ Error de API - Código {error_code}: {error_message}")
+                            log.error("Error de API FatSecret: %s", error_message, extra={"code": error_code})
                             return None
                     
                     return json_response
                     
                 except json.JSONDecodeError as e:
-                    print(f"❌ Error decodificando JSON: {e}")
+                    log.error("Error decodificando JSON: %s", e)
                     return None
             else:
-                print(f"❌ Error HTTP {response.status_code}: {response.text}")
+                log.error("Error HTTP %s en búsqueda", response.status_code, extra={"body": response.text[:200]})
                 return None
                 
         except Exception as e:
-            print(f"❌ Error en búsqueda de alimento: {str(e)}")
+            log.error("Error en búsqueda de alimento: %s", e)
             return None
     
     def get_food_details(self, food_id):
@@ -170,106 +191,365 @@ class FatSecretAPI:
                 'format': 'json'
             }
             
-            response = requests.post(self.api_url, headers=headers, data=params)
+            response = get_scheduler().call(
+                lambda timeout: requests.post(self.api_url, headers=headers, data=params, timeout=timeout))
             
             if response.status_code == 200:
                 return response.json()
             else:
-                print(f"Error obteniendo detalles del alimento {food_id}: {response.status_code}")
+                log.error("Error HTTP %s obteniendo detalles del alimento", response.status_code,
+                          extra={"food_id": food_id})
                 return None
                 
         except Exception as e:
-            print(f"Error obteniendo detalles del alimento: {str(e)}")
+            log.error("Error obteniendo detalles del alimento: %s", e)
             return None
 
-def get_real_nutrition(ingredients):
-    """Obtiene información nutricional real usando FatSecret API"""
-    fatsecret = FatSecretAPI()
+_fatsecret = None
+_fatsecret_lock = threading.Lock()
+
+def get_fatsecret():
+    """Cliente de FatSecret compartido por todo el proceso (un solo token para todas las consultas)"""
+    global _fatsecret
+    with _fatsecret_lock:
+        if _fatsecret is None:
+            _fatsecret = FatSecretAPI()
+        return _fatsecret
+
+def _select_serving(serving_data):
+    """Elige la porción con peso métrico en gramos (o la primera si no hay ninguna)"""
+    if not isinstance(serving_data, list):
+        serving_data = [serving_data]
+    for serving in serving_data:
+        if serving.get('metric_serving_unit') == 'g' and serving.get('metric_serving_amount'):
+            return serving
+    return serving_data[0]
+
+def lookup_ingredient_nutrition(fatsecret, ingredient):
+    """Busca un ingrediente en FatSecret y devuelve los macros de una porción
+
+    Devuelve un diccionario con cal, prot, carb, fat y grams (peso de la porción
+    en gramos, o None si FatSecret no lo indica), o None si no se encontró.
+    Las búsquedas simultáneas del mismo ingrediente se agrupan en una sola.
+    """
+    key = normalize_ingredient(ingredient)
+    return nutrition_flight.do(key, _cached_lookup, fatsecret, key)
+
+def _cached_lookup(fatsecret, ingredient):
+    """Consulta la caché compartida antes que FatSecret; solo se guardan los ingredientes encontrados"""
+    cache = get_cache()
+    cache_key = [NUTRITION_RESOLUTION, ingredient]
+    nutrition = cache.get("nutrition", cache_key)
+    if nutrition is not None:
+        _count(cache_hits=1)
+        return nutrition
+    nutrition = _lookup_ingredient_nutrition(fatsecret, ingredient)
+    if nutrition:
+        cache.set("nutrition", cache_key, nutrition)
+    return nutrition
+
+# Estadísticas de consultas a FatSecret por ingrediente
+_lookup_stats_lock = threading.Lock()
+_lookup_stats = {"ingredients": 0, "search_calls": 0, "detail_calls": 0,
+                 "from_description": 0, "detail_fallbacks": 0, "not_found": 0, "cache_hits": 0, "latency_s": 0.0}
+
+def _count(**increments):
+    """Suma incrementos a las estadísticas de consultas"""
+    with _lookup_stats_lock:
+        for key, value in increments.items():
+            _lookup_stats[key] += value
+
+def get_lookup_stats():
+    """Llamadas a FatSecret por ingrediente y latencia media por ingrediente"""
+    with _lookup_stats_lock:
+        stats = dict(_lookup_stats)
+    ingredients = stats["ingredients"] or 1
+    stats["calls_per_ingredient"] = (stats["search_calls"] + stats["detail_calls"]) / ingredients
+    stats["avg_latency_ms"] = stats["latency_s"] * 1000 / ingredients
+    return stats
+
+_DESCRIPTION_RE = re.compile(
+    r"Per\s+(?P<serving>.+?)\s+-\s+Calories:\s*(?P<cal>[\d.]+)\s*kcal\s*\|\s*Fat:\s*(?P<fat>[\d.]+)\s*g"
+    r"\s*\|\s*Carbs:\s*(?P<carb>[\d.]+)\s*g\s*\|\s*Protein:\s*(?P<prot>[\d.]+)\s*g",
+    re.IGNORECASE
+)
+
+def parse_food_description(description, food_name=""):
+    """Extrae los macros de la descripción de foods.search
+
+    Ejemplo: "Per 100g - Calories: 165kcal | Fat: 3.57g | Carbs: 0.00g | Protein: 31.02g".
+    Devuelve None si la descripción falta o si la porción no se puede convertir a
+    gramos ("Per 1 serving", "Per 1 medium"), en cuyo caso hay que usar food.get.
+    """
+    match = _DESCRIPTION_RE.search(description or "")
+    if not match:
+        return None
+    serving = parse_ingredient_line(f"{match.group('serving')} {food_name}".strip())
+    if serving.unit not in UNIT_TO_GRAMS and serving.unit not in UNIT_TO_ML:
+        return None
+    return {
+        "cal": float(match.group("cal")),
+        "prot": float(match.group("prot")),
+        "carb": float(match.group("carb")),
+        "fat": float(match.group("fat")),
+        "grams": to_grams(serving)
+    }
+
+_WORD_RE = re.compile(r"[a-záéíóúñü]+")
+
+def _match_score(ingredient, food):
+    """Puntuación de parecido entre el ingrediente buscado y un resultado de búsqueda"""
+    query = set(_WORD_RE.findall(ingredient.lower()))
+    name = food.get('food_name', '').lower()
+    words = set(_WORD_RE.findall(name))
+    if not query or not words:
+        return 0.0
+    score = len(query & words) / len(query | words)
+    if name == ingredient.lower():
+        score += 1.0
+    # Preferir alimentos genéricos frente a productos de marca
+    if food.get('food_type') == 'Generic' or 'brand_name' not in food:
+        score += 0.25
+    return score
+
+def select_best_food(ingredient, foods):
+    """Elige el resultado que mejor coincide con el ingrediente (no simplemente el primero)"""
+    if not isinstance(foods, list):
+        return foods
+    best_index = max(range(len(foods)), key=lambda i: (_match_score(ingredient, foods[i]), -i))
+    return foods[best_index]
+
+def _lookup_ingredient_nutrition(fatsecret, ingredient):
+    """Consulta FatSecret para un ingrediente (búsqueda y, si hace falta, detalles)"""
+    log.debug("Buscando información nutricional para: %s", ingredient)
+    start = time.perf_counter()
+    try:
+        nutrition = _resolve_ingredient_nutrition(fatsecret, ingredient)
+    finally:
+        _count(ingredients=1, latency_s=time.perf_counter() - start)
+    if nutrition is None:
+        _count(not_found=1)
+    return nutrition
+
+def _resolve_ingredient_nutrition(fatsecret, ingredient):
+    """Resuelve los macros de un ingrediente según NUTRITION_RESOLUTION"""
+    # Buscar el alimento
+    search_result = fatsecret.search_food(ingredient)
+    _count(search_calls=1)
+    
+    if not search_result or 'foods' not in search_result:
+        log.warning("Error en búsqueda para: %s", ingredient)
+        return None
+    
+    foods_data = search_result['foods']
+    if 'food' not in foods_data or len(foods_data['food']) == 0:
+        log.info("No se encontraron resultados para: %s", ingredient)
+        return None
+    
+    best_food = select_best_food(ingredient, foods_data['food'])
+    
+    # Los macros ya vienen en la descripción de la búsqueda
+    if NUTRITION_RESOLUTION == "search":
+        nutrition = parse_food_description(best_food.get('food_description'), best_food.get('food_name', ''))
+        if nutrition:
+            _count(from_description=1)
+            log.debug("Encontrado: %s - %s kcal", ingredient, nutrition["cal"])
+            return nutrition
+        _count(detail_fallbacks=1)
+    
+    food_id = best_food.get('food_id')
+    if not food_id:
+        log.info("No se encontró ID para: %s", ingredient)
+        return None
+    
+    # Obtener detalles nutricionales
+    food_details = fatsecret.get_food_details(food_id)
+    _count(detail_calls=1)
+    if not food_details or 'food' not in food_details:
+        log.warning("No se pudieron obtener detalles para: %s", ingredient)
+        return None
+    
+    servings = food_details['food'].get('servings', {})
+    if 'serving' not in servings:
+        log.info("No se encontraron porciones para: %s", ingredient)
+        return None
     
-    total_nutrition = {
-        "Calorías": 0,
-        "Proteínas": 0,
-        "Carbohidratos": 0,
-        "Grasas": 0
+    serving_data = _select_serving(servings['serving'])
+    grams = serving_data.get('metric_serving_amount') if serving_data.get('metric_serving_unit') == 'g' else None
+    
+    # Extraer información nutricional
+    nutrition = {
+        "cal": float(serving_data.get('calories', 0)),
+        "prot": float(serving_data.get('protein', 0)),
+        "carb": float(serving_data.get('carbohydrate', 0)),
+        "fat": float(serving_data.get('fat', 0)),
+        "grams": float(grams) if grams else None
     }
+    log.debug("Encontrado: %s - %s kcal", ingredient, nutrition["cal"])
+    return nutrition
+
+def _nutrition_macros(nutrition):
+    """Vector de macros de una porción devuelta por FatSecret o por la tabla simplificada"""
+    return np.array([nutrition["cal"], nutrition["prot"], nutrition["carb"], nutrition["fat"]], dtype=np.float64)
+
+def get_real_nutrition(ingredients):
+    """Obtiene información nutricional real usando FatSecret API"""
+    fatsecret = get_fatsecret()
     
-    successful_lookups = 0
+    totals = np.zeros(4)
+    breakdown = []
     
     try:
         for ingredient in ingredients:
-            # Limpiar el ingrediente
-            clean_ingredient = ingredient.strip().lower()
+            # Limpiar el ingrediente (forma canónica en inglés)
+            clean_ingredient = normalize_ingredient(ingredient)
             if not clean_ingredient:
                 continue
             
-            print(f"Buscando información nutricional para: {clean_ingredient}")
-            
-            # Buscar el alimento
-            search_result = fatsecret.search_food(clean_ingredient)
-            
-            if search_result and 'foods' in search_result:
-                foods_data = search_result['foods']
-                
-                if 'food' in foods_data and len(foods_data['food']) > 0:
-                    # Tomar el primer resultado
-                    first_food = foods_data['food'][0] if isinstance(foods_data['food'], list) else foods_data['food']
-                    food_id = first_food.get('food_id')
-                    
-                    if food_id:
-                        # Obtener detalles nutricionales
-                        food_details = fatsecret.get_food_details(food_id)
-                        
-                        if food_details and 'food' in food_details:
-                            food_info = food_details['food']
-                            servings = food_info.get('servings', {})
-                            
-                            if 'serving' in servings:
-                                serving_data = servings['serving']
-                                if isinstance(serving_data, list):
-                                    serving_data = serving_data[0]  # Tomar la primera porción
-                                
-                                # Extraer información nutricional
-                                calories = float(serving_data.get('calories', 0))
-                                protein = float(serving_data.get('protein', 0))
-                                carbs = float(serving_data.get('carbohydrate', 0))
-                                fat = float(serving_data.get('fat', 0))
-                                
-                                total_nutrition["Calorías"] += calories
-                                total_nutrition["Proteínas"] += protein
-                                total_nutrition["Carbohidratos"] += carbs
-                                total_nutrition["Grasas"] += fat
-                                
-                                successful_lookups += 1
-                                print(f"✓ Encontrado: {clean_ingredient} - {calories} kcal")
-                            else:
-                                print(f"⚠ No se encontraron porciones para: {clean_ingredient}")
-                        else:
-                            print(f"⚠ No se pudieron obtener detalles para: {clean_ingredient}")
-                    else:
-                        print(f"⚠ No se encontró ID para: {clean_ingredient}")
-                else:
-                    print(f"⚠ No se encontraron resultados para: {clean_ingredient}")
-            else:
-                print(f"⚠ Error en búsqueda para: {clean_ingredient}")
+            nutrition = lookup_ingredient_nutrition(fatsecret, clean_ingredient)
+            if nutrition:
+                macros = _nutrition_macros(nutrition)
+                totals += macros
+                breakdown.append(IngredientNutrition(clean_ingredient, nutrition["grams"], SOURCE_FATSECRET, macros))
         
-        if successful_lookups > 0:
-            print(f"\n✓ Se procesaron exitosamente {successful_lookups} de {len(ingredients)} ingredientes")
-            
-            return {
-                "Calorías": f"{total_nutrition['Calorías']:.1f} kcal",
-                "Proteínas": f"{total_nutrition['Proteínas']:.1f}g",
-                "Carbohidratos": f"{total_nutrition['Carbohidratos']:.1f}g",
-                "Grasas": f"{total_nutrition['Grasas']:.1f}g"
-            }
+        if breakdown:
+            log.info("Nutrición con %s de %s ingredientes", len(breakdown), len(ingredients))
+            return NutritionResult(totals, SOURCE_FATSECRET, len(breakdown) / len(ingredients), breakdown)
         else:
-            print("⚠ No se pudo obtener información nutricional de FatSecret. Usando estimación básica.")
+            log.warning("Sin datos de FatSecret; se usa la estimación básica")
             return estimate_nutrition(ingredients)
             
-    except Exception as e:
-        print(f"Error general en get_real_nutrition: {str(e)}")
-        print("Usando estimación básica como respaldo.")
+    except Exception:
+        log.exception("Error general en get_real_nutrition; se usa la estimación básica")
         return estimate_nutrition(ingredients)
 
+def _estimate_ingredient(name):
+    """Macros de una porción según el mapa simplificado (o None si no se conoce)"""
+    name = normalize_ingredient(name)
+    for key, values in NUTRITION_MAP.items():
+        if key in name:
+            return values
+    return None
+
+def _resolve_with_fallback(fatsecret, name):
+    """Macros de un ingrediente (FatSecret o tabla simplificada) y su origen, o (None, None)"""
+    nutrition = lookup_ingredient_nutrition(fatsecret, name)
+    if nutrition:
+        return nutrition, SOURCE_FATSECRET
+    nutrition = _estimate_ingredient(name)
+    if nutrition:
+        return nutrition, SOURCE_ESTIMATE
+    return None, None
+
+def get_recipe_nutrition(ingredient_lines, servings=4):
+    """Calcula la nutrición por porción a partir de las cantidades de la receta generada
+
+    Cada línea ("2 c. cooked rice", "1 lb chicken breast") se analiza para obtener
+    su peso en gramos; los macros de FatSecret (o de la estimación básica) se
+    escalan a ese peso y el total se divide entre el número de porciones.
+    """
+    fatsecret = get_fatsecret()
+    servings = max(1, int(servings or 1))
+    
+    totals = np.zeros(4)
+    breakdown = []
+    considered = 0
+    parsed_lines = [parse_ingredient_line(line.strip()) for line in ingredient_lines if line and line.strip()]
+    
+    try:
+        for parsed in parsed_lines:
+            if not parsed.name:
+                continue
+            grams = to_grams(parsed)
+            if grams == 0:
+                continue  # "salt to taste"
+            considered += 1
+            
+            nutrition, source = _resolve_with_fallback(fatsecret, parsed.name)
+            if not nutrition:
+                continue
+            
+            # Sin peso de referencia, contar una porción por ingrediente
+            scale = grams / nutrition["grams"] if nutrition.get("grams") else 1.0
+            macros = _nutrition_macros(nutrition) * scale
+            totals += macros
+            breakdown.append(IngredientNutrition(parsed.name, grams, source, macros))
+    except Exception:
+        log.exception("Error general en get_recipe_nutrition")
+    
+    if not breakdown:
+        log.warning("No se pudo calcular la nutrición de la receta; se usa la estimación básica")
+        return estimate_nutrition([parsed.name for parsed in parsed_lines])
+    
+    log.info("Nutrición calculada con %s de %s ingredientes", len(breakdown), len(parsed_lines),
+             extra={"servings": servings})
+    fatsecret_count = sum(item.source == SOURCE_FATSECRET for item in breakdown)
+    confidence = sum(SOURCE_CONFIDENCE[item.source] for item in breakdown) / max(considered, 1)
+    return NutritionResult(totals / servings, combine_sources(fatsecret_count, len(breakdown) - fatsecret_count),
+                           confidence, breakdown, servings)
+
+def get_batch_recipe_nutrition(recipes, servings=4):
+    """Nutrición por porción de muchas recetas a la vez, en columnas
+
+    `recipes` es una lista de listas de líneas de ingredientes. Cada ingrediente
+    distinto se resuelve una sola vez y los aportes se acumulan con NumPy en una
+    matriz (recetas x 4), sin crear un diccionario por receta. Las recetas sin
+    ningún ingrediente resuelto quedan con origen "default" y macros a cero.
+    """
+    fatsecret = get_fatsecret()
+    servings = max(1, int(servings or 1))
+    recipe_index, names, grams = [], [], []
+    for i, lines in enumerate(recipes):
+        for line in lines:
+            if not line or not line.strip():
+                continue
+            parsed = parse_ingredient_line(line.strip())
+            weight = to_grams(parsed)
+            if not parsed.name or weight == 0:
+                continue
+            recipe_index.append(i)
+            names.append(normalize_ingredient(parsed.name))
+            grams.append(weight)
+
+    # Tabla por ingrediente distinto: macros de referencia, gramos de referencia y origen
+    unique = list(dict.fromkeys(names))
+    table = np.zeros((len(unique), 4))
+    reference_grams = np.zeros(len(unique))
+    from_fatsecret = np.zeros(len(unique))
+    from_estimate = np.zeros(len(unique))
+    for j, name in enumerate(unique):
+        nutrition, source = _resolve_with_fallback(fatsecret, name)
+        if nutrition:
+            table[j] = _nutrition_macros(nutrition)
+            reference_grams[j] = nutrition.get("grams") or 0.0
+            from_fatsecret[j] = source == SOURCE_FATSECRET
+            from_estimate[j] = source == SOURCE_ESTIMATE
+
+    n = len(recipes)
+    position = {name: j for j, name in enumerate(unique)}
+    positions = np.fromiter((position[name] for name in names), dtype=np.intp, count=len(names))
+    recipe_index = np.asarray(recipe_index, dtype=np.intp)
+    grams = np.asarray(grams, dtype=np.float64)
+    ref = reference_grams[positions]
+    scale = np.divide(grams, ref, out=np.ones_like(grams), where=ref > 0)
+
+    totals = np.zeros((n, 4))
+    np.add.at(totals, recipe_index, table[positions] * scale[:, None])
+    totals /= servings
+
+    fatsecret_counts = np.bincount(recipe_index, weights=from_fatsecret[positions], minlength=n)
+    estimate_counts = np.bincount(recipe_index, weights=from_estimate[positions], minlength=n)
+    considered = np.bincount(recipe_index, minlength=n)
+    confidence = (fatsecret_counts * SOURCE_CONFIDENCE[SOURCE_FATSECRET]
+                  + estimate_counts * SOURCE_CONFIDENCE[SOURCE_ESTIMATE]) / np.maximum(considered, 1)
+    has_fatsecret, has_estimate = fatsecret_counts > 0, estimate_counts > 0
+    source_codes = np.select(
+        [has_fatsecret & has_estimate, has_fatsecret, has_estimate],
+        [SOURCES.index(SOURCE_MIXED), SOURCES.index(SOURCE_FATSECRET), SOURCES.index(SOURCE_ESTIMATE)],
+        default=SOURCES.index(SOURCE_DEFAULT)
+    )
+    return NutritionBatch(totals, source_codes, confidence, servings)
+
 def test_fatsecret_api():
     """Función de prueba para verificar que la API de FatSecret funciona"""
     print("🧪 Probando conexión con FatSecret API...")
@@ -278,8 +558,9 @@ def test_fatsecret_api():
     result = get_real_nutrition(test_ingredients)
     
     print("\n📊 Resultado de la prueba:")
-    for key, value in result.items():
+    for key, value in result.formatted().items():
         print(f"  {key}: {value}")
+    print(f"  Origen: {result.source} (confianza {result.confidence:.0%})")
     
     return result
 
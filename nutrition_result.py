@@ -0,0 +1,159 @@
+import re
+import numpy as np
+
+# Orden de los macros en todos los vectores y columnas
+MACRO_KEYS = ("Calorías", "Proteínas", "Carbohidratos", "Grasas")
+MACRO_UNITS = ("kcal", "g", "g", "g")
+
+# Origen de los datos
+SOURCE_FATSECRET = "fatsecret"   # todos los ingredientes resueltos con FatSecret
+SOURCE_MIXED = "mixed"           # parte FatSecret, parte estimación
+SOURCE_ESTIMATE = "estimate"     # solo la tabla simplificada
+SOURCE_DEFAULT = "default"       # valores por defecto (sin datos)
+SOURCES = (SOURCE_FATSECRET, SOURCE_MIXED, SOURCE_ESTIMATE, SOURCE_DEFAULT)
+
+# Peso de cada origen en la confianza del resultado
+SOURCE_CONFIDENCE = {SOURCE_FATSECRET: 1.0, SOURCE_ESTIMATE: 0.5}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+def _number(value):
+    """Número de un valor numérico o de un texto ya formateado ("165.0 kcal")"""
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        return float(match.group()) if match else 0.0
+    return float(value or 0)
+
+def combine_sources(fatsecret, estimated):
+    """Origen global a partir del número de ingredientes resueltos por cada vía"""
+    if fatsecret and estimated:
+        return SOURCE_MIXED
+    if fatsecret:
+        return SOURCE_FATSECRET
+    if estimated:
+        return SOURCE_ESTIMATE
+    return SOURCE_DEFAULT
+
+class IngredientNutrition:
+    """Aporte de un ingrediente: nombre, gramos, origen y macros (mismo orden que MACRO_KEYS)"""
+    __slots__ = ("name", "grams", "source", "macros")
+
+    def __init__(self, name, grams, source, macros):
+        self.name = name
+        self.grams = grams
+        self.source = source
+        self.macros = np.asarray(macros, dtype=np.float64)
+
+    def to_dict(self):
+        data = {"name": self.name, "grams": self.grams, "source": self.source}
+        data.update(zip(MACRO_KEYS, (round(float(v), 2) for v in self.macros)))
+        return data
+
+class NutritionResult:
+    """Nutrición numérica de una receta o lista de ingredientes
+
+    `macros` es un vector de 4 floats (por porción), `breakdown` el aporte de cada
+    ingrediente (del total de la receta), `source` uno de SOURCES y `confidence`
+    la fracción ponderada de ingredientes resueltos (1.0 = todos con FatSecret).
+    El formateo para mostrar se hace solo en la capa de presentación.
+    """
+    __slots__ = ("macros", "breakdown", "source", "confidence", "servings")
+
+    def __init__(self, macros, source=SOURCE_ESTIMATE, confidence=0.0, breakdown=(), servings=1):
+        self.macros = np.asarray(macros, dtype=np.float64)
+        self.source = source
+        self.confidence = confidence
+        self.breakdown = tuple(breakdown)
+        self.servings = servings
+
+    @property
+    def calories(self):
+        return float(self.macros[0])
+
+    @property
+    def protein(self):
+        return float(self.macros[1])
+
+    @property
+    def carbs(self):
+        return float(self.macros[2])
+
+    @property
+    def fat(self):
+        return float(self.macros[3])
+
+    @property
+    def from_fatsecret(self):
+        """True si al menos parte de los datos vienen de FatSecret"""
+        return self.source in (SOURCE_FATSECRET, SOURCE_MIXED)
+
+    def formatted(self, decimals=1, prefix=""):
+        """Macros como texto para mostrar ("165.0 kcal", "31.0g")"""
+        return {
+            key: f"{prefix}{value:.{decimals}f}{' ' if unit == 'kcal' else ''}{unit}"
+            for key, value, unit in zip(MACRO_KEYS, self.macros, MACRO_UNITS)
+        }
+
+    def to_dict(self):
+        """Diccionario serializable a JSON (macros numéricos)"""
+        data = dict(zip(MACRO_KEYS, (round(float(v), 2) for v in self.macros)))
+        data.update(source=self.source, confidence=round(self.confidence, 3), servings=self.servings,
+                    breakdown=[item.to_dict() for item in self.breakdown])
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruye un resultado guardado; acepta también el formato antiguo con textos"""
+        data = data or {}
+        breakdown = [
+            IngredientNutrition(item.get("name", ""), item.get("grams"), item.get("source", SOURCE_ESTIMATE),
+                                [_number(item.get(key)) for key in MACRO_KEYS])
+            for item in data.get("breakdown", [])
+        ]
+        return cls([_number(data.get(key)) for key in MACRO_KEYS], data.get("source", SOURCE_ESTIMATE),
+                   float(data.get("confidence", 0.0)), breakdown, data.get("servings", 1))
+
+    def __repr__(self):
+        values = ", ".join(f"{key}={value:.1f}" for key, value in zip(MACRO_KEYS, self.macros))
+        return f"NutritionResult({values}, source={self.source!r}, confidence={self.confidence:.2f})"
+
+class NutritionBatch:
+    """Nutrición de muchas recetas en columnas: matriz (recetas x 4) y vectores paralelos"""
+    __slots__ = ("macros", "source_codes", "confidence", "servings")
+
+    def __init__(self, macros, source_codes, confidence, servings):
+        self.macros = macros
+        self.source_codes = source_codes
+        self.confidence = confidence
+        self.servings = servings
+
+    def __len__(self):
+        return len(self.macros)
+
+    @property
+    def sources(self):
+        return np.asarray(SOURCES, dtype=object)[self.source_codes]
+
+    def result(self, i):
+        """Resultado individual (sin desglose) de la receta i"""
+        return NutritionResult(self.macros[i], SOURCES[self.source_codes[i]], float(self.confidence[i]),
+                               servings=self.servings)
+
+    def frame(self):
+        """DataFrame con una columna por macro, origen y confianza"""
+        # pandas solo hace falta aquí: importarlo arriba lo cargaría también en el autocompletado
+        import pandas as pd
+
+        frame = pd.DataFrame(self.macros, columns=list(MACRO_KEYS))
+        frame["source"] = pd.Categorical.from_codes(self.source_codes, categories=list(SOURCES))
+        frame["confidence"] = self.confidence
+        return frame
+
+def nutrition_matrix(results):
+    """Apila resultados (o diccionarios guardados) en una matriz (n x 4) sin pasar por textos"""
+    if not results:
+        return np.zeros((0, len(MACRO_KEYS)))
+    return np.stack([
+        r.macros if isinstance(r, NutritionResult) else NutritionResult.from_dict(r).macros
+        for r in results
+    ])
@@ -0,0 +1,171 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+# Secciones que se pueden regenerar: se conserva el texto hasta su encabezado
+# (incluido) como prefijo forzado del decodificador y solo se decodifica el resto
+SECTION_MARKERS = {
+    "ingredients": re.compile(r"ingredients:", re.IGNORECASE),
+    "directions": re.compile(r"directions:", re.IGNORECASE),
+}
+
+class EncoderCache:
+    """Salidas del codificador por prompt `items: ...` (LRU acotada)"""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+encoder_cache = EncoderCache()
+
+class RegenerationStats:
+    """Tokens y tiempo ahorrados por las regeneraciones parciales
+
+    El ahorro de tiempo se estima con el coste medio por token de la propia
+    regeneración aplicado a los tokens del prefijo, más el codificador si se
+    reutilizó su salida.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.regenerations = 0
+        self.prefix_tokens = 0
+        self.new_tokens = 0
+        self.seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def add(self, prefix_tokens, new_tokens, seconds, saved_seconds):
+        with self._lock:
+            self.regenerations += 1
+            self.prefix_tokens += prefix_tokens
+            self.new_tokens += new_tokens
+            self.seconds += seconds
+            self.saved_seconds += saved_seconds
+
+    def stats(self):
+        with self._lock:
+            total = self.prefix_tokens + self.new_tokens
+            return {
+                "regenerations": self.regenerations,
+                "tokens_saved": self.prefix_tokens,
+                "tokens_decoded": self.new_tokens,
+                "token_savings": self.prefix_tokens / total if total else 0.0,
+                "seconds": self.seconds,
+                "saved_seconds": self.saved_seconds,
+                "encoder_hits": encoder_cache.hits,
+                "encoder_misses": encoder_cache.misses,
+            }
+
+regeneration_stats = RegenerationStats()
+
+def encode_prompt(tokenizer, generator, prompt):
+    """Codifica `items: {prompt}` una sola vez
+
+    Devuelve (encoder_outputs, attention_mask, segundos que costó codificar, si venía de caché).
+    """
+    key = (id(generator), prompt)
+    cached = encoder_cache.get(key)
+    if cached is not None:
+        return cached + (True,)
+    import torch
+
+    start = time.perf_counter()
+    inputs = tokenizer(f"items: {prompt}", return_tensors="pt", truncation=True, max_length=256)
+    with torch.no_grad():
+        encoder_outputs = generator.get_encoder()(**inputs, return_dict=True)
+    elapsed = time.perf_counter() - start
+    encoder_cache.put(key, (encoder_outputs, inputs["attention_mask"], elapsed))
+    return encoder_outputs, inputs["attention_mask"], elapsed, False
+
+def forced_prefix(raw_text, section):
+    """Texto que se conserva al regenerar `section` (hasta su encabezado), o None si no aparece"""
+    match = SECTION_MARKERS[section].search(raw_text or "")
+    if not match:
+        return None
+    return raw_text[:match.end()]
+
+def regenerate_section(tokenizer, generator, prompt, raw_text, section, params):
+    """Vuelve a decodificar solo desde el encabezado de `section`
+
+    Devuelve el texto completo (prefijo conservado + continuación nueva), o None
+    si el texto original no contiene la sección.
+    """
+    import torch
+
+    prefix = forced_prefix(raw_text, section)
+    if prefix is None:
+        return None
+    encoder_outputs, attention_mask, encoder_s, reused = encode_prompt(tokenizer, generator, prompt)
+
+    prefix_ids = tokenizer(prefix, add_special_tokens=False).input_ids
+    decoder_input_ids = torch.tensor([[generator.config.decoder_start_token_id] + prefix_ids])
+    start = time.perf_counter()
+    output = generator.generate(
+        encoder_outputs=encoder_outputs,
+        attention_mask=attention_mask,
+        decoder_input_ids=decoder_input_ids,
+        **params
+    )
+    elapsed = time.perf_counter() - start
+    new_tokens = max(1, len(output[0]) - decoder_input_ids.shape[1])
+    # Ahorro: los tokens del prefijo al coste medio por token, más el codificador si se reutilizó
+    saved = len(prefix_ids) * elapsed / new_tokens + (encoder_s if reused else 0.0)
+    regeneration_stats.add(len(prefix_ids), new_tokens, elapsed + (0.0 if reused else encoder_s), saved)
+    return tokenizer.decode(output[0], skip_special_tokens=True)
+
+def benchmark_partial(tokenizer, generator, prompts, params, section="directions"):
+    """Compara regenerar una receta completa con regenerar solo `section`"""
+    full_s, partial_s, full_tokens, partial_tokens = 0.0, 0.0, 0, 0
+    for prompt in prompts:
+        inputs = tokenizer(f"items: {prompt}", return_tensors="pt", truncation=True, max_length=256)
+        original = tokenizer.decode(generator.generate(**inputs, **params)[0], skip_special_tokens=True)
+        encode_prompt(tokenizer, generator, prompt)
+
+        start = time.perf_counter()
+        full = generator.generate(**inputs, **params)
+        full_s += time.perf_counter() - start
+        full_tokens += len(full[0]) - 1
+
+        before = regeneration_stats.stats()
+        start = time.perf_counter()
+        regenerate_section(tokenizer, generator, prompt, original, section, params)
+        partial_s += time.perf_counter() - start
+        partial_tokens += regeneration_stats.stats()["tokens_decoded"] - before["tokens_decoded"]
+
+    print(f"🔁 Completa: {full_tokens} tokens en {full_s:.2f}s")
+    print(f"✂️ Solo {section}: {partial_tokens} tokens en {partial_s:.2f}s "
+          f"({1 - partial_s / max(full_s, 1e-9):.0%} menos tiempo)")
+    return {"full_s": full_s, "partial_s": partial_s, "full_tokens": full_tokens, "partial_tokens": partial_tokens}
+
+if __name__ == "__main__":
+    from load_controller import GENERATION_PROFILES
+    from model_snapshot import MODEL_SPECS, build_loader
+
+    source = MODEL_SPECS["generator"][0]
+    benchmark_partial(
+        build_loader("tokenizer")(source),
+        build_loader("seq2seq")(source),
+        ["chicken, rice, tomato, onion", "pasta, garlic, olive oil, parmesan", "lentil, onion, cumin, tomato"],
+        GENERATION_PROFILES["full"],
+    )
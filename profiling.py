@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Perfilado bajo demanda de las rutas calientes (generación, nutrición y PDF).
+
+Se activa para las próximas N ejecuciones de cada ruta desde el panel de
+administración de la barra lateral (RECIPE_ADMIN=1) o al arrancar:
+
+    RECIPE_PROFILE_NEXT=5 streamlit run app.py
+    python profiling.py            # lista las capturas guardadas
+
+Cada captura es un directorio en RECIPE_PROFILE_DIR con:
+
+    cprofile.prof / cprofile.txt   cProfile del hilo (snakeviz, flameprof)
+    stacks.folded                  pilas muestreadas (flamegraph.pl, speedscope)
+    torch_trace.json               traza del profiler de torch (chrome://tracing, Perfetto)
+    torch_stacks.folded            pilas de torch por tiempo de CPU propio
+
+El directorio se limita a RECIPE_PROFILE_MAX_MB borrando las capturas más
+antiguas. Sin capturas pendientes, capture() devuelve un contexto vacío.
+"""
+
+import os
+import sys
+import time
+import shutil
+import pstats
+import cProfile
+import argparse
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager, nullcontext
+from structured_logging import current_request_id, get_logger
+
+PROFILE_DIR = os.environ.get("RECIPE_PROFILE_DIR", "profiles")
+# Capturas de cada ruta armadas al arrancar (0 = ninguna)
+PROFILE_NEXT = int(os.environ.get("RECIPE_PROFILE_NEXT", "0"))
+PROFILE_MAX_MB = float(os.environ.get("RECIPE_PROFILE_MAX_MB", "200"))
+PROFILE_INTERVAL_MS = float(os.environ.get("RECIPE_PROFILE_INTERVAL_MS", "5"))
+# Panel de administración en la barra lateral
+ADMIN_CONTROLS = os.environ.get("RECIPE_ADMIN", "0") == "1"
+
+PROFILE_LABELS = ("generation", "nutrition", "pdf")
+
+# Pilas distintas como máximo por captura (el resto se agrupa en una sola línea)
+MAX_STACKS = 20000
+# Profundidad máxima de cada pila muestreada
+MAX_DEPTH = 128
+
+log = get_logger("profiling")
+
+_NULL = nullcontext()
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler(threading.Thread):
+    """Muestrea cada `interval` segundos la pila de un hilo y la acumula en formato plegado"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            stack = ";".join(reversed(names))
+            if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                stack = "[otras pilas]"
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class ProfileCapture:
+    """Captura perfiles de las próximas N ejecuciones de cada ruta
+
+    Solo hay una captura activa a la vez: las ejecuciones simultáneas de otras
+    sesiones no se perfilan ni consumen capturas pendientes.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, max_mb=PROFILE_MAX_MB, interval_ms=PROFILE_INTERVAL_MS):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.interval = interval_ms / 1000.0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._pending = {}
+        self.armed = False
+        self.captured = 0
+
+    def arm(self, count, labels=PROFILE_LABELS):
+        """Perfila las próximas `count` ejecuciones de cada ruta indicada"""
+        with self._lock:
+            for label in labels:
+                self._pending[label] = max(0, count)
+            self.armed = any(self._pending.values())
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def _take(self, label):
+        with self._lock:
+            if not self._pending.get(label):
+                return False
+            self._pending[label] -= 1
+            self.armed = any(self._pending.values())
+            return True
+
+    def capture(self, label, torch_trace=False):
+        """Contexto que perfila el bloque si hay capturas pendientes para `label`"""
+        if not self.armed:
+            return _NULL
+        if not self._active.acquire(blocking=False):
+            return _NULL
+        if not self._take(label):
+            self._active.release()
+            return _NULL
+        return self._capture(label, torch_trace)
+
+    @contextmanager
+    def _capture(self, label, torch_trace):
+        now = time.time()
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}-{label}"
+        if current_request_id() != "-":
+            name += f"-{current_request_id()}"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(path, exist_ok=True)
+            with ExitStack() as stack:
+                profiler = cProfile.Profile()
+                sampler = StackSampler(threading.get_ident(), self.interval)
+                trace = self._torch_profiler() if torch_trace else None
+                if trace is not None:
+                    stack.enter_context(trace)
+                sampler.start()
+                stack.callback(sampler.stop)
+                profiler.enable()
+                stack.callback(profiler.disable)
+                start = time.perf_counter()
+                yield path
+            elapsed = time.perf_counter() - start
+            self._write(path, profiler, sampler, trace)
+            self.captured += 1
+            log.info("Perfil capturado: %s", label, extra={"path": path, "ms": round(elapsed * 1000),
+                                                         "samples": sampler.samples})
+        finally:
+            self._active.release()
+            self._enforce_budget()
+
+    @staticmethod
+    def _torch_profiler():
+        try:
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+        except ImportError:
+            return None
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        return profile(activities=activities, with_stack=True)
+
+    @staticmethod
+    def _write(path, profiler, sampler, trace):
+        profiler.dump_stats(os.path.join(path, "cprofile.prof"))
+        with open(os.path.join(path, "cprofile.txt"), "w", encoding="utf-8") as f:
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(40)
+        sampler.write(os.path.join(path, "stacks.folded"))
+        if trace is not None:
+            trace.export_chrome_trace(os.path.join(path, "torch_trace.json"))
+            trace.export_stacks(os.path.join(path, "torch_stacks.folded"), "self_cpu_time_total")
+
+    def _enforce_budget(self):
+        """Borra las capturas más antiguas hasta quedar dentro del límite de tamaño (nunca la última)"""
+        captures = list_captures(self.directory)
+        total = sum(item["bytes"] for item in captures)
+        for item in captures[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(item["path"], ignore_errors=True)
+            total -= item["bytes"]
+            log.info("Captura antigua borrada por tamaño: %s", item["name"])
+
+    def stats(self):
+        captures = list_captures(self.directory)
+        return {
+            "pending": self.pending(),
+            "captured": self.captured,
+            "captures": len(captures),
+            "mb": sum(item["bytes"] for item in captures) / (1024 * 1024),
+            "max_mb": self.max_bytes / (1024 * 1024),
+        }
+
+def list_captures(directory=PROFILE_DIR):
+    """Capturas guardadas, de la más antigua a la más reciente"""
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            captures.append({"name": name, "path": path, "bytes": _directory_size(path),
+                             "files": sorted(os.listdir(path))})
+    return captures
+
+profile_capture = ProfileCapture()
+if PROFILE_NEXT:
+    profile_capture.arm(PROFILE_NEXT)
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista las capturas de perfilado guardadas")
+    parser.add_argument("--dir", default=PROFILE_DIR)
+    args = parser.parse_args()
+    captures = list_captures(args.dir)
+    for item in captures:
+        print(f"🩺 {item['name']:<60} {item['bytes'] / 1024:8.0f} KB  {', '.join(item['files'])}")
+    print(f"{len(captures)} capturas · {sum(item['bytes'] for item in captures) / (1024 * 1024):.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from nutrition_result import NutritionResult, SOURCE_FATSECRET
+from recipe_parser import strip_step_numbers
+from structured_logging import get_logger
+
+# Ruta por defecto de la base de datos del historial
+DEFAULT_DB_PATH = os.environ.get("RECIPE_HISTORY_DB", "recipe_history.db")
+
+# Políticas de retención (0 = sin límite)
+DEFAULT_MAX_ROWS = int(os.environ.get("RECIPE_HISTORY_MAX_ROWS", "50000"))
+DEFAULT_MAX_AGE_DAYS = float(os.environ.get("RECIPE_HISTORY_MAX_AGE_DAYS", "0"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    ingredients_input TEXT NOT NULL DEFAULT '',
+    diet TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    ingredients TEXT NOT NULL DEFAULT '[]',
+    instructions TEXT NOT NULL DEFAULT '[]',
+    raw_text TEXT NOT NULL DEFAULT '',
+    conflicts TEXT NOT NULL DEFAULT '[]',
+    nutrition TEXT NOT NULL DEFAULT '{}',
+    profile TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_created_at ON recipes(created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+    title, ingredients, directions,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+log = get_logger("history")
+
+def build_fts_query(text):
+    """Convierte texto libre en una consulta FTS5 segura (prefijos unidos con AND)"""
+    terms = _SEARCH_TERM.findall(text.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+class RecipeHistory:
+    """Historial persistente de recetas en SQLite con búsqueda de texto completo (FTS5)
+
+    Las escrituras se encolan y un hilo en segundo plano las inserta por lotes,
+    de modo que registrar una receta nunca añade latencia a la generación.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=64, flush_interval=0.5,
+                 max_rows=DEFAULT_MAX_ROWS, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 compact_every=3600):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.compact_every = compact_every
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._last_compaction = time.monotonic()
+        self._closed = False
+        # Contadores del escritor: un lote fallido se pierde, pero queda contado
+        self._counts = {"written": 0, "write_errors": 0, "lost": 0, "compact_errors": 0}
+
+        # Crear el esquema antes de arrancar el escritor
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._writer_loop, name="recipe-history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        """Devuelve una conexión por hilo (SQLite no comparte conexiones entre hilos)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL permite leer mientras el escritor inserta lotes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn):
+        """Añade las columnas nuevas a bases de datos creadas con versiones anteriores"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(recipes)")}
+        if "profile" not in columns:
+            conn.execute("ALTER TABLE recipes ADD COLUMN profile TEXT NOT NULL DEFAULT ''")
+
+    # ==================== ESCRITURA ====================
+
+    def record(self, ingredients_input, diet, recipe, raw_text, conflicts=None, nutrition=None):
+        """Encola una receta generada para guardarla (no bloquea)"""
+        if self._closed:
+            return
+        self._queue.put((
+            time.time(),
+            ingredients_input or "",
+            diet or "",
+            recipe.get("title", "") if recipe else "",
+            list(recipe.get("ingredients", [])) if recipe else [],
+            list(recipe.get("instructions", [])) if recipe else [],
+            raw_text or "",
+            list(conflicts or []),
+            nutrition.to_dict() if isinstance(nutrition, NutritionResult) else dict(nutrition or {}),
+            recipe.get("profile", "") if recipe else "",
+        ))
+
+    def _writer_loop(self):
+        """Hilo escritor: agrupa las recetas encoladas e inserta cada lote en una transacción"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+                self._counts["written"] += len(batch)
+            except Exception as e:
+                # Cualquier error (no solo de SQLite) dejaría el hilo muerto y la cola creciendo
+                self._counts["write_errors"] += 1
+                self._counts["lost"] += len(batch)
+                log.error("Error guardando historial de recetas: %s", e,
+                          extra={"lost": len(batch), "db": self.db_path}, rate_limit=(5, 60))
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                return
+            if self.compact_every and time.monotonic() - self._last_compaction > self.compact_every:
+                try:
+                    self.compact()
+                except Exception as e:
+                    self._counts["compact_errors"] += 1
+                    # No reintentar tras cada lote: esperar al siguiente intervalo
+                    self._last_compaction = time.monotonic()
+                    log.error("Error compactando historial de recetas: %s", e,
+                              extra={"db": self.db_path}, rate_limit=(1, 600))
+
+    def _write_batch(self, batch):
+        """Inserta un lote de recetas y sus entradas en el índice FTS"""
+        conn = self._connect()
+        with conn:
+            for (created_at, ingredients_input, diet, title, ingredients,
+                 instructions, raw_text, conflicts, nutrition, profile) in batch:
+                cursor = conn.execute(
+                    "INSERT INTO recipes (created_at, ingredients_input, diet, title, ingredients, "
+                    "instructions, raw_text, conflicts, nutrition, profile) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (created_at, ingredients_input, diet, title,
+                     json.dumps(ingredients, ensure_ascii=False),
+                     json.dumps(instructions, ensure_ascii=False),
+                     raw_text,
+                     json.dumps(conflicts, ensure_ascii=False),
+                     json.dumps(nutrition, ensure_ascii=False),
+                     profile)
+                )
+                conn.execute(
+                    "INSERT INTO recipes_fts (rowid, title, ingredients, directions) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, title, "\n".join(ingredients), "\n".join(instructions))
+                )
+
+    def stats(self):
+        """Recetas guardadas, lotes fallidos, recetas perdidas, compactaciones fallidas y pendientes"""
+        return dict(self._counts, pending=self._queue.qsize())
+
+    def flush(self):
+        """Espera a que todas las escrituras pendientes se hayan guardado"""
+        self._queue.join()
+
+    def close(self):
+        """Vacía la cola y detiene el hilo escritor"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    # ==================== LECTURA ====================
+
+    def _row_to_dict(self, row):
+        """Convierte una fila de SQLite en un diccionario de receta"""
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "ingredients_input": row["ingredients_input"],
+            "diet": row["diet"],
+            "title": row["title"],
+            "ingredients": json.loads(row["ingredients"]),
+            # Las recetas guardadas antes del analizador nuevo tienen los pasos numerados
+            "instructions": strip_step_numbers(json.loads(row["instructions"])),
+            "raw_text": row["raw_text"],
+            "conflicts": json.loads(row["conflicts"]),
+            "nutrition": json.loads(row["nutrition"]),
+            "profile": row["profile"],
+        }
+
+    def search(self, query="", page=1, page_size=10, diet=None):
+        """Busca recetas por título, ingredientes e instrucciones con paginación
+
+        Devuelve un diccionario con los resultados de la página, el total y el número de páginas.
+        """
+        page = max(1, int(page))
+        page_size = max(1, min(int(page_size), 100))
+        offset = (page - 1) * page_size
+        fts_query = build_fts_query(query or "")
+
+        where = []
+        params = []
+        if fts_query:
+            where.append("recipes.id IN (SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH ?)")
+            params.append(fts_query)
+        if diet:
+            where.append("recipes.diet = ?")
+            params.append(diet)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM recipes {where_sql}", params).fetchone()[0]
+
+        if fts_query:
+            # Ordenar por relevancia (bm25, con más peso al título)
+            sql = (
+                "SELECT recipes.* FROM recipes_fts "
+                "JOIN recipes ON recipes.id = recipes_fts.rowid "
+                "WHERE recipes_fts MATCH ?"
+                + (" AND recipes.diet = ?" if diet else "")
+                + " ORDER BY bm25(recipes_fts, 10.0, 5.0, 1.0), recipes.id DESC LIMIT ? OFFSET ?"
+            )
+        else:
+            sql = f"SELECT * FROM recipes {where_sql} ORDER BY id DESC LIMIT ? OFFSET ?"
+        rows = conn.execute(sql, params + [page_size, offset]).fetchall()
+
+        return {
+            "results": [self._row_to_dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": max(1, (total + page_size - 1) // page_size),
+        }
+
+    def get(self, recipe_id):
+        """Obtiene una receta del historial por su id"""
+        row = self._connect().execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def count(self):
+        """Número de recetas guardadas"""
+        return self._connect().execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def fatsecret_ingredients(self, max_rows=2000):
+        """Ingredientes que FatSecret resolvió en las recetas más recientes (vocabulario del autocompletado)"""
+        rows = self._connect().execute("SELECT nutrition FROM recipes ORDER BY id DESC LIMIT ?", (max_rows,))
+        names = {}
+        for row in rows:
+            try:
+                nutrition = json.loads(row["nutrition"])
+            except (TypeError, ValueError):
+                continue
+            # Las entradas antiguas guardaban textos formateados, sin desglose
+            for item in nutrition.get("breakdown", []) if isinstance(nutrition, dict) else []:
+                if item.get("source") == SOURCE_FATSECRET and item.get("name"):
+                    names.setdefault(item["name"], None)
+        return list(names)
+
+    # ==================== RETENCIÓN ====================
+
+    def compact(self, max_rows=None, max_age_days=None, vacuum=False):
+        """Aplica la política de retención y optimiza el índice FTS
+
+        Elimina recetas más antiguas que `max_age_days` y conserva como mucho las
+        `max_rows` más recientes. Devuelve el número de recetas eliminadas.
+        """
+        max_rows = self.max_rows if max_rows is None else max_rows
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        conn = self._connect()
+        deleted = 0
+        with conn:
+            doomed = set()
+            if max_age_days:
+                cutoff = time.time() - max_age_days * 86400
+                doomed.update(r[0] for r in conn.execute(
+                    "SELECT id FROM recipes WHERE created_at < ?", (cutoff,)))
+            if max_rows:
+                doomed.update(r[0] for r in conn.execute(
+                    "SELECT id FROM recipes ORDER BY id DESC LIMIT -1 OFFSET ?", (max_rows,)))
+            if doomed:
+                ids = [(recipe_id,) for recipe_id in doomed]
+                conn.executemany("DELETE FROM recipes WHERE id = ?", ids)
+                conn.executemany("DELETE FROM recipes_fts WHERE rowid = ?", ids)
+                deleted = len(ids)
+            conn.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('optimize')")
+        if vacuum:
+            conn.execute("VACUUM")
+        self._last_compaction = time.monotonic()
+        return deleted
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """Historial compartido por todo el proceso: un solo hilo escritor y un solo gancho atexit"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = RecipeHistory()
+        return _history
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Analizador de la salida del modelo en una sola pasada.
+
+Un tokenizador recorre una vez el texto localizando los encabezados ("title:",
+"ingredients:", "directions:"), se recorre la lista de secciones resultante y
+cada lista se separa por "--", construyendo un Recipe con errores de validación y avisos de
+calidad. Los pasos se guardan sin numerar: la numeración es cosa de la vista.
+
+    python recipe_parser.py --recipes 200000     # compara con el analizador anterior
+"""
+
+import gc
+import re
+import time
+import argparse
+from collections import Counter
+
+TITLE, INGREDIENTS, DIRECTIONS = "title", "ingredients", "directions"
+SECTION_ORDER = {TITLE: 0, INGREDIENTS: 1, DIRECTIONS: 2}
+
+# Errores: la receta no se puede mostrar completa
+ERROR_MISSING_TITLE = "missing_title"
+ERROR_MISSING_INGREDIENTS = "missing_ingredients"
+ERROR_MISSING_DIRECTIONS = "missing_directions"
+
+# Avisos de calidad: la receta se puede usar, pero la salida del modelo era irregular
+FLAG_PREAMBLE = "preamble"                  # texto antes del primer encabezado
+FLAG_REPEATED_HEADER = "repeated_header"    # el mismo encabezado dos veces seguidas
+FLAG_OUT_OF_ORDER = "out_of_order"          # una sección aparece después de la siguiente
+FLAG_HEADER_IN_TEXT = "header_in_text"      # encabezado de una sección ya cerrada dentro del texto
+FLAG_NUMBERED_STEPS = "numbered_steps"      # el modelo numeró los pasos (se quita la numeración)
+FLAG_DUPLICATE_INGREDIENT = "duplicate_ingredient"
+FLAG_TRUNCATED = "truncated"                # el último paso no termina en puntuación
+
+SECTION_HEADERS = tuple(SECTION_ORDER)
+# "1. ", "2) ", "Step 3: "; no "1.5 cups" (decimal) ni "2 minutes:" (el número va seguido de texto)
+_STEP_NUMBER_RE = re.compile(r"^(?:step\s*)?(\d+)\s*(?:[.)](?!\d)|:)(?:\s+|$)", re.IGNORECASE)
+_ITEM_STRIP = " -\t\r\n"
+_SENTENCE_END = (".", "!", ")", "?")
+_NUMBER_START = set("0123456789Ss")
+
+def strip_step_number(step):
+    """Quita la numeración inicial de un paso ("1. Heat the oil" -> "Heat the oil")"""
+    return _STEP_NUMBER_RE.sub("", step, count=1)
+
+def strip_step_numbers(steps):
+    """Quita la numeración de los pasos si el modelo los numeró; si no, devuelve la misma lista
+
+    Solo cuenta como numeración si el primer paso va numerado o los números siguen la
+    secuencia 1..n: un paso suelto que empieza por "2 minutes." no es el paso 2.
+    """
+    matches = [_STEP_NUMBER_RE.match(step) if step[:1] in _NUMBER_START else None for step in steps]
+    if not any(matches):
+        return steps
+    if not matches[0] and any(m and int(m.group(1)) != index + 1 for index, m in enumerate(matches)):
+        return steps
+    unnumbered = [step[m.end():].strip(_ITEM_STRIP) if m else step for step, m in zip(steps, matches)]
+    return [step for step in unnumbered if step]
+
+class Recipe:
+    """Receta analizada: título, ingredientes, pasos (sin numerar), errores y avisos"""
+    __slots__ = ("title", "ingredients", "instructions", "notes", "errors", "flags")
+
+    def __init__(self, title="", ingredients=(), instructions=(), notes="", errors=(), flags=()):
+        # Tuplas inmutables: baratas de crear y de recorrer por el recolector en lotes grandes
+        self.title = title
+        self.ingredients = tuple(ingredients)
+        self.instructions = tuple(instructions)
+        self.notes = notes
+        self.errors = tuple(errors)
+        self.flags = tuple(flags)
+
+    @property
+    def valid(self):
+        return not self.errors
+
+    def to_dict(self):
+        """Diccionario con las claves que usa la aplicación (title, ingredients, instructions, notes)"""
+        return {
+            "title": self.title,
+            "ingredients": list(self.ingredients),
+            "instructions": list(self.instructions),
+            "notes": self.notes,
+            "errors": list(self.errors),
+            "flags": list(self.flags),
+        }
+
+    def __repr__(self):
+        return (f"Recipe(title={self.title!r}, ingredients={len(self.ingredients)}, "
+                f"instructions={len(self.instructions)}, errors={self.errors}, flags={self.flags})")
+
+def tokenize(text):
+    """Encabezados de sección del texto: lista de (inicio, fin, sección)
+
+    Recorre solo los ":" del texto (pocos) y comprueba si la palabra anterior
+    es un encabezado completo, sin distinguir mayúsculas.
+    """
+    low = text.lower()
+    marks = []
+    pos = low.find(":")
+    while pos != -1:
+        end = pos
+        while end and low[end - 1] in " \t":
+            end -= 1
+        for name in SECTION_HEADERS:
+            if low.endswith(name, 0, end):
+                start = end - len(name)
+                if start == 0 or not low[start - 1].isalnum():
+                    marks.append((start, pos + 1, name))
+                break
+        pos = low.find(":", pos + 1)
+    return marks
+
+def _split_items(bodies):
+    items = [item.strip(_ITEM_STRIP) for body in bodies for item in body.split("--")]
+    return [item for item in items if item]
+
+def parse_recipe(text):
+    """Analiza la salida del modelo en una sola pasada y devuelve un Recipe"""
+    text = text or ""
+    marks = tokenize(text)
+    bodies = {TITLE: [], INGREDIENTS: [], DIRECTIONS: []}
+    flags = []
+    if text[:marks[0][0] if marks else len(text)].strip(_ITEM_STRIP):
+        flags.append(FLAG_PREAMBLE)
+    section = None
+    for index, (start, end, header) in enumerate(marks):
+        segment = text[end:marks[index + 1][0] if index + 1 < len(marks) else len(text)]
+        if section is not None and header != section and SECTION_ORDER[header] < SECTION_ORDER[section]:
+            if bodies[header]:
+                # "mix all ingredients: ..." dentro de los pasos: es texto, no un encabezado
+                if FLAG_HEADER_IN_TEXT not in flags:
+                    flags.append(FLAG_HEADER_IN_TEXT)
+                bodies[section][-1] += text[start:end] + segment
+                continue
+            if FLAG_OUT_OF_ORDER not in flags:
+                flags.append(FLAG_OUT_OF_ORDER)
+        elif header == section and FLAG_REPEATED_HEADER not in flags:
+            flags.append(FLAG_REPEATED_HEADER)
+        bodies[header].append(segment)
+        section = header
+
+    title = " ".join(" ".join(body.split()) for body in bodies[TITLE]).strip(_ITEM_STRIP)
+    ingredients = _split_items(bodies[INGREDIENTS])
+    steps = _split_items(bodies[DIRECTIONS])
+    unnumbered = strip_step_numbers(steps)
+    if unnumbered is not steps:
+        flags.append(FLAG_NUMBERED_STEPS)
+        steps = unnumbered
+
+    if len({name.lower() for name in ingredients}) < len(ingredients):
+        flags.append(FLAG_DUPLICATE_INGREDIENT)
+    if steps and not steps[-1].endswith(_SENTENCE_END):
+        flags.append(FLAG_TRUNCATED)
+    errors = []
+    if not title:
+        errors.append(ERROR_MISSING_TITLE)
+    if not ingredients:
+        errors.append(ERROR_MISSING_INGREDIENTS)
+    if not steps:
+        errors.append(ERROR_MISSING_DIRECTIONS)
+    return Recipe(title, ingredients, steps, "", errors or (), flags or ())
+
+# ==================== LOTES ====================
+
+def iter_parse(texts):
+    """Analiza un iterable de salidas sin cargarlas todas en memoria"""
+    for text in texts:
+        yield parse_recipe(text)
+
+def parse_batch(texts):
+    """Analiza muchas salidas en el proceso actual
+
+    Durante el lote se pausa el recolector de ciclos: las recetas no forman
+    ciclos y, con cientos de miles de objetos vivos, sus recorridos periódicos
+    son la mayor parte del coste extra frente a analizar receta a receta. No hay
+    modo multiproceso: serializar los Recipe de vuelta costaba más que el análisis.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return [parse_recipe(text) for text in texts]
+    finally:
+        if enabled:
+            gc.enable()
+
+def batch_report(recipes):
+    """Recetas válidas y recuento de cada error y aviso"""
+    counts = Counter()
+    valid = 0
+    total = 0
+    for recipe in recipes:
+        total += 1
+        valid += recipe.valid
+        counts.update(recipe.errors)
+        counts.update(recipe.flags)
+    return {"recipes": total, "valid": valid, "issues": dict(counts)}
+
+# ==================== BENCHMARK ====================
+
+def legacy_parse_generated_recipe(text):
+    """Analizador anterior (tres búsquedas y split por "--"), solo para comparar"""
+    sections = {"title": "", "ingredients": [], "instructions": [], "notes": ""}
+    title_match = re.search(r"title:(.+)", text, re.IGNORECASE)
+    if title_match:
+        sections["title"] = title_match.group(1).strip()
+    ingredients_match = re.search(r"ingredients:(.+?)(?:directions:|$)", text, re.IGNORECASE | re.DOTALL)
+    if ingredients_match:
+        sections["ingredients"] = [i.strip("- ") for i in ingredients_match.group(1).split("--") if i.strip()]
+    instructions_match = re.search(r"directions:(.+)", text, re.IGNORECASE | re.DOTALL)
+    if instructions_match:
+        steps = [s.strip("- ") for s in instructions_match.group(1).split("--") if s.strip()]
+        sections["instructions"] = [f"{i+1}. {step}" for i, step in enumerate(steps)]
+    return sections
+
+BENCHMARK_OUTPUTS = [
+    "title: chicken and rice casserole ingredients: 1 lb chicken breast -- 2 c. cooked rice -- "
+    "1 can diced tomatoes -- 1 onion, chopped -- salt to taste directions: Heat the oven to 350. -- "
+    "Mix the rice and tomatoes in a baking dish. -- Top with the chicken and onion. -- Bake for 45 minutes.",
+    "title: garlic pasta\ningredients: 8 oz. pasta -- 3 cloves garlic -- 2 tbsp olive oil\n"
+    "directions: Cook the pasta. -- Fry the garlic in the oil. -- Toss together and serve.",
+    # Sin ingredientes
+    "title: quick salad directions: Chop everything. -- Toss with the dressing.",
+    # Encabezado repetido y pasos numerados
+    "title: lentil soup ingredients: 1 c. lentils -- 1 onion directions: 1. Saute the onion. -- "
+    "directions: 2. Add the lentils and water. -- 3. Simmer for 30 minutes",
+    # "ingredients:" dentro de los pasos
+    "title: pancakes ingredients: 1 c. flour -- 1 egg -- 1 c. milk directions: Whisk all the "
+    "ingredients: flour, egg and milk. -- Cook on a hot griddle.",
+]
+
+def _best_rate(fn, texts, repeats):
+    """Recetas por segundo de la mejor de `repeats` pasadas (las demás pagan ruido de la máquina)"""
+    best, result = None, None
+    for _ in range(repeats):
+        result = None
+        start = time.perf_counter()
+        result = fn(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(texts) / best, result
+
+def benchmark_parsers(n_recipes=200000, repeats=5):
+    """Recetas por segundo del analizador anterior, del nuevo receta a receta y del nuevo por lotes"""
+    texts = (BENCHMARK_OUTPUTS * (n_recipes // len(BENCHMARK_OUTPUTS) + 1))[:n_recipes]
+    results = {}
+    results["legacy"], legacy = _best_rate(
+        lambda batch: [legacy_parse_generated_recipe(text) for text in batch], texts, repeats)
+    results["single_pass"], _ = _best_rate(lambda batch: [parse_recipe(text) for text in batch], texts, repeats)
+    results["parse_batch"], recipes = _best_rate(parse_batch, texts, repeats)
+
+    for label, per_s in results.items():
+        print(f"🧾 {label:<18} {per_s:>12,.0f} recetas/s")
+    empty = sum(1 for recipe in legacy if not (recipe["title"] and recipe["ingredients"] and recipe["instructions"]))
+    # En salidas de una sola línea el título anterior se tragaba el resto de secciones
+    long_titles = sum(1 for recipe in legacy if "ingredients:" in recipe["title"].lower())
+    report = batch_report(recipes)
+    print(f"   anterior: {empty} recetas con alguna sección vacía, sin aviso · "
+          f"{long_titles} títulos con el resto de la receta dentro")
+    print(f"   nuevo: {report['valid']} válidas de {report['recipes']} · {report['issues']}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del analizador de recetas")
+    parser.add_argument("--recipes", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=5, help="pasadas por analizador (se toma la mejor)")
+    args = parser.parse_args()
+    benchmark_parsers(args.recipes, args.repeats)
+
+if __name__ == "__main__":
+    main()
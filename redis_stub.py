@@ -0,0 +1,68 @@
+"""
+Servidor compatible con Redis (RESP) en memoria, para probar la caché compartida
+sin un Redis real: lo usan `python shared_cache.py` y las pruebas del backend redis.
+"""
+
+import time
+import threading
+import socketserver
+
+class StubRedisHandler(socketserver.StreamRequestHandler):
+    """Subconjunto del protocolo Redis (PING, GET, SET con EX/PX, DEL, SELECT, FLUSHDB, DBSIZE)"""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        data, lock = self.server.data, self.server.lock
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with lock:
+                self.server.commands += 1
+                if command == b"PING":
+                    reply = b"+PONG\r\n"
+                elif command in (b"SELECT", b"AUTH"):
+                    reply = b"+OK\r\n"
+                elif command == b"GET":
+                    entry = data.get(args[1])
+                    if entry and entry[0] is not None and entry[0] < time.time():
+                        del data[args[1]]
+                        entry = None
+                    reply = b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[1]), entry[1])
+                elif command == b"SET":
+                    expires = None
+                    options = [arg.upper() for arg in args[3:]]
+                    if b"EX" in options:
+                        expires = time.time() + int(args[3 + options.index(b"EX") + 1])
+                    elif b"PX" in options:
+                        expires = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000.0
+                    data[args[1]] = (expires, args[2])
+                    reply = b"+OK\r\n"
+                elif command == b"DEL":
+                    reply = b":%d\r\n" % sum(data.pop(key, None) is not None for key in args[1:])
+                elif command == b"FLUSHDB":
+                    data.clear()
+                    reply = b"+OK\r\n"
+                elif command == b"DBSIZE":
+                    reply = b":%d\r\n" % len(data)
+                else:
+                    reply = b"-ERR unknown command '%s'\r\n" % command
+            self.wfile.write(reply)
+
+def start_stub_redis():
+    """Arranca un servidor compatible con Redis en un puerto libre (para la caché compartida)"""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StubRedisHandler)
+    server.daemon_threads = True
+    server.data, server.lock, server.commands = {}, threading.Lock(), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Caché compartida entre réplicas para recetas, nutrición y PDFs.
+
+El backend se elige con RECIPE_CACHE_URL:
+
+    memory://                     solo este proceso (por defecto)
+    sqlite:///recipe_cache.db     fichero local (réplicas en la misma máquina)
+    redis://[:clave@]host:6379/0  servidor con protocolo Redis (RESP)
+
+    python shared_cache.py                         # contra un servidor RESP local simulado
+    python shared_cache.py --url redis://cache:6379/0
+
+Cada entrada guarda qué réplica la escribió, así que las estadísticas
+distinguen los aciertos de la propia réplica de los que le ahorró otra.
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote
+from structured_logging import get_logger
+
+CACHE_URL = os.environ.get("RECIPE_CACHE_URL", "memory://")
+# Identificador de esta réplica (por defecto máquina y proceso)
+REPLICA_ID = os.environ.get("RECIPE_REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+CACHE_PREFIX = os.environ.get("RECIPE_CACHE_PREFIX", "recipe-cache")
+
+# Versión del formato de cada tipo de dato: subirla invalida las entradas antiguas
+NAMESPACE_VERSIONS = {"recipe": 2, "nutrition": 1, "pdf": 1}
+# Caducidad por tipo de dato en segundos (None = sin caducidad)
+NAMESPACE_TTLS = {"recipe": 6 * 3600, "nutrition": 7 * 24 * 3600, "pdf": 24 * 3600}
+
+log = get_logger("cache")
+
+# ==================== SERIALIZACIÓN ====================
+
+def cache_key(namespace, key):
+    """Clave versionada: prefijo:tipo:vN:hash de la clave lógica (cualquier valor JSON)"""
+    raw = json.dumps(key, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    return f"{CACHE_PREFIX}:{namespace}:v{NAMESPACE_VERSIONS.get(namespace, 1)}:{digest}"
+
+def encode_entry(value, writer):
+    """Cabecera JSON (réplica, tipo, fecha) + salto de línea + bytes o JSON"""
+    if isinstance(value, (bytes, bytearray)):
+        kind, payload = "bytes", bytes(value)
+    else:
+        kind, payload = "json", json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header = json.dumps({"writer": writer, "kind": kind, "at": round(time.time(), 3)})
+    return header.encode("utf-8") + b"\n" + payload
+
+def decode_entry(data):
+    """Devuelve (valor, cabecera)"""
+    header, _, payload = data.partition(b"\n")
+    meta = json.loads(header)
+    value = payload if meta["kind"] == "bytes" else json.loads(payload)
+    return value, meta
+
+# ==================== BACKENDS ====================
+
+class MemoryBackend:
+    """Diccionario LRU del proceso (el comportamiento de siempre, sin compartir)"""
+    name = "memory"
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl if ttl else None, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class SQLiteBackend:
+    """Fichero SQLite compartido por los procesos de la misma máquina (modo WAL)"""
+    name = "sqlite"
+
+    def __init__(self, path, purge_every=500):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return bytes(row[0])
+
+    def set(self, key, data, ttl=None):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+                         (key, data, time.time() + ttl if ttl else None))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM cache_entries WHERE expires < ?", (time.time(),))
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+class RedisError(Exception):
+    """Respuesta de error del servidor RESP"""
+
+class RedisBackend:
+    """Cliente mínimo del protocolo Redis (RESP2): GET, SET con EX y DEL
+
+    Una conexión por hilo; si se cae se reconecta una vez antes de fallar.
+    """
+    name = "redis"
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = self._local.reader = None
+
+    @staticmethod
+    def _encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        reader = self._local.reader
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("conexión cerrada por el servidor")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"respuesta RESP no válida: {line!r}")
+
+    def _roundtrip(self, *args):
+        self._local.sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def execute(self, *args):
+        for attempt in (0, 1):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._roundtrip(*args)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self.execute("GET", key)
+
+    def set(self, key, data, ttl=None):
+        if ttl:
+            self.execute("SET", key, data, "EX", int(ttl))
+        else:
+            self.execute("SET", key, data)
+
+    def delete(self, key):
+        self.execute("DEL", key)
+
+def open_backend(url=CACHE_URL):
+    """Backend a partir de una URL memory://, sqlite:///ruta o redis://host:puerto/db"""
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme in ("", "memory"):
+        return MemoryBackend()
+    if parsed.scheme in ("sqlite", "file"):
+        # Como en SQLAlchemy: sqlite:///relativa.db y sqlite:////ruta/absoluta.db
+        path = unquote(parsed.netloc + parsed.path[1:])
+        return SQLiteBackend(path or "recipe_cache.db")
+    if parsed.scheme == "redis":
+        db = int(parsed.path.strip("/") or 0)
+        return RedisBackend(parsed.hostname or "127.0.0.1", parsed.port or 6379, db,
+                            unquote(parsed.password) if parsed.password else None)
+    raise ValueError(f"Backend de caché no soportado: {url}")
+
+# ==================== CACHÉ ====================
+
+class SharedCache:
+    """Caché con claves versionadas sobre un backend intercambiable
+
+    Los fallos del backend no interrumpen la petición: se registran y cuentan
+    como fallo de caché. Las estadísticas separan por tipo de dato los aciertos
+    locales (la entrada la escribió esta réplica) de los remotos (otra réplica).
+    """
+
+    def __init__(self, backend, replica_id=REPLICA_ID):
+        self.backend = backend
+        self.replica_id = replica_id
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, namespace, field, amount=1):
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {
+                "hits": 0, "local_hits": 0, "remote_hits": 0, "misses": 0, "sets": 0, "errors": 0,
+                "bytes_read": 0, "bytes_written": 0,
+            })
+            stats[field] += amount
+
+    def get(self, namespace, key):
+        """Valor guardado (JSON o bytes) o None"""
+        try:
+            data = self.backend.get(cache_key(namespace, key))
+            if data is None:
+                self._count(namespace, "misses")
+                return None
+            value, meta = decode_entry(data)
+        except Exception as e:
+            self._count(namespace, "errors")
+            self._count(namespace, "misses")
+            log.warning("Error leyendo de la caché %s: %s", self.backend.name, e)
+            return None
+        self._count(namespace, "hits")
+        self._count(namespace, "local_hits" if meta.get("writer") == self.replica_id else "remote_hits")
+        self._count(namespace, "bytes_read", len(data))
+        return value
+
+    def set(self, namespace, key, value, ttl=None):
+        """Guarda un valor serializable a JSON o bytes; devuelve False si el backend falla"""
+        ttl = NAMESPACE_TTLS.get(namespace) if ttl is None else ttl
+        try:
+            data = encode_entry(value, self.replica_id)
+            self.backend.set(cache_key(namespace, key), data, ttl)
+        except Exception as e:
+            self._count(namespace, "errors")
+            log.warning("Error escribiendo en la caché %s: %s", self.backend.name, e)
+            return False
+        self._count(namespace, "sets")
+        self._count(namespace, "bytes_written", len(data))
+        return True
+
+    def get_or_set(self, namespace, key, compute, ttl=None):
+        """Valor de la caché o, si no está, el resultado de compute() (que se guarda si no es None)"""
+        value = self.get(namespace, key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+        return value
+
+    def delete(self, namespace, key):
+        try:
+            self.backend.delete(cache_key(namespace, key))
+        except Exception as e:
+            self._count(namespace, "errors")
+            log.warning("Error borrando de la caché %s: %s", self.backend.name, e)
+
+    def stats(self):
+        """Aciertos por tipo de dato, con la parte que vino de otras réplicas"""
+        with self._lock:
+            namespaces = {name: dict(values) for name, values in self._stats.items()}
+        for values in namespaces.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_rate"] = values["hits"] / lookups if lookups else 0.0
+            values["cross_replica_rate"] = values["remote_hits"] / lookups if lookups else 0.0
+        return {"backend": self.backend.name, "replica": self.replica_id, "namespaces": namespaces}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Caché compartida por todo el proceso (backend según RECIPE_CACHE_URL)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache(open_backend(CACHE_URL))
+        return _cache
+
+# ==================== BENCHMARK ====================
+
+def simulate_replicas(url, replicas=3, keys=200, rounds=3):
+    """Varias réplicas sobre el mismo backend resolviendo las mismas claves
+
+    Cada réplica recorre las claves en un orden distinto y solo "calcula" las
+    que no encuentra; devuelve las estadísticas de cada una y el tiempo medio
+    de lectura y escritura del backend.
+    """
+    caches = [SharedCache(open_backend(url), replica_id=f"replica-{i}") for i in range(replicas)]
+    recipe = {"title": "Chicken Rice Bowl", "ingredients": ["1 lb chicken breast", "2 c. cooked rice"] * 4,
+              "instructions": ["Cook the rice.", "Brown the chicken.", "Serve."] * 3, "profile": "full"}
+    computed = [0] * replicas
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i, cache in enumerate(caches):
+            offset = i * keys // replicas
+            for k in range(keys):
+                key = ["benchmark", (k + offset) % keys]
+
+                def compute(i=i):
+                    computed[i] += 1
+                    return recipe
+                cache.get_or_set("recipe", key, compute)
+    elapsed = time.perf_counter() - start
+    operations = sum(cache.stats()["namespaces"]["recipe"]["hits"] + cache.stats()["namespaces"]["recipe"]["misses"]
+                     + cache.stats()["namespaces"]["recipe"]["sets"] for cache in caches)
+    for i, cache in enumerate(caches):
+        stats = cache.stats()["namespaces"]["recipe"]
+        print(f"🗄️ {cache.replica_id}: aciertos {stats['hit_rate']:.0%} "
+              f"(de otras réplicas {stats['cross_replica_rate']:.0%}) · calculadas {computed[i]}")
+    print(f"   {caches[0].backend.name}: {elapsed / operations * 1e6:.0f} µs/operación · "
+          f"{sum(computed)} cálculos para {keys} claves y {replicas} réplicas")
+    return [cache.stats() for cache in caches]
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula varias réplicas compartiendo la caché")
+    parser.add_argument("--url", help="backend a probar (por defecto memoria, SQLite temporal y un servidor RESP simulado)")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--keys", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.url:
+        simulate_replicas(args.url, args.replicas, args.keys)
+        return
+    import tempfile
+    from redis_stub import start_stub_redis
+
+    server = start_stub_redis()
+    with tempfile.TemporaryDirectory() as tmp:
+        for url in ("memory://", f"sqlite:///{tmp}/cache.db", f"redis://127.0.0.1:{server.server_address[1]}/0"):
+            simulate_replicas(url, args.replicas, args.keys)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import copy
+import time
+import threading
+
+class _Call:
+    """Cálculo en curso compartido por todas las peticiones con la misma clave"""
+    __slots__ = ("event", "result", "error", "waiters", "duration")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.duration = 0.0
+
+class SingleFlight:
+    """Agrupa peticiones concurrentes idénticas en un único cálculo
+
+    La primera petición con una clave ejecuta la función; las que llegan mientras
+    está en curso esperan y reciben una copia de su resultado (o su excepción).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "executions": 0, "shared": 0, "errors": 0, "saved_seconds": 0.0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) una sola vez por clave entre las peticiones concurrentes"""
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self._stats["shared"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            # Cada sesión recibe su propia copia para poder modificarla sin afectar a las demás
+            return copy.deepcopy(call.result)
+
+        start = time.perf_counter()
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.duration = time.perf_counter() - start
+            with self._lock:
+                del self._calls[key]
+                if call.error is not None:
+                    self._stats["errors"] += 1
+                # Trabajo ahorrado: una ejecución completa por cada petición que esperó
+                self._stats["saved_seconds"] += call.duration * call.waiters
+                # Ya no pueden llegar más esperas: copiar antes de que las demás lean el resultado
+                result = copy.deepcopy(call.result) if call.waiters else call.result
+            call.event.set()
+        return result
+
+    def in_flight(self):
+        """Número de cálculos en curso"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """Estadísticas de agrupación: peticiones, ejecuciones reales, compartidas y tiempo ahorrado"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["coalesce_rate"] = stats["shared"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def get_flight(name):
+    """Agrupador compartido por todo el proceso para `name` (todas las sesiones y la prueba de carga)"""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+def normalize_ingredients_key(ingredients):
+    """Clave canónica de una lista de ingredientes: minúsculas, sin duplicados y ordenada"""
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(",")
+    return tuple(sorted({" ".join(item.lower().split()) for item in ingredients if item and item.strip()}))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Decodificación asistida (especulativa): un modelo borrador pequeño propone
+varios tokens y el modelo principal los verifica en una sola pasada.
+
+    RECIPE_DRAFT_MODEL=t5-small streamlit run app.py
+    python speculative_decoding.py --draft t5-small --samples 8
+
+El borrador debe compartir vocabulario con el modelo principal (familia T5).
+Con decodificación greedy la salida es idéntica a la del camino normal; con
+muestreo se conserva la distribución del modelo principal.
+"""
+
+import os
+import time
+import argparse
+import threading
+
+# Modelo borrador (vacío = decodificación normal)
+DRAFT_MODEL = os.environ.get("RECIPE_DRAFT_MODEL", "")
+# Tokens que propone el borrador en cada ronda (transformers lo ajusta sobre la marcha)
+DRAFT_TOKENS = int(os.environ.get("RECIPE_DRAFT_TOKENS", "5"))
+
+_local = threading.local()
+
+def _count_step(module, args, output):
+    """Hook de forward: cuenta pasos de decodificación del hilo actual"""
+    counts = getattr(_local, "counts", None)
+    if counts is not None:
+        counts[module._recipe_role] += 1
+
+def _instrument(model, role):
+    """Instala (una sola vez) el contador de pasos en un modelo"""
+    if getattr(model, "_recipe_role", None) is None:
+        model._recipe_role = role
+        model.register_forward_hook(_count_step)
+
+class SpeculativeStats:
+    """Métricas acumuladas de la decodificación asistida
+
+    Cada ronda de verificación del modelo principal acepta k tokens propuestos y
+    añade uno propio, así que aceptados = tokens - pasos del principal y la tasa
+    de aceptación = aceptados / tokens propuestos por el borrador.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.tokens = 0
+        self.main_steps = 0
+        self.draft_steps = 0
+        self.seconds = 0.0
+
+    def add(self, tokens, main_steps, draft_steps, seconds):
+        with self._lock:
+            self.generations += 1
+            self.tokens += tokens
+            self.main_steps += main_steps
+            self.draft_steps += draft_steps
+            self.seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            accepted = max(0, self.tokens - self.main_steps)
+            return {
+                "generations": self.generations,
+                "tokens": self.tokens,
+                "acceptance_rate": accepted / self.draft_steps if self.draft_steps else 0.0,
+                "tokens_per_main_step": self.tokens / self.main_steps if self.main_steps else 0.0,
+                "tokens_per_s": self.tokens / self.seconds if self.seconds else 0.0,
+            }
+
+speculative_stats = SpeculativeStats()
+
+def assisted_generate(generator, draft, inputs, params, stats=speculative_stats):
+    """generator.generate con el borrador como asistente, registrando la aceptación"""
+    _instrument(generator, "main")
+    _instrument(draft, "draft")
+    draft.generation_config.num_assistant_tokens = DRAFT_TOKENS
+    _local.counts = {"main": 0, "draft": 0}
+    start = time.perf_counter()
+    try:
+        output = generator.generate(**inputs, **params, assistant_model=draft)
+    finally:
+        counts, _local.counts = _local.counts, None
+    # El primer token de la salida es el de inicio del decodificador
+    stats.add(len(output[0]) - 1, counts["main"], counts["draft"], time.perf_counter() - start)
+    return output
+
+# ==================== BENCHMARK ====================
+
+BENCHMARK_INGREDIENTS = [
+    "chicken, rice, tomato, onion",
+    "pasta, garlic, olive oil, parmesan",
+    "beef, potato, carrot",
+    "tofu, broccoli, soy sauce, ginger",
+    "egg, spinach, cheese",
+    "salmon, lemon, asparagus",
+    "black bean, corn, corn tortilla, avocado",
+    "lentil, onion, cumin, tomato",
+]
+
+def _structure(recipe):
+    """Resumen de la estructura de una receta parseada"""
+    return {
+        "title": bool(recipe["title"]),
+        "ingredients": len(recipe["ingredients"]),
+        "instructions": len(recipe["instructions"]),
+    }
+
+def benchmark_speculative(tokenizer, generator, draft, parse, samples=8, params=None):
+    """Compara tokens/s del camino normal y del asistido con los mismos parámetros
+
+    Usa decodificación greedy por defecto, con la que ambas salidas deben
+    coincidir; además comprueba que la receta parseada conserva sus secciones.
+    """
+    params = params or {"max_length": 512, "min_length": 64, "no_repeat_ngram_size": 3, "do_sample": False}
+    stats = SpeculativeStats()
+    baseline_tokens, baseline_s = 0, 0.0
+    identical, structure_ok = 0, 0
+    for ingredients in (BENCHMARK_INGREDIENTS * samples)[:samples]:
+        inputs = tokenizer(f"items: {ingredients}", return_tensors="pt", truncation=True, max_length=256)
+        start = time.perf_counter()
+        baseline = generator.generate(**inputs, **params)
+        baseline_s += time.perf_counter() - start
+        baseline_tokens += len(baseline[0]) - 1
+
+        assisted = assisted_generate(generator, draft, inputs, params, stats)
+        base_text = tokenizer.decode(baseline[0], skip_special_tokens=True)
+        fast_text = tokenizer.decode(assisted[0], skip_special_tokens=True)
+        identical += base_text == fast_text
+        base_recipe, fast_recipe = parse(base_text), parse(fast_text)
+        structure = _structure(fast_recipe)
+        if structure == _structure(base_recipe) and structure["title"] and structure["ingredients"] and structure["instructions"]:
+            structure_ok += 1
+
+    result = stats.stats()
+    result["baseline_tokens_per_s"] = baseline_tokens / baseline_s if baseline_s else 0.0
+    result["speedup"] = result["tokens_per_s"] / result["baseline_tokens_per_s"] if result["baseline_tokens_per_s"] else 0.0
+    result["identical_outputs"] = identical
+    result["structure_preserved"] = structure_ok
+    result["samples"] = samples
+    print(f"🐢 Normal:   {result['baseline_tokens_per_s']:.1f} tokens/s")
+    print(f"🐇 Asistida: {result['tokens_per_s']:.1f} tokens/s (x{result['speedup']:.2f}) · "
+          f"aceptación {result['acceptance_rate']:.0%} · {result['tokens_per_main_step']:.2f} tokens/paso")
+    print(f"🧾 Salidas idénticas: {identical}/{samples} · estructura conservada: {structure_ok}/{samples}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación asistida")
+    parser.add_argument("--draft", default=DRAFT_MODEL or "t5-small", help="modelo borrador (vocabulario T5)")
+    parser.add_argument("--samples", type=int, default=8, help="recetas a generar con cada camino")
+    parser.add_argument("--sample", action="store_true", help="usar el muestreo del perfil completo en lugar de greedy")
+    args = parser.parse_args()
+
+    from app import parse_generated_recipe
+    from load_controller import GENERATION_PROFILES
+    from model_snapshot import MODEL_SPECS, build_loader
+
+    source = MODEL_SPECS["generator"][0]
+    tokenizer = build_loader("tokenizer")(source)
+    generator = build_loader("seq2seq")(source)
+    draft = build_loader("seq2seq")(args.draft)
+    params = dict(GENERATION_PROFILES["full"]) if args.sample else None
+    benchmark_speculative(tokenizer, generator, draft, parse_generated_recipe, args.samples, params)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# Nivel mínimo y formato de salida ("text" o "json", una línea por evento)
+LOG_LEVEL = os.environ.get("RECIPE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("RECIPE_LOG_FORMAT", "text")
+# Por cada mensaje (plantilla), los primeros LOG_BURST de cada ventana de LOG_WINDOW
+# segundos se emiten siempre; después solo 1 de cada LOG_SAMPLE (0 = ninguno)
+LOG_BURST = int(os.environ.get("RECIPE_LOG_BURST", "20"))
+LOG_WINDOW = float(os.environ.get("RECIPE_LOG_WINDOW", "60"))
+LOG_SAMPLE = int(os.environ.get("RECIPE_LOG_SAMPLE", "100"))
+# Registros en cola como máximo; si se llena se descartan en lugar de bloquear
+LOG_QUEUE_SIZE = int(os.environ.get("RECIPE_LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "recipe"
+
+# Identificador de la petición actual (generación, nutrición...) para correlacionar eventos
+_request_id = contextvars.ContextVar("recipe_request_id", default="-")
+
+# Atributos estándar de LogRecord: el resto son campos estructurados pasados en `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id"
+}
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+def current_request_id():
+    return _request_id.get()
+
+@contextmanager
+def request_context(request_id=None):
+    """Asocia un identificador de petición a los eventos registrados dentro del bloque"""
+    token = _request_id.set(request_id or new_request_id())
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+class RequestIdFilter(logging.Filter):
+    """Añade el identificador de petición del contexto que emite el evento"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+class RateLimiter:
+    """Límite de frecuencia y muestreo por mensaje
+
+    La clave es el logger y la plantilla del mensaje (antes de sustituir los
+    argumentos), así que "Encontrado: %s" cuenta como un solo mensaje para todos
+    los ingredientes: los primeros `burst` de cada ventana pasan y después solo
+    1 de cada `sample`.
+    """
+
+    def __init__(self, burst=LOG_BURST, window=LOG_WINDOW, sample=LOG_SAMPLE):
+        self.burst = burst
+        self.window = window
+        self.sample = sample
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.passed = 0
+        self.suppressed = 0
+
+    def allow(self, key, burst=None, window=None):
+        """Devuelve cuántos eventos se omitieron desde el último emitido, o None si este se omite"""
+        burst = self.burst if burst is None else burst
+        window = self.window if window is None else window
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= window:
+                state = [now, 0, state[2] if state else 0]
+                self._windows[key] = state
+            state[1] += 1
+            over = state[1] - burst
+            if over > 0 and not (self.sample and over % self.sample == 0):
+                state[2] += 1
+                self.suppressed += 1
+                return None
+            suppressed, state[2] = state[2], 0
+            self.passed += 1
+            return suppressed
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger que aplica el límite de frecuencia antes de crear el LogRecord
+
+    Así los mensajes omitidos cuestan solo una comprobación de nivel y una
+    consulta al diccionario. Un evento puede fijar su propio límite con
+    rate_limit=(ráfaga, ventana_s); el primero que pasa tras omitir otros lleva
+    el campo `suppressed`.
+    """
+
+    def __init__(self, logger, limiter):
+        super().__init__(logger, {})
+        self.limiter = limiter
+
+    def log(self, level, msg, *args, rate_limit=None, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        burst, window = rate_limit or (None, None)
+        suppressed = self.limiter.allow((self.logger.name, msg), burst, window)
+        if suppressed is None:
+            return
+        if suppressed:
+            kwargs["extra"] = dict(kwargs.get("extra") or {}, suppressed=suppressed)
+        self.logger._log(level, msg, args, **kwargs)
+
+class StructuredFormatter(logging.Formatter):
+    """Una línea por evento: texto con campos clave=valor o JSON"""
+
+    def __init__(self, fmt=LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record):
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        message = record.getMessage()
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        if self.json:
+            return json.dumps({
+                "ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                "request_id": getattr(record, "request_id", "-"), "msg": message, **fields
+            }, ensure_ascii=False, default=str)
+        timestamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        extra = "".join(f" {key}={value}" for key, value in fields.items())
+        return f"{timestamp} {record.levelname:<7} [{getattr(record, 'request_id', '-')}] {record.name}: {message}{extra}"
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Encola el registro sin formatear y sin esperar; si la cola está llena lo descarta"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # El formateo (y la sustitución de argumentos) se hace en el hilo del listener
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(QueueListener):
+    """Al parar espera a que haya sitio en la cola para el centinela (la cola puede estar llena)"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def _build_pipeline(stream, fmt):
+    """Handler en cola (con request id) y el listener que escribe en `stream`"""
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    output = logging.StreamHandler(stream)
+    output.setFormatter(StructuredFormatter(fmt))
+    listener = DrainingQueueListener(log_queue, output)
+    listener.start()
+    return {"handler": handler, "listener": listener, "queue": log_queue}
+
+_setup_lock = threading.Lock()
+_state = {}
+rate_limiter = RateLimiter()
+
+def setup_logging(level=LOG_LEVEL, stream=None, fmt=LOG_FORMAT):
+    """Configura (una sola vez) el logger "recipe" con cola, límite de frecuencia y request id"""
+    with _setup_lock:
+        if _state:
+            return _state["handler"]
+        _state.update(_build_pipeline(stream or sys.stdout, fmt))
+        atexit.register(_state["listener"].stop)
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(level)
+        logger.addHandler(_state["handler"])
+        logger.propagate = False
+        return _state["handler"]
+
+def get_logger(name):
+    """Logger muestreado hijo de "recipe" (configura el registro la primera vez)"""
+    setup_logging()
+    return SampledLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), rate_limiter)
+
+def flush_logs():
+    """Espera a que el listener escriba lo que hay en cola"""
+    if _state:
+        _state["listener"].stop()
+        _state["listener"].start()
+
+def logging_stats():
+    """Eventos emitidos, suprimidos por el límite y descartados por cola llena"""
+    return {
+        "passed": rate_limiter.passed,
+        "suppressed": rate_limiter.suppressed,
+        "dropped": _state["handler"].dropped if _state else 0,
+        "queued": _state["queue"].qsize() if _state else 0,
+    }
+
+def benchmark_logging(n_lookups=20000):
+    """Coste del registro por consulta de ingrediente: print síncrono frente al logger en cola
+
+    Cada consulta emite los mismos eventos que `_lookup_ingredient_nutrition`
+    (búsqueda a nivel DEBUG y resultado), con la salida enviada a /dev/null
+    para medir solo el coste en el hilo que atiende la petición.
+    """
+    ingredients = [f"ingredient {i % 500}" for i in range(n_lookups)]
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        for ingredient in ingredients:
+            print(f"Buscando información nutricional para: {ingredient}", file=devnull)
+            print(f"✓ Encontrado: {ingredient} - 165.0 kcal", file=devnull)
+        results["print"] = (time.perf_counter() - start) / n_lookups * 1e6
+
+        sync = logging.getLogger(f"{ROOT_LOGGER}.benchmark.sync")
+        sync.propagate = False
+        sync.setLevel(logging.DEBUG)
+        sync_handler = logging.StreamHandler(devnull)
+        sync_handler.setFormatter(StructuredFormatter("text"))
+        sync.addHandler(sync_handler)
+        start = time.perf_counter()
+        for ingredient in ingredients:
+            sync.debug("Buscando información nutricional para: %s", ingredient)
+            sync.info("Encontrado: %s - %s kcal", ingredient, 165.0)
+        results["logging_sync"] = (time.perf_counter() - start) / n_lookups * 1e6
+        sync.removeHandler(sync_handler)
+
+        # Tubería propia (no la global) para no mezclar la salida del benchmark
+        for label, level, burst in (("queue_info", logging.INFO, LOG_BURST),
+                                    ("queue_debug", logging.DEBUG, LOG_BURST),
+                                    ("queue_all", logging.DEBUG, n_lookups * 2)):
+            pipeline = _build_pipeline(devnull, "text")
+            base = logging.getLogger(f"{ROOT_LOGGER}.benchmark.{label}")
+            base.propagate = False
+            base.setLevel(level)
+            base.addHandler(pipeline["handler"])
+            limiter = RateLimiter(burst=burst)
+            logger = SampledLogger(base, limiter)
+            start = time.perf_counter()
+            with request_context():
+                for ingredient in ingredients:
+                    logger.debug("Buscando información nutricional para: %s", ingredient)
+                    logger.debug("Encontrado: %s - %s kcal", ingredient, 165.0)
+            results[label] = (time.perf_counter() - start) / n_lookups * 1e6
+            pipeline["listener"].stop()
+            base.removeHandler(pipeline["handler"])
+            results[f"{label}_suppressed"] = limiter.suppressed
+            results[f"{label}_dropped"] = pipeline["handler"].dropped
+
+    for label in ("print", "logging_sync", "queue_info", "queue_debug", "queue_all"):
+        detail = ""
+        if label.startswith("queue"):
+            detail = f" (suprimidos {results[label + '_suppressed']}, descartados {results[label + '_dropped']})"
+        print(f"📝 {label:<12} {results[label]:6.2f} µs/consulta{detail}")
+    return results
+
+if __name__ == "__main__":
+    benchmark_logging()
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import time
+from collections import namedtuple
+
+# Fichero de sustituciones: alimentos prohibidos por dieta -> alternativas
+# ordenadas, y macros por 100 g (kcal, proteína, carbohidratos, grasa)
+DEFAULT_SUBSTITUTIONS_FILE = os.environ.get(
+    "SUBSTITUTIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "substitutions.json")
+)
+
+MACRO_NAMES = ("cal", "prot", "carb", "fat")
+
+Substitution = namedtuple("Substitution", ["original", "substitute", "plural", "delta", "countable"],
+                          defaults=(True,))
+
+def _pluralize(option):
+    """Plural de una alternativa: el del fichero o la regla inglesa ("vegan cheese" -> "vegan cheeses")
+
+    Los incontables no cambian: "2 chicken breasts" -> "2 extra-firm tofu".
+    """
+    if option.plural:
+        return option.plural
+    if not option.countable:
+        return option.substitute
+    text = option.substitute
+    if text.endswith("s"):
+        return text     # "chickpeas", "lentils", "mushrooms" ya son plurales
+    if text.endswith(("x", "ch", "sh")):
+        return text + "es"
+    return text + "s"
+
+def _match_case(text, original):
+    """Aplica a la alternativa las mayúsculas del texto sustituido (BUTTER, Butter, butter)"""
+    if original.isupper() and len(original) > 1:
+        return text.upper()
+    if original[0].isupper():
+        return text[0].upper() + text[1:]
+    return text
+
+class _DietRules:
+    """Expresión regular compilada y alternativas de una dieta"""
+
+    def __init__(self, substitutions, safe):
+        self.substitutions = substitutions
+        # Las frases seguras (y las propias alternativas) se reconocen y se dejan
+        # tal cual; las más largas primero para que "chicken broth" gane a "chicken"
+        safe = set(safe)
+        for options in substitutions.values():
+            for option in options:
+                safe.add(option.substitute)
+                if option.plural:
+                    safe.add(option.plural)
+        self.safe = {term.lower() for term in safe}
+        terms = sorted(self.safe | set(substitutions), key=len, reverse=True)
+        alternation = "|".join(re.escape(term) for term in terms)
+        self.pattern = re.compile(rf"\b({alternation})(e?s)?\b", re.IGNORECASE)
+
+class SubstitutionIndex:
+    """Índice de sustituciones seguras por dieta, construido una vez desde el fichero de datos
+
+    rewrite() reescribe ingredientes e instrucciones de una receta ya parseada con
+    una sola expresión regular por dieta, sin volver a llamar al modelo.
+    """
+
+    def __init__(self, data):
+        self.version = data.get("version")
+        self._foods = {name.lower(): values for name, values in data.get("foods", {}).items()}
+        self._uncountable = {name.lower() for name in data.get("uncountable", [])}
+        raw_diets = data.get("diets", {})
+        self.rules = {diet: self._build(diet, raw_diets) for diet in raw_diets}
+
+    @classmethod
+    def load(cls, path=DEFAULT_SUBSTITUTIONS_FILE):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def food_names(self):
+        """Alimentos con macros en el fichero de datos"""
+        return list(self._foods)
+
+    def _macros(self, name):
+        """Macros por 100 g; prueba quitando palabras ("smoked tofu" -> "tofu", "chicken breast" -> "chicken")"""
+        words = name.lower().split()
+        candidates = [" ".join(words[i:]) for i in range(len(words))]
+        candidates += [" ".join(words[:i]) for i in range(len(words) - 1, 0, -1)]
+        for candidate in candidates:
+            values = self._foods.get(candidate)
+            if values:
+                return values
+        return None
+
+    def _countable(self, name):
+        """Si el nombre admite plural: no si termina en un incontable ("smoked tofu", "oat milk")"""
+        words = name.lower().split()
+        return not any(" ".join(words[i:]) in self._uncountable for i in range(len(words)))
+
+    def _delta(self, original, substitute):
+        """Diferencia de macros por 100 g al cambiar `original` por `substitute`"""
+        before, after = self._macros(original), self._macros(substitute)
+        if before is None or after is None:
+            return None
+        return {name: round(new - old, 1) for name, old, new in zip(MACRO_NAMES, before, after)}
+
+    def _build(self, diet, raw_diets, seen=()):
+        """Reglas de una dieta, incluyendo las de las dietas que hereda"""
+        if diet in seen:
+            raise ValueError(f"Inclusión circular de dietas: {diet}")
+        spec = raw_diets[diet]
+        substitutions, safe = {}, list(spec.get("safe", []))
+        for parent in spec.get("include", []):
+            inherited = self._build(parent, raw_diets, seen + (diet,))
+            substitutions.update(inherited.substitutions)
+            safe.extend(inherited.safe)
+        for original, options in spec.get("substitutions", {}).items():
+            ranked = []
+            for option in options:
+                if isinstance(option, str):
+                    option = {"substitute": option}
+                ranked.append(Substitution(
+                    original.lower(), option["substitute"], option.get("plural"),
+                    self._delta(original, option["substitute"]),
+                    option.get("countable", self._countable(option["substitute"]))
+                ))
+            substitutions[original.lower()] = ranked
+        return _DietRules(substitutions, safe)
+
+    @property
+    def diets(self):
+        return list(self.rules)
+
+    def alternatives(self, item, diet):
+        """Alternativas seguras ordenadas para un alimento prohibido"""
+        return self.rules[diet].substitutions.get(item.lower(), [])
+
+    def conflicts(self, lines, diet):
+        """Alimentos prohibidos por la dieta que aparecen en las líneas dadas"""
+        rules = self.rules[diet]
+        found = {}
+        for line in lines:
+            for match in rules.pattern.finditer(line):
+                term = match.group(1).lower()
+                if term not in rules.safe:
+                    found.setdefault(term, None)
+        return list(found)
+
+    def _rewrite_lines(self, lines, rules, applied, title=False):
+        def replace(match):
+            term = match.group(1).lower()
+            if term in rules.safe:
+                return match.group(0)
+            option = rules.substitutions[term][0]
+            applied[term] = option
+            text = _pluralize(option) if match.group(2) else option.substitute
+            if title:
+                return text.title()
+            return _match_case(text, match.group(0))
+        return [rules.pattern.sub(replace, line) for line in lines]
+
+    def rewrite(self, recipe, diet):
+        """Devuelve (receta reescrita, sustituciones aplicadas) con la mejor alternativa de cada alimento"""
+        rules = self.rules[diet]
+        applied = {}
+        rewritten = dict(recipe)
+        rewritten["ingredients"] = self._rewrite_lines(recipe.get("ingredients", []), rules, applied)
+        rewritten["instructions"] = self._rewrite_lines(recipe.get("instructions", []), rules, applied)
+        rewritten["title"] = self._rewrite_lines([recipe.get("title", "")], rules, applied, title=True)[0]
+        return rewritten, list(applied.values())
+
+    def rewrite_text(self, text, diet):
+        """Reescribe un texto libre (p. ej. la salida en bruto del modelo)"""
+        return self._rewrite_lines([text or ""], self.rules[diet], {})[0]
+
+def benchmark_substitutions(index=None, n_recipes=2000):
+    """Mide el tiempo de reescritura de recetas típicas"""
+    index = index or SubstitutionIndex.load()
+    recipe = {
+        "title": "Creamy Chicken Pasta",
+        "ingredients": ["1 lb chicken breast", "8 oz. pasta", "2 tbsp butter", "1 c. heavy cream",
+                        "1/2 c. grated parmesan cheese", "2 eggs", "1 tbsp flour", "salt to taste"],
+        "instructions": ["Melt the butter in a skillet.", "Brown the chicken.",
+                         "Whisk the flour into the cream and add the parmesan.",
+                         "Toss with the pasta and serve."],
+    }
+    results = {}
+    for diet in index.diets:
+        start = time.perf_counter()
+        for _ in range(n_recipes):
+            index.rewrite(recipe, diet)
+        per_recipe_us = (time.perf_counter() - start) / n_recipes * 1e6
+        results[diet] = per_recipe_us
+        print(f"🔁 {diet:<12} {per_recipe_us:7.1f} µs/receta")
+    return results
+
+if __name__ == "__main__":
+    benchmark_substitutions()
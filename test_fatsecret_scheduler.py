@@ -0,0 +1,85 @@
+"""
+Pruebas del planificador de peticiones a FatSecret (prioridad, reintentos, plazos y timeout)
+"""
+
+import threading
+import time
+
+import pytest
+
+from fatsecret_scheduler import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, DeadlineExceeded, RequestScheduler, TokenBucket
+)
+
+class Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    bucket.consume()
+    bucket.consume()
+    assert bucket.wait_time(now) == pytest.approx(0.1)
+    assert bucket.wait_time(now + 0.1) == pytest.approx(0.0)
+
+def test_interactive_requests_go_before_batch():
+    scheduler = RequestScheduler(rate=1000, burst=1000, max_concurrency=1)
+    order = []
+    gate = threading.Event()
+    # Ocupa el único hilo para que las demás peticiones esperen en cola
+    blocker = threading.Thread(target=scheduler.call, args=(lambda timeout: gate.wait(5),))
+    blocker.start()
+    time.sleep(0.05)
+    threads = [
+        threading.Thread(target=scheduler.call, args=(lambda timeout, p=p: order.append(p), p))
+        for p in (PRIORITY_BATCH, PRIORITY_BATCH, PRIORITY_INTERACTIVE)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    gate.set()
+    for thread in threads + [blocker]:
+        thread.join(5)
+    assert order[0] == PRIORITY_INTERACTIVE
+
+def test_throttled_responses_are_retried_with_backoff():
+    scheduler = RequestScheduler(rate=1000, burst=1000, base_backoff=0.01, max_backoff=0.05)
+    responses = [Response(429), Response(503), Response(200)]
+    response = scheduler.call(lambda timeout: responses.pop(0))
+    assert response.status_code == 200
+    stats = scheduler.stats()
+    assert stats["retries"] == 2
+    assert stats["throttle_events"] == 2
+
+def test_retry_after_header_is_honoured():
+    scheduler = RequestScheduler(rate=1000, burst=1000, base_backoff=0.001, max_backoff=0.001)
+    responses = [Response(429, {"Retry-After": "0.2"}), Response(200)]
+    start = time.monotonic()
+    assert scheduler.call(lambda timeout: responses.pop(0)).status_code == 200
+    assert time.monotonic() - start >= 0.2
+
+def test_request_timeout_never_exceeds_the_deadline():
+    scheduler = RequestScheduler(rate=1000, burst=1000, request_timeout=10.0)
+    seen = []
+    scheduler.call(lambda timeout: seen.append(timeout), timeout=0.5)
+    scheduler.call(lambda timeout: seen.append(timeout), timeout=60)
+    assert 0 < seen[0] <= 0.5
+    assert seen[1] == pytest.approx(10.0)
+
+def test_queued_request_expires_at_its_deadline():
+    scheduler = RequestScheduler(rate=0.001, burst=1)
+    scheduler.call(lambda timeout: Response())   # agota la única ficha
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(lambda timeout: Response(), timeout=0.1)
+    assert scheduler.stats()["expired"] == 1
+
+def test_non_retryable_errors_are_raised():
+    scheduler = RequestScheduler(rate=1000, burst=1000)
+
+    def broken(timeout):
+        raise ValueError("respuesta inválida")
+
+    with pytest.raises(ValueError):
+        scheduler.call(broken)
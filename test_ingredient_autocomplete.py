@@ -0,0 +1,91 @@
+"""
+Pruebas del autocompletado de ingredientes (prefijos, erratas, vocabulario aprendido y validación)
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from ingredient_autocomplete import (
+    STATUS_KNOWN, STATUS_MODEL, STATUS_UNKNOWN, IngredientIndex, build_ingredient_index, edit_distance,
+    prefix_distance, split_items
+)
+from substitutions import SubstitutionIndex
+
+@pytest.fixture(scope="module")
+def index():
+    return build_ingredient_index(SubstitutionIndex.load())
+
+def names(suggestions):
+    return [s.name for s in suggestions]
+
+def test_prefix_suggestions_rank_shorter_names_first(index):
+    suggestions = names(index.complete("chic", limit=10))
+    assert suggestions[0] == "chicken"
+    assert "chicken breast" in suggestions
+
+def test_prefix_matches_inner_words(index):
+    assert "chicken breast" in names(index.complete("breast"))
+
+def test_prefix_tolerates_a_typo_in_the_last_word(index):
+    suggestions = index.complete("chikc")
+    assert suggestions and suggestions[0].name.startswith("chicken")
+    assert suggestions[0].edits == 1
+
+@pytest.mark.parametrize("text, expected", [
+    ("chiken brest", "chicken breast"),
+    ("cebola", "cebolla"),
+    ("tomatoe", "tomato"),
+])
+def test_fuzzy_corrects_each_word(index, text, expected):
+    assert names(index.fuzzy(text))[0] == expected
+
+def test_known_items_have_no_suggestions(index):
+    checks = index.validate("pollo, Arroz, aceite de oliva, ")
+    assert [check.status for check in checks] == [STATUS_KNOWN] * 3
+    assert [check.canonical for check in checks] == ["chicken", "rice", "olive oil"]
+    assert not any(check.partial for check in checks)
+
+def test_last_item_is_partial_until_a_separator(index):
+    checks = index.validate("pollo, tom")
+    assert checks[-1].partial and checks[-1].status == STATUS_UNKNOWN
+    assert "tomato" in names(checks[-1].suggestions)
+    assert not index.validate("pollo, tom,")[-1].partial
+
+def test_partial_phrase_is_not_known_by_one_word(index):
+    # "olivo" no está en el vocabulario: "aceite de olivo" no cuenta como "oil"
+    assert index.check("aceite de olivx").status == STATUS_UNKNOWN
+
+def test_learned_names_are_suggested():
+    index = IngredientIndex()
+    index.add_many(["chicken"])
+    assert index.learn("dragon fruit")
+    assert not index.learn("Dragon Fruit")
+    assert names(index.complete("drag")) == ["dragon fruit"]
+    assert index.stats()["learned"] == 1
+
+def test_model_vocabulary_marks_words_the_generator_knows(index):
+    class Tokenizer:
+        def get_vocab(self):
+            return {"▁quinotto": 0, "▁za": 1, "quin": 2}
+
+    index.add_model_vocabulary(Tokenizer())
+    assert index.check("quinotto").status == STATUS_MODEL
+    assert index.check("zzqx").status == STATUS_UNKNOWN
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("chiken", "chicken", 1),
+    ("cebola", "cebolla", 1),
+    ("abcd", "badc", 2),
+    ("rice", "rice", 0),
+    ("apple", "banana", 3),
+])
+def test_edit_distance_with_transpositions_and_cutoff(a, b, distance):
+    assert edit_distance(a, b, 2) == distance
+
+def test_prefix_distance():
+    assert prefix_distance("chikc", "chicken", 2) == 1
+    assert prefix_distance("chic", "chicken", 2) == 0
+
+def test_split_items():
+    assert split_items("pollo, arroz;\n tomate,, ") == ["pollo", "arroz", "tomate"]
@@ -0,0 +1,67 @@
+"""
+Pruebas de la normalización de ingredientes (plurales, léxico español/inglés)
+"""
+
+import pytest
+
+from ingredient_normalizer import normalize_ingredient, normalize_ingredients
+
+@pytest.mark.parametrize("text, expected", [
+    ("molasses", "molasses"),
+    ("leaves", "leaf"),
+    ("bay leaves", "bay leaf"),
+    ("knives", "knife"),
+    ("halves", "half"),
+    ("loaves", "loaf"),
+    ("oats", "oats"),
+    ("hummus", "hummus"),
+    ("asparagus", "asparagus"),
+])
+def test_irregular_and_invariant_plurals(text, expected):
+    """Los irregulares no pasan por las reglas inglesas ("molasses" no es "molass")"""
+    assert normalize_ingredient(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("Tomates", "tomato"),
+    ("tomatoes", "tomato"),
+    ("potatoes", "potato"),
+    ("berries", "berry"),
+    ("peaches", "peach"),
+    ("olives", "olive"),
+    ("eggs", "egg"),
+    ("limones", "lemon"),
+    ("nueces", "walnut"),
+])
+def test_regular_plurals(text, expected):
+    assert normalize_ingredient(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("aceite de oliva", "olive oil"),
+    ("aceite de olivo", "olive oil"),
+    ("aceitunas", "olive"),
+    ("Pimiento rojo", "red bell pepper"),
+    ("salsa de tomate", "tomato sauce"),
+    ("  Cebollas  ", "onion"),
+])
+def test_spanish_phrases(text, expected):
+    assert normalize_ingredient(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("pimienta negra", "black pepper"),
+    ("frijoles negros", "black bean"),
+])
+def test_adjective_already_in_the_translation_is_not_repeated(text, expected):
+    assert normalize_ingredient(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("lima beans", "lima bean"),
+    ("pan", "pan"),
+    ("pan integral", "whole grain bread"),
+    ("pan de maiz", "corn bread"),
+])
+def test_english_homographs_are_only_translated_in_spanish(text, expected):
+    """"lima beans" no es "lime bean": las claves españolas que son palabras inglesas se dejan en inglés"""
+    assert normalize_ingredient(text) == expected
+
+def test_normalize_ingredients_deduplicates():
+    assert normalize_ingredients("pollo, Pollo; arroz\ntomates, ") == ["chicken", "rice", "tomato"]
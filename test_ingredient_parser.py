@@ -0,0 +1,68 @@
+"""
+Pruebas del analizador de líneas de ingredientes (cantidad, unidad, nombre y gramos)
+"""
+
+import pytest
+
+from ingredient_parser import parse_ingredient_line, to_grams
+
+@pytest.mark.parametrize("line, quantity, unit, name", [
+    ("2 c. cooked rice", 2.0, "cup", "cooked rice"),
+    ("1 lb chicken breast", 1.0, "lb", "chicken breast"),
+    ("1 1/2 cups flour", 1.5, "cup", "flour"),
+    ("1-1/2 cups flour", 1.5, "cup", "flour"),
+    ("1/2-3/4 cup milk", 0.625, "cup", "milk"),
+    ("a pinch of salt", 1.0, "pinch", "salt"),
+    ("½ tsp salt", 0.5, "tsp", "salt"),
+    ("3-4 cloves garlic", 3.5, "clove", "garlic"),
+    ("2,5 tazas de leche", 2.5, "cup", "leche"),
+    ("2 (15 oz.) cans beans", 30.0, "oz", "beans"),
+    ("1 onion, chopped", 1.0, None, "onion"),
+    ("2 tomatoes", 2.0, None, "tomatoes"),
+])
+def test_quantity_unit_and_name(line, quantity, unit, name):
+    parsed = parse_ingredient_line(line)
+    assert parsed.quantity == pytest.approx(quantity)
+    assert parsed.unit == unit
+    assert parsed.name == name
+
+@pytest.mark.parametrize("line, unit", [
+    ("2 T butter", "tbsp"),
+    ("2 T. butter", "tbsp"),
+    ("2 t salt", "tsp"),
+    ("2 TBSP butter", "tbsp"),
+    ("2 Tsp salt", "tsp"),
+])
+def test_single_letter_spoons_are_case_sensitive(line, unit):
+    """T mayúscula es cucharada y t minúscula cucharadita"""
+    assert parse_ingredient_line(line).unit == unit
+
+def test_tablespoon_weighs_three_teaspoons():
+    assert to_grams(parse_ingredient_line("1 T butter")) == pytest.approx(
+        3 * to_grams(parse_ingredient_line("1 t butter")), rel=0.01)
+
+def test_comma_after_unit_keeps_the_name():
+    assert parse_ingredient_line("1 cup, chopped onion").name == "chopped onion"
+
+def test_embedded_newline():
+    parsed = parse_ingredient_line("2 c.\ncooked rice")
+    assert (parsed.quantity, parsed.unit, parsed.name) == (2.0, "cup", "cooked rice")
+
+def test_to_taste_weighs_nothing():
+    parsed = parse_ingredient_line("salt to taste")
+    assert parsed.name == "salt"
+    assert to_grams(parsed) == 0.0
+
+@pytest.mark.parametrize("line", ["salt and pepper", "Sal y pimienta", "salt"])
+def test_seasonings_without_quantity_weigh_nothing(line):
+    """Sin cantidad, "salt and pepper" es al gusto: no pesa como un pimiento"""
+    assert to_grams(parse_ingredient_line(line)) == 0.0
+
+@pytest.mark.parametrize("line", ["a pinch of salt", "a dash of hot sauce", "pinch of salt"])
+def test_pinch_and_dash_weigh_under_a_gram(line):
+    assert to_grams(parse_ingredient_line(line)) < 1.0
+
+def test_grams_use_density_and_unit_weights():
+    assert to_grams(parse_ingredient_line("1 cup flour")) == pytest.approx(236.588 * 0.53)
+    assert to_grams(parse_ingredient_line("2 eggs")) == pytest.approx(100)
+    assert to_grams(parse_ingredient_line("1 can tomatoes")) == pytest.approx(400)
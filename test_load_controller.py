@@ -0,0 +1,43 @@
+"""
+Pruebas del controlador de carga (bajada y subida de perfil, generaciones en curso)
+"""
+
+from load_controller import LoadController, get_controller
+
+def test_degrades_when_too_many_generations_are_in_flight():
+    controller = LoadController(max_in_flight=2, cooldown=0)
+    assert controller.choose_profile() == "full"
+    with controller.track("full"), controller.track("full"):
+        assert controller.stats()["in_flight"] == 2
+        assert controller.choose_profile() == "reduced"
+        assert controller.choose_profile() == "greedy"
+    assert controller.stats()["in_flight"] == 0
+
+def test_degrades_when_latency_approaches_the_slo():
+    controller = LoadController(slo_ms=1, cooldown=0)
+    with controller.track("full"):
+        sum(range(100000))
+    assert controller.choose_profile() == "reduced"
+    assert controller.stats()["transitions"] == 1
+
+def test_recovers_after_enough_fast_generations():
+    controller = LoadController(slo_ms=60000, max_in_flight=1, cooldown=0, min_samples=3)
+    with controller.track("full"):
+        assert controller.choose_profile() == "reduced"
+    # La generación que estaba en curso al bajar ya cuenta como muestra del perfil nuevo
+    with controller.track("reduced"):
+        pass
+    assert controller.choose_profile() == "reduced"
+    with controller.track("reduced"):
+        pass
+    assert controller.choose_profile() == "full"
+
+def test_served_profile_can_be_corrected():
+    controller = LoadController()
+    with controller.track("cache") as served:
+        served["profile"] = "greedy"
+    assert controller.stats()["served"]["greedy"] == 1
+    assert controller.stats()["served"]["cache"] == 0
+
+def test_get_controller_is_shared_by_the_process():
+    assert get_controller() is get_controller()
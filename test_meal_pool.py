@@ -0,0 +1,63 @@
+"""
+Pruebas del conjunto de recetas del plan semanal (sin repetidas) y de las restricciones por dieta
+"""
+
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("streamlit")
+
+import numpy as np
+
+import app
+
+@pytest.mark.parametrize("ingredients, diet, expected", [
+    ("2 cups buttermilk, 1 cup flour", "Dairy Free", ["⚠️ Buttermilk contains dairy"]),
+    ("grated parmesan, olive oil", "Dairy Free", ["⚠️ Parmesan contains dairy"]),
+    ("chicken thighs, rice", "Vegetarian", ["⚠️ Chicken is not vegetarian"]),
+    ("bacon, eggs", "Vegetarian", ["⚠️ Bacon is not vegetarian"]),
+    ("white rice, sugar", "Low Carb", ["⚠️ Sugar is high in carbs", "⚠️ Rice is high in carbs"]),
+    ("potatoes, noodles", "Low Carb", ["⚠️ Potato is high in carbs", "⚠️ Noodle is high in carbs"]),
+    ("eggplant, peanuts", "Vegan", []),
+    ("tofu, spinach", "Vegetarian", []),
+    ("bread, cheese", "Normal", []),
+])
+def test_every_diet_is_validated(ingredients, diet, expected):
+    assert app.validate_ingredients(ingredients, diet) == expected
+
+class FakeHistory:
+    """Historial cuya escritura en segundo plano ya guardó la receta recién generada"""
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.recorded = []
+
+    def record(self, ingredients, diet, recipe, raw_text, conflicts, nutrition):
+        self.recorded.append(recipe)
+
+    def search(self, query="", page=1, page_size=10):
+        return {"results": self.stored, "pages": 1}
+
+def test_pool_skips_recipes_already_in_the_history(monkeypatch):
+    fresh = {"title": "Tofu Bowl", "ingredients": ["tofu", "rice"], "instructions": [], "profile": "reduced"}
+    nutrition = dict(zip(app.MACRO_KEYS, [400, 20, 50, 10]))
+    stored = [
+        dict(fresh, title="tofu bowl ", nutrition=nutrition),    # la misma receta, ya escrita
+        {"title": "Lentil Soup", "ingredients": ["lentils"], "nutrition": nutrition},
+        {"title": "Lentil Soup", "ingredients": ["lentils"], "nutrition": nutrition},
+    ]
+    batch = types.SimpleNamespace(macros=np.array([[400.0, 20.0, 50.0, 10.0]]), result=lambda i: None)
+    monkeypatch.setattr(app, "generate_recipes_batch", lambda *args: [(fresh, "raw")])
+    monkeypatch.setattr(app, "get_batch_recipe_nutrition", lambda *args: batch)
+    history = FakeHistory(stored)
+    served_before = sum(app.load_controller().stats()["served"].values())
+
+    recipes, macros = app.build_recipe_pool("tofu, rice", "Vegan", 2, history, None, None, num_generated=1)
+
+    assert [recipe["title"] for recipe in recipes] == ["Tofu Bowl", "Lentil Soup"]
+    assert macros.shape == (2, 4)
+    assert history.recorded == [fresh]
+    # El lote pasa por el controlador de carga como cualquier generación
+    assert sum(app.load_controller().stats()["served"].values()) == served_before + 1
@@ -0,0 +1,130 @@
+"""
+Pruebas del registro de modelos (presupuesto por tamaño de modelo y copias locales atómicas)
+"""
+
+import os
+import threading
+
+import pytest
+
+import model_registry
+from model_registry import SNAPSHOT_MARKER, ModelRegistry
+
+class Tensor:
+    def __init__(self, mb):
+        self.mb = mb
+
+    def numel(self):
+        return int(self.mb * 1e6)
+
+    def element_size(self):
+        return 1
+
+class FakeModel:
+    """Modelo con pesos de `mb` MB que sabe guardarse como save_pretrained"""
+
+    def __init__(self, mb, fail_save=False, save_gate=None):
+        self.mb = mb
+        self.fail_save = fail_save
+        self.save_gate = save_gate
+
+    def parameters(self):
+        return [Tensor(self.mb)]
+
+    def save_pretrained(self, path):
+        if self.save_gate:
+            self.save_gate.wait(5)
+        os.makedirs(path)
+        with open(os.path.join(path, "weights.bin"), "w") as f:
+            f.write("x" * 10)
+        if self.fail_save:
+            raise OSError("disco lleno")
+
+def make_registry(tmp_path, budget=0, sizes=None, **kwargs):
+    registry = ModelRegistry(rss_budget_mb=budget, snapshot_dir=str(tmp_path / "snapshots"),
+                             check_interval=0, **kwargs)
+    loaded = []
+    for name, mb in (sizes or {}).items():
+        def loader(source, name=name, mb=mb):
+            loaded.append((name, source))
+            return FakeModel(mb)
+        registry.register(name, f"hub/{name}", loader)
+    return registry, loaded
+
+def test_budget_counts_each_model_size(tmp_path):
+    registry, _ = make_registry(tmp_path, budget=250, sizes={"a": 100, "b": 100, "c": 100})
+    for name in ("a", "b"):
+        with registry.acquire(name):
+            pass
+    # Dos modelos caben: soltar el segundo no expulsa al primero
+    assert registry.metrics()["models"]["a"]["resident"]
+    with registry.acquire("c"):
+        pass
+    # El tercero supera el presupuesto: solo sale el usado hace más tiempo
+    models = registry.metrics()["models"]
+    assert [name for name, info in models.items() if info["resident"]] == ["b", "c"]
+    assert registry.resident_mb() == pytest.approx(200)
+
+def test_models_in_use_are_never_evicted(tmp_path):
+    registry, _ = make_registry(tmp_path, budget=50, sizes={"a": 100})
+    with registry.acquire("a") as model:
+        assert registry.enforce_budget() == []
+        assert model is not None
+    assert not registry.metrics()["models"]["a"]["resident"]
+
+def test_budget_is_disabled_without_proc(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "current_rss_mb", lambda: None)
+    registry, _ = make_registry(tmp_path, budget=10, sizes={"a": 100})
+    assert registry.rss_budget_mb == 0
+    with registry.acquire("a"):
+        pass
+    assert registry.metrics()["models"]["a"]["resident"]
+
+def test_reload_uses_the_complete_snapshot(tmp_path):
+    registry, loaded = make_registry(tmp_path, sizes={"a": 1})
+    with registry.acquire("a"):
+        pass
+    registry.wait_snapshots()
+    snapshot = tmp_path / "snapshots" / "a"
+    assert (snapshot / SNAPSHOT_MARKER).is_file()
+    assert registry.evict("a")
+    with registry.acquire("a"):
+        pass
+    assert loaded == [("a", "hub/a"), ("a", str(snapshot))]
+
+def test_interrupted_snapshot_is_not_loaded(tmp_path):
+    registry, loaded = make_registry(tmp_path)
+    registry.register("a", "hub/a", lambda source: loaded.append(source) or FakeModel(1, fail_save=True))
+    # Copia a medias de una ejecución anterior, sin marca de completa
+    partial = tmp_path / "snapshots" / "a"
+    partial.mkdir(parents=True)
+    (partial / "weights.bin").write_text("x")
+    for _ in range(2):
+        with registry.acquire("a"):
+            pass
+        registry.wait_snapshots()
+        registry.evict("a")
+    assert loaded == ["hub/a", "hub/a"]
+    assert os.listdir(tmp_path / "snapshots") == ["a"]
+
+def test_snapshot_is_saved_without_holding_the_model(tmp_path):
+    """Mientras se escribe la copia local, otras peticiones usan el modelo ya cargado"""
+    gate = threading.Event()
+    registry, _ = make_registry(tmp_path)
+    registry.register("a", "hub/a", lambda source: FakeModel(1, save_gate=gate))
+    with registry.acquire("a"):
+        pass
+    acquired = threading.Event()
+
+    def second():
+        with registry.acquire("a"):
+            acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert acquired.wait(2)
+    assert not (tmp_path / "snapshots" / "a" / SNAPSHOT_MARKER).exists()
+    gate.set()
+    registry.wait_snapshots()
+    thread.join(5)
+    assert (tmp_path / "snapshots" / "a" / SNAPSHOT_MARKER).is_file()
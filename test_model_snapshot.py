@@ -0,0 +1,47 @@
+"""
+Pruebas del artefacto de modelos sin conexión (manifiesto, verificación y modelos opcionales)
+"""
+
+import json
+
+import pytest
+
+from model_snapshot import MANIFEST_NAME, MODEL_SPECS, SnapshotError, _sha256, snapshot_sources, verify_snapshot
+
+def write_artifact(root, names):
+    models = {}
+    for name in names:
+        kind = MODEL_SPECS.get(name, ("t5-small", "seq2seq"))[1]
+        (root / name).mkdir()
+        weights = root / name / "model.safetensors"
+        weights.write_bytes(name.encode())
+        models[name] = {"source": name, "kind": kind, "files": {
+            "model.safetensors": {"sha256": _sha256(weights), "size": weights.stat().st_size}}}
+    (root / MANIFEST_NAME).write_text(json.dumps({"format_version": 1, "version": "v1", "models": models}))
+
+@pytest.fixture(autouse=True)
+def restore_offline_env(monkeypatch):
+    # snapshot_sources activa el modo sin conexión en el entorno del proceso
+    monkeypatch.setenv("HF_HUB_OFFLINE", "0")
+    monkeypatch.setenv("TRANSFORMERS_OFFLINE", "0")
+
+def test_artifact_without_draft_is_valid(tmp_path):
+    write_artifact(tmp_path, list(MODEL_SPECS))
+    verify_snapshot(str(tmp_path))
+    assert set(snapshot_sources(str(tmp_path))) == set(MODEL_SPECS)
+
+def test_packaged_draft_is_loaded_from_the_artifact(tmp_path):
+    write_artifact(tmp_path, list(MODEL_SPECS) + ["draft"])
+    verify_snapshot(str(tmp_path))
+    assert snapshot_sources(str(tmp_path))["draft"][0] == str(tmp_path / "draft")
+
+def test_missing_required_model_fails(tmp_path):
+    write_artifact(tmp_path, ["tokenizer", "generator"])
+    with pytest.raises(SnapshotError):
+        verify_snapshot(str(tmp_path))
+
+def test_corrupted_file_fails(tmp_path):
+    write_artifact(tmp_path, list(MODEL_SPECS))
+    (tmp_path / "generator" / "model.safetensors").write_bytes(b"corrupto")
+    with pytest.raises(SnapshotError):
+        verify_snapshot(str(tmp_path), mode="size")
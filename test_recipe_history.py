@@ -0,0 +1,58 @@
+"""
+Pruebas del historial de recetas (escritura en segundo plano, búsqueda y errores del escritor)
+"""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from recipe_history import RecipeHistory
+
+RECIPE = {"title": "Garlic Pasta", "ingredients": ["8 oz. pasta", "3 cloves garlic"],
+          "instructions": ["Cook the pasta.", "Fry the garlic."]}
+
+@pytest.fixture
+def history(tmp_path):
+    history = RecipeHistory(str(tmp_path / "history.db"), flush_interval=0.01, compact_every=0)
+    yield history
+    history.close()
+
+def test_recorded_recipes_are_searchable(history):
+    history.record("pasta, garlic", "Vegan", RECIPE, "raw", [], {})
+    history.flush()
+    results = history.search("garl")
+    assert [entry["title"] for entry in results["results"]] == ["Garlic Pasta"]
+    assert history.stats()["written"] == 1
+
+def test_write_errors_are_counted_and_the_writer_survives(history, monkeypatch):
+    write_batch = history._write_batch
+
+    def failing(batch):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(history, "_write_batch", failing)
+    history.record("pasta", "Vegan", RECIPE, "raw")
+    history.flush()
+    stats = history.stats()
+    assert (stats["write_errors"], stats["lost"], stats["written"]) == (1, 1, 0)
+
+    # Un error que no es de SQLite tampoco detiene el hilo escritor
+    monkeypatch.setattr(history, "_write_batch", lambda batch: 1 / 0)
+    history.record("pasta", "Vegan", RECIPE, "raw")
+    history.flush()
+    monkeypatch.setattr(history, "_write_batch", write_batch)
+    history.record("pasta", "Vegan", RECIPE, "raw")
+    history.flush()
+    assert history.stats()["write_errors"] == 2
+    assert history.stats()["written"] == 1
+
+def test_compaction_errors_are_counted(history, monkeypatch):
+    history.compact_every = 60
+    history._last_compaction -= 120
+    monkeypatch.setattr(history, "compact", lambda: 1 / 0)
+    history.record("pasta", "Vegan", RECIPE, "raw")
+    history.flush()
+    history.close()
+    assert history.stats()["compact_errors"] == 1
@@ -0,0 +1,95 @@
+"""
+Pruebas del analizador de la salida del modelo (secciones, errores de validación y avisos)
+"""
+
+import gc
+import pickle
+
+import pytest
+
+from recipe_parser import (
+    BENCHMARK_OUTPUTS, ERROR_MISSING_DIRECTIONS, ERROR_MISSING_INGREDIENTS, ERROR_MISSING_TITLE,
+    FLAG_DUPLICATE_INGREDIENT, FLAG_HEADER_IN_TEXT, FLAG_NUMBERED_STEPS, FLAG_OUT_OF_ORDER, FLAG_PREAMBLE,
+    FLAG_REPEATED_HEADER, FLAG_TRUNCATED, batch_report, parse_batch, parse_recipe, strip_step_number, strip_step_numbers, tokenize
+)
+
+def test_single_line_output():
+    recipe = parse_recipe(BENCHMARK_OUTPUTS[0])
+    assert recipe.title == "chicken and rice casserole"
+    assert recipe.ingredients[:2] == ("1 lb chicken breast", "2 c. cooked rice")
+    assert recipe.instructions[-1] == "Bake for 45 minutes."
+    assert recipe.valid and recipe.flags == ()
+
+def test_headers_are_case_insensitive_and_whole_words():
+    assert [name for _, _, name in tokenize("TITLE : x Ingredients: y")] == ["title", "ingredients"]
+    assert tokenize("subtitle: x") == []
+
+@pytest.mark.parametrize("text, errors", [
+    ("", [ERROR_MISSING_TITLE, ERROR_MISSING_INGREDIENTS, ERROR_MISSING_DIRECTIONS]),
+    ("title: salad directions: Toss.", [ERROR_MISSING_INGREDIENTS]),
+    ("ingredients: rice directions: Cook.", [ERROR_MISSING_TITLE]),
+    ("title: rice ingredients: rice -- water", [ERROR_MISSING_DIRECTIONS]),
+    ("title: rice ingredients: -- directions: Cook.", [ERROR_MISSING_INGREDIENTS]),
+    (None, [ERROR_MISSING_TITLE, ERROR_MISSING_INGREDIENTS, ERROR_MISSING_DIRECTIONS]),
+])
+def test_missing_sections_are_errors(text, errors):
+    recipe = parse_recipe(text)
+    assert list(recipe.errors) == errors
+    assert not recipe.valid
+
+@pytest.mark.parametrize("text, flag", [
+    ("Here you go. title: rice ingredients: rice directions: Cook.", FLAG_PREAMBLE),
+    ("title: rice ingredients: rice ingredients: water directions: Cook.", FLAG_REPEATED_HEADER),
+    ("title: rice directions: Cook. ingredients: rice", FLAG_OUT_OF_ORDER),
+    ("title: rice ingredients: rice directions: Mix the ingredients: rice and water.", FLAG_HEADER_IN_TEXT),
+    ("title: rice ingredients: rice directions: 1. Rinse. -- 2) Cook.", FLAG_NUMBERED_STEPS),
+    ("title: rice ingredients: rice -- Rice directions: Cook.", FLAG_DUPLICATE_INGREDIENT),
+    ("title: rice ingredients: rice directions: Cook the rice until", FLAG_TRUNCATED),
+])
+def test_quality_flags(text, flag):
+    recipe = parse_recipe(text)
+    assert flag in recipe.flags
+    assert recipe.valid
+
+def test_header_word_inside_a_step_stays_in_the_step():
+    recipe = parse_recipe(BENCHMARK_OUTPUTS[4])
+    assert recipe.ingredients == ("1 c. flour", "1 egg", "1 c. milk")
+    assert recipe.instructions[0] == "Whisk all the ingredients: flour, egg and milk."
+
+def test_steps_are_stored_without_numbers():
+    recipe = parse_recipe(BENCHMARK_OUTPUTS[3])
+    assert recipe.instructions == ("Saute the onion.", "Add the lentils and water.", "Simmer for 30 minutes")
+    assert strip_step_number("Step 2: Stir") == "Stir"
+    assert strip_step_number("2 eggs, beaten") == "2 eggs, beaten"
+
+@pytest.mark.parametrize("step", ["1.5 cups of water go in the pot.", "2 minutes: rest.", "350 degrees is hot enough."])
+def test_quantities_at_the_start_of_a_step_are_not_step_numbers(step):
+    assert strip_step_number(step) == step
+    recipe = parse_recipe(f"title: soup ingredients: water directions: Heat the pot. -- {step} -- Serve.")
+    assert recipe.instructions[1] == step
+    assert FLAG_NUMBERED_STEPS not in recipe.flags
+
+def test_numbers_out_of_sequence_are_kept_unless_the_first_step_is_numbered():
+    assert strip_step_numbers(["Preheat the oven.", "3. Bake."]) == ["Preheat the oven.", "3. Bake."]
+    assert strip_step_numbers(["1. Preheat the oven.", "Bake.", "3. Serve."]) == ["Preheat the oven.", "Bake.", "Serve."]
+    assert strip_step_numbers(["Step 1: Mix.", "Step 2: Bake."]) == ["Mix.", "Bake."]
+
+def test_to_dict_keeps_the_app_keys():
+    data = parse_recipe(BENCHMARK_OUTPUTS[1]).to_dict()
+    assert data["title"] == "garlic pasta"
+    assert data["ingredients"] == ["8 oz. pasta", "3 cloves garlic", "2 tbsp olive oil"]
+    assert set(data) == {"title", "ingredients", "instructions", "notes", "errors", "flags"}
+
+def test_parse_batch_matches_parse_recipe_and_restores_gc():
+    texts = BENCHMARK_OUTPUTS * 3
+    assert gc.isenabled()
+    recipes = parse_batch(texts)
+    assert gc.isenabled()
+    assert [r.to_dict() for r in recipes] == [parse_recipe(text).to_dict() for text in texts]
+    report = batch_report(recipes)
+    assert report["recipes"] == 15 and report["valid"] == 12
+    assert report["issues"][ERROR_MISSING_INGREDIENTS] == 3
+
+def test_recipes_can_be_pickled():
+    recipe = parse_recipe(BENCHMARK_OUTPUTS[0])
+    assert pickle.loads(pickle.dumps(recipe)).to_dict() == recipe.to_dict()
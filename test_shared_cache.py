@@ -0,0 +1,87 @@
+"""
+Pruebas de la caché compartida con cada backend (memoria, SQLite y protocolo Redis simulado)
+"""
+
+import time
+
+import pytest
+
+from redis_stub import start_stub_redis
+from shared_cache import NAMESPACE_VERSIONS, MemoryBackend, SharedCache, cache_key, open_backend
+
+@pytest.fixture(scope="module")
+def redis_server():
+    server = start_stub_redis()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def url(request, tmp_path):
+    if request.param == "memory":
+        return "memory://"
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path}/cache.db"
+    server = request.getfixturevalue("redis_server")
+    server.data.clear()
+    return f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+def test_json_and_bytes_roundtrip(url):
+    cache = SharedCache(open_backend(url), replica_id="a")
+    assert cache.get("recipe", ["pollo", "arroz"]) is None
+    assert cache.set("recipe", ["pollo", "arroz"], {"title": "Arroz con pollo", "steps": [1, 2]})
+    assert cache.get("recipe", ["pollo", "arroz"]) == {"title": "Arroz con pollo", "steps": [1, 2]}
+    cache.set("pdf", "receta", b"%PDF-1.4\n\x00\xff")
+    assert cache.get("pdf", "receta") == b"%PDF-1.4\n\x00\xff"
+    cache.delete("pdf", "receta")
+    assert cache.get("pdf", "receta") is None
+
+def test_entries_expire(url):
+    cache = SharedCache(open_backend(url))
+    cache.set("nutrition", "arroz", {"Calories": 130}, ttl=1)
+    assert cache.get("nutrition", "arroz") == {"Calories": 130}
+    time.sleep(1.1)
+    assert cache.get("nutrition", "arroz") is None
+
+def test_hits_from_other_replicas_are_counted(url):
+    backend = open_backend(url)
+    writer, reader = SharedCache(backend, replica_id="a"), SharedCache(backend, replica_id="b")
+    writer.set("recipe", "k", {"title": "x"})
+    assert writer.get("recipe", "k") and reader.get("recipe", "k")
+    assert reader.get("recipe", "otra") is None
+    stats = reader.stats()["namespaces"]["recipe"]
+    assert (stats["remote_hits"], stats["local_hits"], stats["misses"]) == (1, 0, 1)
+    assert stats["cross_replica_rate"] == pytest.approx(0.5)
+    assert writer.stats()["namespaces"]["recipe"]["local_hits"] == 1
+
+def test_namespace_version_is_part_of_the_key():
+    assert cache_key("recipe", "k").split(":")[2] == f"v{NAMESPACE_VERSIONS['recipe']}"
+    assert cache_key("recipe", "k") != cache_key("nutrition", "k")
+
+def test_backend_failures_count_as_misses():
+    class BrokenBackend(MemoryBackend):
+        name = "broken"
+
+        def get(self, key):
+            raise ConnectionError("sin conexión")
+
+        def set(self, key, data, ttl=None):
+            raise ConnectionError("sin conexión")
+
+    cache = SharedCache(BrokenBackend())
+    assert cache.get_or_set("recipe", "k", lambda: {"title": "x"}) == {"title": "x"}
+    stats = cache.stats()["namespaces"]["recipe"]
+    assert (stats["errors"], stats["misses"], stats["sets"]) == (2, 1, 0)
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1")
+    backend.set("b", b"2")
+    backend.get("a")
+    backend.set("c", b"3")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+
+def test_unknown_scheme_is_rejected():
+    with pytest.raises(ValueError):
+        open_backend("memcached://localhost")
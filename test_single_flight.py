@@ -0,0 +1,96 @@
+"""
+Pruebas de la agrupación de peticiones concurrentes idénticas (single-flight)
+"""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, get_flight, normalize_ingredients_key
+
+def run_concurrently(flight, key, fn, n):
+    """Lanza n peticiones con la misma clave y solo deja terminar a fn cuando todas han llegado
+
+    fn recibe el evento que la libera; devuelve (resultados, errores).
+    """
+    results, errors = [], []
+    gate = threading.Event()
+
+    def request():
+        try:
+            results.append(flight.do(key, fn, gate))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()["requests"] < n and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+def test_concurrent_identical_requests_run_once():
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow(gate):
+        calls.append(1)
+        gate.wait(5)
+        return {"title": "Arroz con pollo"}
+
+    results, errors = run_concurrently(flight, "k", slow, 8)
+    assert calls == [1] and not errors
+    assert results == [{"title": "Arroz con pollo"}] * 8
+    stats = flight.stats()
+    assert (stats["requests"], stats["executions"], stats["shared"]) == (8, 1, 7)
+    assert stats["coalesce_rate"] == pytest.approx(7 / 8)
+    assert stats["saved_seconds"] > 0
+    assert flight.in_flight() == 0
+
+def test_each_waiter_gets_its_own_copy():
+    flight = SingleFlight("test")
+    results, _ = run_concurrently(flight, "k", lambda gate: gate.wait(5) and {"ingredients": ["rice"]}, 3)
+    results[0]["ingredients"].append("mutated")
+    assert [r["ingredients"] for r in results[1:]] == [["rice"], ["rice"]]
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight("test")
+
+    def broken(gate):
+        gate.wait(5)
+        raise RuntimeError("modelo no disponible")
+
+    results, errors = run_concurrently(flight, "k", broken, 4)
+    assert not results and len(errors) == 4
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.stats()["errors"] == 1
+    # La siguiente petición vuelve a ejecutar la función
+    assert flight.do("k", lambda: "ok") == "ok"
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight("test")
+    gate = threading.Event()
+    thread = threading.Thread(target=flight.do, args=("lento", gate.wait, 5))
+    thread.start()
+    time.sleep(0.05)
+    assert flight.do("rápido", lambda: 42) == 42
+    assert flight.in_flight() == 1
+    gate.set()
+    thread.join(5)
+
+def test_get_flight_is_shared_by_the_process():
+    assert get_flight("test-shared") is get_flight("test-shared")
+    assert get_flight("test-shared") is not get_flight("test-other")
+
+@pytest.mark.parametrize("ingredients, key", [
+    ("Pollo, arroz ,  tomate", ("arroz", "pollo", "tomate")),
+    (["tomate", "POLLO", "arroz", "pollo", " "], ("arroz", "pollo", "tomate")),
+    ("olive  oil,", ("olive oil",)),
+])
+def test_ingredient_keys_ignore_order_case_and_duplicates(ingredients, key):
+    assert normalize_ingredients_key(ingredients) == key
@@ -0,0 +1,71 @@
+"""
+Pruebas de las sustituciones por dieta (derivados lácteos, plural y mayúsculas, macros)
+"""
+
+import pytest
+
+from substitutions import SubstitutionIndex
+
+@pytest.fixture(scope="module")
+def index():
+    return SubstitutionIndex.load()
+
+def rewrite_line(index, line, diet):
+    return index.rewrite({"title": "", "ingredients": [line], "instructions": []}, diet)[0]["ingredients"][0]
+
+@pytest.mark.parametrize("line, expected", [
+    ("2 cups buttermilk", "2 cups soured soy milk"),
+    ("1 tbsp ghee", "1 tbsp coconut oil"),
+    ("1/2 c. ricotta cheese", "1/2 c. tofu ricotta"),
+    ("4 oz. feta", "4 oz. tofu feta"),
+    ("1 c. half-and-half", "1 c. oat milk"),
+    ("2 tbsp peanut butter", "2 tbsp peanut butter"),
+    ("1 can coconut milk", "1 can coconut milk"),
+])
+def test_dairy_derivatives_are_replaced(index, line, expected):
+    assert rewrite_line(index, line, "Dairy Free") == expected
+    assert not index.conflicts([expected], "Dairy Free")
+
+@pytest.mark.parametrize("line, expected", [
+    ("1 c. shredded cheeses", "1 c. shredded vegan cheeses"),
+    ("3 eggs", "3 flax eggs"),
+    ("1 egg", "1 flax egg"),
+    ("2 chicken breasts", "2 extra-firm tofu"),
+    ("Cheeses, grated", "Vegan cheeses, grated"),
+    ("2 TBSP BUTTER", "2 TBSP OLIVE OIL"),
+    ("Butter, softened", "Olive oil, softened"),
+])
+def test_plural_and_case_are_kept(index, line, expected):
+    assert rewrite_line(index, line, "Vegan") == expected
+
+def test_mass_nouns_are_not_pluralized(index):
+    assert rewrite_line(index, "2 salmons", "Vegan") == "2 marinated tofu"
+    assert rewrite_line(index, "2 porks", "Vegan") == "2 tempeh"
+    custom = SubstitutionIndex({"diets": {"Vegan": {"substitutions": {
+        "egg": [{"substitute": "aquafaba", "countable": False}]}}}})
+    assert rewrite_line(custom, "3 eggs", "Vegan") == "3 aquafaba"
+
+def test_title_and_instructions_are_rewritten(index):
+    recipe = {"title": "Creamy Chicken Pasta", "ingredients": ["8 oz. pasta"],
+              "instructions": ["Whisk the buttermilk and eggs.", "Toss with the pasta."]}
+    rewritten, applied = index.rewrite(recipe, "Vegan")
+    assert rewritten["title"] == "Creamy Extra-Firm Tofu Pasta"
+    assert rewritten["instructions"][0] == "Whisk the soured soy milk and flax eggs."
+    assert {option.original for option in applied} == {"chicken", "buttermilk", "egg"}
+    assert recipe["title"] == "Creamy Chicken Pasta"
+
+def test_every_substitute_has_a_macro_delta(index):
+    missing = [(diet, option.original, option.substitute)
+               for diet, rules in index.rules.items()
+               for options in rules.substitutions.values()
+               for option in options if option.delta is None]
+    assert missing == []
+
+def test_delta_compares_macros_per_100g(index):
+    option = index.alternatives("butter", "Dairy Free")[0]
+    assert option.substitute == "olive oil"
+    assert option.delta == {"cal": 167, "prot": -0.9, "carb": -0.1, "fat": 19.0}
+
+def test_circular_includes_are_rejected():
+    with pytest.raises(ValueError):
+        SubstitutionIndex({"diets": {"A": {"include": ["B"]}, "B": {"include": ["A"]}}})